@@ -0,0 +1,220 @@
+"""
+Tile inference benchmark on CPU: the old per-tile loop (vine model, then
+disease model and Grad-CAM, one 64x64 tile at a time) vs
+run_inference.score_tiles at several batch sizes.
+
+Runs on a synthetic capture with randomly initialized models; --vine-bias
+and --disease-bias shift the class 1 logits so a share of tiles passes the
+vine (0.5) and Grad-CAM (0.9) thresholds (the defaults: about half the
+tiles, and about one in ten of those, with seed 0). Reports captures per minute
+(load_capture + tile scoring, models loaded once) and checks each batch
+size against the per-tile output: identical tile counts, count map and
+boxes, heatmap within float32 rounding.
+
+Usage:
+    python benchmarks/bench_inference.py --batch-sizes 16 64 256
+"""
+import os
+
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import tifffile as tiff
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import torchvision.models as models
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import run_inference as ri  # noqa: E402
+
+
+def synthetic_capture(folder, height, width, seed=0):
+    """Five aligned uint16 bands: smooth canopy rows plus sensor noise."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    rows = 0.5 + 0.5 * np.sin(2 * np.pi * xx / 96.0 + 0.3 * np.sin(2 * np.pi * yy / 400.0))
+    for i, gain in enumerate((0.6, 0.8, 0.5, 1.6, 1.1), start=1):
+        band = 8000 + 12000 * gain * rows + rng.normal(0, 800, (height, width))
+        tiff.imwrite(str(Path(folder) / f'aligned_band{i}.tif'), band.clip(0, 65535).astype(np.uint16))
+
+
+def random_models(folder, vine_bias, disease_bias, seed=0):
+    torch.manual_seed(seed)
+    vine_model = models.resnet18(weights=None)
+    vine_model.conv1 = nn.Conv2d(7, 64, kernel_size=7, stride=2, padding=3, bias=False)
+    vine_model.fc = nn.Linear(512, 2)
+    disease_model = ri.StudentResNetWrapper(num_classes=2, in_ch=7)
+    with torch.no_grad():
+        vine_model.fc.bias[:] = torch.tensor([0.0, vine_bias])
+        disease_model.base.fc[4].bias[:] = torch.tensor([0.0, disease_bias])
+    ri.VINE_MODEL_PATH = Path(folder) / 'vine.pth'
+    ri.DISEASE_MODEL_PATH = Path(folder) / 'disease.pth'
+    torch.save(vine_model.state_dict(), ri.VINE_MODEL_PATH)
+    torch.save(disease_model.state_dict(), ri.DISEASE_MODEL_PATH)
+
+
+def sliding_window(image, tile_size, stride):
+    _, H, W = image.shape
+    for y in range(0, H - tile_size + 1, stride):
+        for x in range(0, W - tile_size + 1, stride):
+            yield x, y, image[:, y:y + tile_size, x:x + tile_size]
+
+
+def legacy_score_tiles(image, composite_color, vine_model, disease_model):
+    gradcam_activations = {}
+    gradcam_gradients = {}
+
+    def forward_hook(module, _input, output):
+        gradcam_activations['value'] = output.detach()
+
+    def backward_hook(module, grad_input, grad_output):
+        gradcam_gradients['value'] = grad_output[0].detach()
+
+    target_layer = disease_model.base.layer4[-1].conv2
+    hooks = [
+        target_layer.register_forward_hook(forward_hook),
+        target_layer.register_full_backward_hook(backward_hook),
+    ]
+
+    H, W = image.shape[1], image.shape[2]
+    heatmap = np.zeros((H, W), dtype=np.float32)
+    count_map = np.zeros((H, W), dtype=np.float32)
+    disease_positive_tiles = 0
+    vine_positive_tiles = 0
+    max_disease_prob = 0.0
+
+    for x, y, patch in sliding_window(image, ri.TILE_SIZE, ri.STRIDE):
+        patch_tensor = torch.tensor(patch, dtype=torch.float32, requires_grad=True).unsqueeze(0).to(ri.DEVICE)
+        with torch.no_grad():
+            vine_prob = torch.softmax(vine_model(patch_tensor), dim=1)[0, 1].item()
+        if vine_prob < 0.5:
+            continue
+        vine_positive_tiles += 1
+
+        output = disease_model(patch_tensor)
+        disease_prob = torch.softmax(output, dim=1)[0, 1].item()
+        max_disease_prob = max(max_disease_prob, float(disease_prob))
+        heatmap[y:y + ri.TILE_SIZE, x:x + ri.TILE_SIZE] += disease_prob
+        count_map[y:y + ri.TILE_SIZE, x:x + ri.TILE_SIZE] += 1
+
+        if disease_prob < 0.9:
+            continue
+        disease_positive_tiles += 1
+
+        disease_model.zero_grad()
+        output[0, 1].backward()
+        act = gradcam_activations['value'][0]
+        grad = gradcam_gradients['value'][0]
+        cam = F.relu((grad.mean(dim=(1, 2)).unsqueeze(1).unsqueeze(2) * act).sum(0))
+        cam = F.interpolate(cam.unsqueeze(0).unsqueeze(0), size=(ri.TILE_SIZE, ri.TILE_SIZE), mode='bilinear', align_corners=False)[0, 0]
+        cam = (cam - cam.min()) / (cam.max() - cam.min() + 1e-8)
+        cam_np = (cam.cpu().numpy() * 255).astype(np.uint8)
+
+        _, binary_map = cv2.threshold(cam_np, 200, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(binary_map, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for cnt in contours:
+            bx, by, bw, bh = cv2.boundingRect(cnt)
+            if bw * bh < 50:
+                continue
+            cv2.rectangle(composite_color, (x + bx, y + by), (x + bx + bw, y + by + bh), (0, 0, 255), 2)
+
+    for hook in hooks:
+        hook.remove()
+    stats = {
+        'vine_positive_tiles': vine_positive_tiles,
+        'disease_positive_tiles': disease_positive_tiles,
+        'max_disease_prob': max_disease_prob,
+    }
+    return heatmap, count_map, stats
+
+
+def timed(score, folder, vine_model, disease_model, runs):
+    elapsed = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        image, composite_color = ri.load_capture(folder)
+        heatmap, count_map, stats = score(image, composite_color, vine_model, disease_model)
+        elapsed.append(time.perf_counter() - t0)
+    return min(elapsed), (heatmap, count_map, stats, composite_color)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('--batch-sizes', type=int, nargs='+', default=[16, 64, 256])
+    ap.add_argument('--height', type=int, default=960)
+    ap.add_argument('--width', type=int, default=1280)
+    ap.add_argument('--runs', type=int, default=3, help='best of this many captures per path')
+    ap.add_argument('--vine-bias', type=float, default=0.75)
+    ap.add_argument('--disease-bias', type=float, default=2.57)
+    ap.add_argument('--threads', type=int, help='torch CPU threads (default: torch decides)')
+    ap.add_argument('--out', help='also write the JSON report here')
+    args = ap.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    folder = tempfile.mkdtemp(prefix='bench_inference_')
+    synthetic_capture(folder, args.height, args.width)
+    random_models(folder, args.vine_bias, args.disease_bias)
+    vine_model, disease_model = ri._load_models()
+
+    legacy_s, (ref_heat, ref_count, ref_stats, ref_boxes) = timed(
+        legacy_score_tiles, folder, vine_model, disease_model, args.runs
+    )
+    results = [{
+        'path': 'per_tile',
+        'capture_s': round(legacy_s, 3),
+        'captures_per_minute': round(60.0 / legacy_s, 2),
+        **ref_stats,
+    }]
+    print(json.dumps(results[-1]), file=sys.stderr)
+
+    for batch_size in args.batch_sizes:
+        def score(image, composite_color, vine, disease):
+            return ri.score_tiles(image, composite_color, vine, disease, batch_size)
+
+        batched_s, (heat, count, stats, boxes) = timed(score, folder, vine_model, disease_model, args.runs)
+        results.append({
+            'path': 'batched',
+            'batch_size': batch_size,
+            'capture_s': round(batched_s, 3),
+            'captures_per_minute': round(60.0 / batched_s, 2),
+            'speedup': round(legacy_s / batched_s, 2),
+            **stats,
+            'same_tiles': stats['vine_positive_tiles'] == ref_stats['vine_positive_tiles']
+            and stats['disease_positive_tiles'] == ref_stats['disease_positive_tiles'],
+            'max_prob_diff': abs(stats['max_disease_prob'] - ref_stats['max_disease_prob']),
+            'same_count_map': bool(np.array_equal(count, ref_count)),
+            'heatmap_max_diff': float(np.abs(heat - ref_heat).max()),
+            'same_boxes': bool(np.array_equal(boxes, ref_boxes)),
+        })
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    report = {
+        'device': str(ri.DEVICE),
+        'threads': torch.get_num_threads(),
+        'capture': [args.height, args.width],
+        'tiles': len(ri.tile_origins(np.empty((1, args.height, args.width)), ri.TILE_SIZE, ri.STRIDE)),
+        'results': results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    ok = all(r['same_tiles'] and r['same_count_map'] and r['same_boxes'] and r['heatmap_max_diff'] < 1e-5
+             for r in results[1:])
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,7 @@ from tqdm import tqdm
 
 TILE_SIZE = 64
 STRIDE = 32
+BATCH_SIZE = int(os.environ.get('INFERENCE_BATCH_SIZE', '64'))
 DEVICE = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 APP_ROOT = Path(__file__).resolve().parent
 
@@ -62,11 +63,38 @@ class StudentResNetWrapper(nn.Module):
         return self.base(x)
 
 
-def sliding_window(image, tile_size, stride):
+def tile_origins(image, tile_size, stride):
+    """(x, y) of every tile_size tile at stride steps, row by row."""
     _, H, W = image.shape
-    for y in range(0, H - tile_size + 1, stride):
-        for x in range(0, W - tile_size + 1, stride):
-            yield x, y, image[:, y:y + tile_size, x:x + tile_size]
+    ys, xs = np.meshgrid(
+        np.arange(0, H - tile_size + 1, stride),
+        np.arange(0, W - tile_size + 1, stride),
+        indexing='ij',
+    )
+    return np.stack([xs.ravel(), ys.ravel()], axis=1)
+
+
+def gather_tiles(image, origins, tile_size):
+    """The tiles at origins as one (N, C, tile_size, tile_size) array."""
+    windows = np.lib.stride_tricks.sliding_window_view(image, (tile_size, tile_size), axis=(1, 2))
+    return np.ascontiguousarray(windows[:, origins[:, 1], origins[:, 0]].transpose(1, 0, 2, 3))
+
+
+def accumulate_tiles(shape, origins, values, tile_size):
+    """
+    The map with each tile's value added over its footprint, i.e.
+    out[y:y + tile_size, x:x + tile_size] += value for every tile, done at
+    once as a 2D difference array and its running sums.
+    """
+    H, W = shape
+    diff = np.zeros((H + 1, W + 1), dtype=np.float64)
+    x, y = origins[:, 0], origins[:, 1]
+    values = np.asarray(values, dtype=np.float64)
+    np.add.at(diff, (y, x), values)
+    np.add.at(diff, (y, x + tile_size), -values)
+    np.add.at(diff, (y + tile_size, x), -values)
+    np.add.at(diff, (y + tile_size, x + tile_size), values)
+    return diff.cumsum(axis=0).cumsum(axis=1)[:H, :W].astype(np.float32)
 
 
 def normalize_to_uint8(img):
@@ -96,11 +124,9 @@ def _load_models():
     return vine_model, disease_model
 
 
-def run_inference(input_folder: str, output_folder: str):
+def load_capture(input_folder):
+    """The normalized 7-channel image (5 bands, NDVI, NDRE) and RGB composite of an aligned capture."""
     input_folder = Path(input_folder)
-    output_folder = Path(output_folder)
-    output_folder.mkdir(parents=True, exist_ok=True)
-
     band_paths = [input_folder / f'aligned_band{i}.tif' for i in range(1, 6)]
     for path in band_paths:
         if not path.exists():
@@ -122,14 +148,42 @@ def run_inference(input_folder: str, output_folder: str):
     for c in range(image.shape[0]):
         image[c] = (image[c] - global_mean[c]) / (global_std[c] + 1e-8)
 
-    H, W = image.shape[1], image.shape[2]
     composite_color = cv2.merge([
         normalize_to_uint8(bands[1]),
         normalize_to_uint8(bands[2]),
         normalize_to_uint8(bands[0]),
     ])
+    return image, composite_color
+
+
+def _tile_probs(model, image, origins, batch_size, desc):
+    """Class 1 softmax probability of each tile, batch_size tiles per forward pass."""
+    probs = np.empty(len(origins), dtype=np.float32)
+    with torch.no_grad():
+        for i in tqdm(range(0, len(origins), batch_size), desc=desc):
+            batch = torch.from_numpy(gather_tiles(image, origins[i:i + batch_size], TILE_SIZE)).to(DEVICE)
+            probs[i:i + batch_size] = torch.softmax(model(batch), dim=1)[:, 1].cpu().numpy()
+    return probs
+
+
+def score_tiles(image, composite_color, vine_model, disease_model, batch_size=BATCH_SIZE):
+    """
+    Score every tile: the vine model over all tiles, then the disease model
+    over the vine-positive ones only, each batch_size tiles at a time, and
+    Grad-CAM boxes for the disease-positive tiles drawn onto
+    composite_color. Returns the summed disease probability and tile count
+    of each pixel, and the tile counts / max probability for the summary.
+    """
+    H, W = image.shape[1], image.shape[2]
+    origins = tile_origins(image, TILE_SIZE, STRIDE)
 
-    vine_model, disease_model = _load_models()
+    vine_probs = _tile_probs(vine_model, image, origins, batch_size, 'vine')
+    vine_origins = origins[vine_probs >= 0.5]
+    disease_probs = _tile_probs(disease_model, image, vine_origins, batch_size, 'disease')
+
+    heatmap = accumulate_tiles((H, W), vine_origins, disease_probs, TILE_SIZE)
+    count_map = accumulate_tiles((H, W), vine_origins, np.ones(len(vine_origins)), TILE_SIZE)
+    cam_origins = vine_origins[disease_probs >= 0.9]
 
     gradcam_activations = {}
     gradcam_gradients = {}
@@ -141,54 +195,59 @@ def run_inference(input_folder: str, output_folder: str):
         gradcam_gradients['value'] = grad_output[0].detach()
 
     target_layer = disease_model.base.layer4[-1].conv2
-    target_layer.register_forward_hook(forward_hook)
-    target_layer.register_full_backward_hook(backward_hook)
+    hooks = [
+        target_layer.register_forward_hook(forward_hook),
+        target_layer.register_full_backward_hook(backward_hook),
+    ]
+
+    try:
+        for i in range(0, len(cam_origins), batch_size):
+            batch_origins = cam_origins[i:i + batch_size]
+            output = disease_model(torch.from_numpy(gather_tiles(image, batch_origins, TILE_SIZE)).to(DEVICE))
+            # Tiles don't interact in eval mode, so the gradient of the summed
+            # scores is each tile's own gradient
+            loss = output[:, 1].sum()
+            disease_model.zero_grad()
+            loss.backward()
+
+            act = gradcam_activations['value']
+            grad = gradcam_gradients['value']
+            weights = grad.mean(dim=(2, 3))
+            cam = (weights.unsqueeze(2).unsqueeze(3) * act).sum(1)
+            cam = F.relu(cam)
+            cam = F.interpolate(cam.unsqueeze(1), size=(TILE_SIZE, TILE_SIZE), mode='bilinear', align_corners=False)[:, 0]
+            cam_min = cam.amin(dim=(1, 2), keepdim=True)
+            cam_max = cam.amax(dim=(1, 2), keepdim=True)
+            cam = (cam - cam_min) / (cam_max - cam_min + 1e-8)
+            cam_np = (cam.cpu().numpy() * 255).astype(np.uint8)
+
+            for (x, y), tile_cam in zip(batch_origins.tolist(), cam_np):
+                _, binary_map = cv2.threshold(tile_cam, 200, 255, cv2.THRESH_BINARY)
+                contours, _ = cv2.findContours(binary_map, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                for cnt in contours:
+                    bx, by, bw, bh = cv2.boundingRect(cnt)
+                    if bw * bh < 50:
+                        continue
+                    cv2.rectangle(composite_color, (x + bx, y + by), (x + bx + bw, y + by + bh), (0, 0, 255), 2)
+    finally:
+        for hook in hooks:
+            hook.remove()
+
+    stats = {
+        'vine_positive_tiles': len(vine_origins),
+        'disease_positive_tiles': len(cam_origins),
+        'max_disease_prob': float(disease_probs.max(initial=0.0)),
+    }
+    return heatmap, count_map, stats
 
-    heatmap = np.zeros((H, W), dtype=np.float32)
-    count_map = np.zeros((H, W), dtype=np.float32)
-    disease_positive_tiles = 0
-    vine_positive_tiles = 0
-    max_disease_prob = 0.0
 
-    for x, y, patch in tqdm(sliding_window(image, TILE_SIZE, STRIDE)):
-        patch_tensor = torch.tensor(patch, dtype=torch.float32, requires_grad=True).unsqueeze(0).to(DEVICE)
-        with torch.no_grad():
-            vine_out = vine_model(patch_tensor)
-            vine_prob = torch.softmax(vine_out, dim=1)[0, 1].item()
-        if vine_prob < 0.5:
-            continue
-        vine_positive_tiles += 1
-
-        output = disease_model(patch_tensor)
-        disease_prob = torch.softmax(output, dim=1)[0, 1].item()
-        max_disease_prob = max(max_disease_prob, float(disease_prob))
-        heatmap[y:y + TILE_SIZE, x:x + TILE_SIZE] += disease_prob
-        count_map[y:y + TILE_SIZE, x:x + TILE_SIZE] += 1
-
-        if disease_prob < 0.9:
-            continue
-        disease_positive_tiles += 1
-
-        loss = output[0, 1]
-        disease_model.zero_grad()
-        loss.backward()
-
-        act = gradcam_activations['value'][0]
-        grad = gradcam_gradients['value'][0]
-        weights = grad.mean(dim=(1, 2))
-        cam = (weights.unsqueeze(1).unsqueeze(2) * act).sum(0)
-        cam = F.relu(cam)
-        cam = F.interpolate(cam.unsqueeze(0).unsqueeze(0), size=(TILE_SIZE, TILE_SIZE), mode='bilinear', align_corners=False)[0, 0]
-        cam = (cam - cam.min()) / (cam.max() - cam.min() + 1e-8)
-        cam_np = (cam.cpu().numpy() * 255).astype(np.uint8)
-
-        _, binary_map = cv2.threshold(cam_np, 200, 255, cv2.THRESH_BINARY)
-        contours, _ = cv2.findContours(binary_map, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        for cnt in contours:
-            bx, by, bw, bh = cv2.boundingRect(cnt)
-            if bw * bh < 50:
-                continue
-            cv2.rectangle(composite_color, (x + bx, y + by), (x + bx + bw, y + by + bh), (0, 0, 255), 2)
+def run_inference(input_folder: str, output_folder: str, batch_size: int = BATCH_SIZE):
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    image, composite_color = load_capture(input_folder)
+    vine_model, disease_model = _load_models()
+    heatmap, count_map, stats = score_tiles(image, composite_color, vine_model, disease_model, batch_size)
 
     valid_mask = count_map > 0
     heatmap[valid_mask] /= count_map[valid_mask]
@@ -203,14 +262,14 @@ def run_inference(input_folder: str, output_folder: str):
     cv2.imwrite(str(heatmap_path), heatmap_color)
     cv2.imwrite(str(boxes_path), composite_color)
 
-    disease_detected = disease_positive_tiles > 0
+    disease_detected = stats['disease_positive_tiles'] > 0
     summary = {
         'device': str(DEVICE),
         'disease_detected': disease_detected,
         'analysis_label': int(disease_detected),
-        'max_disease_probability': float(max_disease_prob),
-        'vine_positive_tiles': int(vine_positive_tiles),
-        'disease_positive_tiles': int(disease_positive_tiles),
+        'max_disease_probability': stats['max_disease_prob'],
+        'vine_positive_tiles': int(stats['vine_positive_tiles']),
+        'disease_positive_tiles': int(stats['disease_positive_tiles']),
         'output_files': {
             'overlay': str(overlay_path),
             'heatmap': str(heatmap_path),
@@ -226,6 +285,7 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Run disease inference on aligned multispectral bands.')
     parser.add_argument('--folder', required=True, help='Aligned folder')
     parser.add_argument('--output', required=True, help='Inference output folder')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Tiles per forward pass')
     args = parser.parse_args()
-    result = run_inference(args.folder, args.output)
+    result = run_inference(args.folder, args.output, args.batch_size)
     print(json.dumps(result, indent=2))
@@ -0,0 +1,526 @@
+import glob
+import os
+import sqlite3
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+from google.cloud import bigquery
+
+import bq_io
+from bq_io import HORIZON_LABELS_COLUMN, TrainingStatusUpdate
+from config import Config
+from features import RAW_SENSOR_COLS
+from telemetry import RunTelemetry
+
+NO_DATA_ERROR = "No sensor data returned for this zone in the requested window."
+
+PREDICTION_TS_COLS = ["timestamp", "label_window_start", "label_window_end", "triggered_at"]
+SHADOW_COLS = [
+    "timestamp", "zoneId", "model_version", "shadow_of", "kind", "probability",
+    "label_frost_observed", "log_loss", "ingest_id", "triggered_at",
+]
+SHADOW_TS_COLS = ["timestamp", "triggered_at"]
+
+
+class BigQueryBackend:
+    """
+    Storage backend over BigQuery: every method is the bq_io function of the
+    same name with the client bound. This is the production path.
+    """
+
+    name = "bigquery"
+    # The client is thread-safe: the query planner may run fetches concurrently
+    concurrent_queries = True
+
+    def __init__(self, client: bigquery.Client, tel: RunTelemetry):
+        self.raw_client = client
+        self.client = tel.instrument(client)
+
+    def with_telemetry(self, tel: RunTelemetry) -> "BigQueryBackend":
+        return BigQueryBackend(self.raw_client, tel)
+
+    def fetch_readings(self, cfg: Config, **kwargs) -> pd.DataFrame:
+        return bq_io.fetch_readings(self.client, cfg, **kwargs)
+
+    def fetch_readings_binned(self, cfg: Config, **kwargs) -> pd.DataFrame:
+        return bq_io.fetch_readings_binned(self.client, cfg, **kwargs)
+
+    def fetch_readings_for_zones(self, cfg: Config, zone_ids: list[str], **kwargs) -> dict[str, pd.DataFrame]:
+        return bq_io.fetch_readings_for_zones(self.client, cfg, zone_ids, **kwargs)
+
+    def fetch_latest_reading_time(self, cfg: Config, **kwargs) -> pd.Timestamp | None:
+        return bq_io.fetch_latest_reading_time(self.client, cfg, **kwargs)
+
+    def fetch_latest_reading_time_for_zones(self, cfg: Config, zone_ids: list[str], **kwargs) -> dict[str, pd.Timestamp]:
+        return bq_io.fetch_latest_reading_time_for_zones(self.client, cfg, zone_ids, **kwargs)
+
+    def fetch_candle_events(self, cfg: Config, hours: int = 6) -> pd.DataFrame:
+        return bq_io.fetch_candle_events(self.client, cfg, hours=hours)
+
+    def fetch_candle_events_for_zones(self, cfg: Config, zone_ids: list[str], since_utc: pd.Timestamp) -> pd.DataFrame:
+        return bq_io.fetch_candle_events_for_zones(self.client, cfg, zone_ids, since_utc)
+
+    def has_processed_ingest(self, cfg: Config) -> bool:
+        return bq_io.has_processed_ingest(self.client, cfg)
+
+    def fetch_processed_ingest_zones(self, cfg: Config, zone_ids: list[str]) -> set[str]:
+        return bq_io.fetch_processed_ingest_zones(self.client, cfg, zone_ids)
+
+    def fetch_last_prediction_time(self, cfg: Config) -> pd.Timestamp | None:
+        return bq_io.fetch_last_prediction_time(self.client, cfg)
+
+    def fetch_last_prediction_time_for_zones(self, cfg: Config, zone_ids: list[str]) -> dict[str, pd.Timestamp]:
+        return bq_io.fetch_last_prediction_time_for_zones(self.client, cfg, zone_ids)
+
+    def fetch_untrained_matured_predictions(
+        self, cfg: Config, now: pd.Timestamp, limit: int = 50, after: pd.Timestamp | None = None
+    ) -> pd.DataFrame:
+        return bq_io.fetch_untrained_matured_predictions(self.client, cfg, now, limit=limit, after=after)
+
+    def fetch_untrained_matured_predictions_for_zones(
+        self, cfg: Config, zone_ids: list[str], now: pd.Timestamp, limit: int = 50
+    ) -> pd.DataFrame:
+        return bq_io.fetch_untrained_matured_predictions_for_zones(self.client, cfg, zone_ids, now, limit=limit)
+
+    def insert_prediction_row(self, cfg: Config, row: dict) -> None:
+        bq_io.insert_prediction_row(self.client, cfg, row)
+
+    def insert_prediction_rows(self, cfg: Config, rows: list[dict]) -> None:
+        bq_io.insert_prediction_rows(self.client, cfg, rows)
+
+    def insert_shadow_rows(self, cfg: Config, rows: list[dict]) -> None:
+        bq_io.insert_shadow_rows(self.client, cfg, rows)
+
+    def apply_prediction_training_statuses(self, cfg: Config, updates: list[TrainingStatusUpdate]) -> dict:
+        return bq_io.apply_prediction_training_statuses(self.client, cfg, updates)
+
+
+def _us(t) -> int | None:
+    """UTC timestamp -> integer microseconds (BigQuery TIMESTAMP precision), None passes through."""
+    if t is None or pd.isna(t):
+        return None
+    t = pd.Timestamp(t)
+    t = t.tz_convert("UTC") if t.tzinfo else t.tz_localize("UTC")
+    return int(t.value // 1000)
+
+
+def _from_us(col: pd.Series) -> pd.Series:
+    return pd.to_datetime(col.astype("Int64"), unit="us", utc=True)
+
+
+def _local_table(name: str) -> str:
+    # "dataset.table" in config -> "table"
+    return name.split(".")[-1]
+
+
+class SQLiteBackend:
+    """
+    Embedded storage backend: same tables and semantics as the BigQuery
+    backend, in one SQLite file (timestamps as integer microseconds UTC).
+
+    Readings and interventions can be kept in sync with Parquet exports
+    (cfg.local_parquet_dir: readings*.parquet, interventions*.parquet in the
+    BigQuery table layouts); predictions are written locally.
+    """
+
+    name = "sqlite"
+    # One connection, used from the main thread only
+    concurrent_queries = False
+
+    def __init__(self, cfg: Config, tel: RunTelemetry):
+        self.tel = tel
+        self.conn = sqlite3.connect(cfg.local_db_path or ":memory:")
+        self.readings = _local_table(cfg.readings_table)
+        self.predictions = _local_table(cfg.predictions_table)
+        self.interventions = _local_table(cfg.interventions_table)
+        self.shadow = _local_table(cfg.shadow_table)
+        self._create_tables()
+        if cfg.local_parquet_dir:
+            self.sync_parquet_dir(cfg.local_parquet_dir)
+
+    def with_telemetry(self, tel: RunTelemetry) -> "SQLiteBackend":
+        other = SQLiteBackend.__new__(SQLiteBackend)
+        other.__dict__.update(self.__dict__)
+        other.tel = tel
+        return other
+
+    # --- schema / loading ------------------------------------------------
+
+    def _create_tables(self) -> None:
+        c = self.conn
+        c.execute(f"CREATE TABLE IF NOT EXISTS {self.readings} (zoneId TEXT, timestamp INTEGER, field TEXT, value REAL)")
+        c.execute(f"CREATE INDEX IF NOT EXISTS {self.readings}_zone_ts ON {self.readings} (zoneId, timestamp)")
+        c.execute(f"CREATE TABLE IF NOT EXISTS {self.interventions} (zoneId TEXT, timestamp INTEGER, candlesOn INTEGER)")
+        c.execute(f"CREATE INDEX IF NOT EXISTS {self.interventions}_zone_ts ON {self.interventions} (zoneId, timestamp)")
+        c.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.predictions} (
+              timestamp INTEGER, zoneId TEXT, probability REAL, probability_percent REAL,
+              model_version TEXT, features_hash TEXT, trained_on_label INTEGER,
+              label_frost_observed INTEGER, label_window_start INTEGER, label_window_end INTEGER,
+              skipped_reason TEXT, ingest_id TEXT, triggered_at INTEGER
+            )"""
+        )
+        c.execute(f"CREATE INDEX IF NOT EXISTS {self.predictions}_zone_ts ON {self.predictions} (zoneId, timestamp)")
+        c.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.shadow} (
+              timestamp INTEGER, zoneId TEXT, model_version TEXT, shadow_of TEXT, kind TEXT,
+              probability REAL, label_frost_observed INTEGER, log_loss REAL, ingest_id TEXT, triggered_at INTEGER
+            )"""
+        )
+        c.execute("CREATE TABLE IF NOT EXISTS _parquet_sources (tbl TEXT PRIMARY KEY, signature TEXT)")
+        c.commit()
+
+    def load_readings(self, df: pd.DataFrame) -> None:
+        """Append long-format readings (zoneId, timestamp, field, value)."""
+        df = df[df["field"].isin(RAW_SENSOR_COLS)]
+        ts = pd.to_datetime(df["timestamp"], utc=True).astype("datetime64[us, UTC]").astype("int64")
+        rows = zip(df["zoneId"].astype(str), ts.tolist(), df["field"].astype(str), df["value"].astype(float).tolist())
+        self.conn.executemany(f"INSERT INTO {self.readings} VALUES (?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    def load_interventions(self, df: pd.DataFrame) -> None:
+        ts = pd.to_datetime(df["timestamp"], utc=True).astype("datetime64[us, UTC]").astype("int64")
+        rows = zip(df["zoneId"].astype(str), ts.tolist(), df["candlesOn"].astype(bool).astype(int).tolist())
+        self.conn.executemany(f"INSERT INTO {self.interventions} VALUES (?, ?, ?)", rows)
+        self.conn.commit()
+
+    def load_predictions(self, df: pd.DataFrame) -> None:
+        for row in df.to_dict("records"):
+            self._insert_prediction(row)
+        self.conn.commit()
+
+    def sync_parquet_dir(self, path: str) -> None:
+        """Reload readings/interventions from Parquet when the files changed since the last sync."""
+        for table, loader in ((self.readings, self.load_readings), (self.interventions, self.load_interventions)):
+            kind = "readings" if table == self.readings else "interventions"
+            files = sorted(glob.glob(os.path.join(path, f"{kind}*.parquet")))
+            signature = ";".join(f"{os.path.basename(f)}:{os.path.getmtime(f)}:{os.path.getsize(f)}" for f in files)
+            prev = self.conn.execute("SELECT signature FROM _parquet_sources WHERE tbl = ?", (table,)).fetchone()
+            if prev is not None and prev[0] == signature:
+                continue
+            t0 = time.perf_counter()
+            self.conn.execute(f"DELETE FROM {table}")
+            for f in files:
+                loader(pq.read_table(f).to_pandas())
+            self.conn.execute("INSERT OR REPLACE INTO _parquet_sources VALUES (?, ?)", (table, signature))
+            self.conn.commit()
+            print(f"Local store: loaded {len(files)} {kind} Parquet file(s) in {time.perf_counter() - t0:.2f}s")
+
+    # --- query helpers -----------------------------------------------------
+
+    def _query(self, fn: str, sql: str, params=()) -> pd.DataFrame:
+        t0 = time.perf_counter()
+        df = pd.read_sql_query(sql, self.conn, params=params)
+        self.tel.record_query({"fn": fn, "op": "sqlite", "ms": round((time.perf_counter() - t0) * 1000.0, 1), "rows": len(df)})
+        return df
+
+    @staticmethod
+    def _in(values) -> tuple[str, list]:
+        values = list(values)
+        return ", ".join("?" for _ in values), values
+
+    def _pivot_sql(self, zone_filter: str, extra_cols: str = "") -> str:
+        fields = ",\n".join(f"MAX(CASE WHEN field = '{c}' THEN value END) AS {c}" for c in RAW_SENSOR_COLS)
+        return f"""
+        SELECT {extra_cols}timestamp, {fields}
+        FROM {self.readings}
+        WHERE timestamp BETWEEN ? AND ? AND {zone_filter}
+        GROUP BY {extra_cols}timestamp
+        """
+
+    def _prediction_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        for c in PREDICTION_TS_COLS:
+            if c in df.columns:
+                df[c] = _from_us(df[c])
+        if "trained_on_label" in df.columns:
+            df["trained_on_label"] = df["trained_on_label"].map(lambda v: None if pd.isna(v) else bool(v))
+        return df
+
+    # --- readings ------------------------------------------------------------
+
+    def fetch_readings(
+        self,
+        cfg: Config,
+        *,
+        start_utc: pd.Timestamp | None = None,
+        end_utc: pd.Timestamp | None = None,
+        allow_empty: bool = False,
+    ) -> pd.DataFrame:
+        if end_utc is None:
+            end_utc = pd.Timestamp.now(tz="UTC")
+        if start_utc is None:
+            start_utc = end_utc - pd.Timedelta(hours=cfg.lookback_hours)
+        df = self._query(
+            "fetch_readings",
+            self._pivot_sql("zoneId = ?") + " ORDER BY timestamp",
+            (_us(start_utc), _us(end_utc), cfg.zone_id),
+        )
+        if df.empty:
+            if allow_empty:
+                return df
+            raise RuntimeError(NO_DATA_ERROR)
+        df["timestamp"] = _from_us(df["timestamp"])
+        return df
+
+    def fetch_readings_binned(self, cfg: Config, *, start_utc: pd.Timestamp, end_utc: pd.Timestamp) -> pd.DataFrame:
+        bin_seconds = int(cfg.interval_minutes) * 60
+        avgs = ", ".join(f"AVG({c}) AS {c}" for c in RAW_SENSOR_COLS)
+        df = self._query(
+            "fetch_readings_binned",
+            f"""
+            WITH per_ts AS ({self._pivot_sql("zoneId = ?")})
+            SELECT
+              ((timestamp / 1000000) / ?) * ? * 1000000 AS bin_start,  -- same buckets as UNIX_SECONDS/DIV
+              {avgs},
+              COUNT(temperature) AS n_temperature,
+              COUNT(*) AS n_timestamps,
+              MAX(timestamp) AS last_ts
+            FROM per_ts
+            GROUP BY bin_start
+            ORDER BY bin_start
+            """,
+            (_us(start_utc), _us(end_utc), cfg.zone_id, bin_seconds, bin_seconds),
+        )
+        if df.empty:
+            raise RuntimeError(NO_DATA_ERROR)
+        df["bin_start"] = _from_us(df["bin_start"])
+        df["last_ts"] = _from_us(df["last_ts"])
+        return df
+
+    def fetch_readings_for_zones(
+        self,
+        cfg: Config,
+        zone_ids: list[str],
+        *,
+        start_utc: pd.Timestamp,
+        end_utc: pd.Timestamp,
+    ) -> dict[str, pd.DataFrame]:
+        marks, zones = self._in(zone_ids)
+        df = self._query(
+            "fetch_readings_for_zones",
+            self._pivot_sql(f"zoneId IN ({marks})", extra_cols="zoneId, ") + " ORDER BY zoneId, timestamp",
+            (_us(start_utc), _us(end_utc), *zones),
+        )
+        if df.empty:
+            return {}
+        df["timestamp"] = _from_us(df["timestamp"])
+        return {
+            str(zone_id): zone_df.drop(columns=["zoneId"]).reset_index(drop=True)
+            for zone_id, zone_df in df.groupby("zoneId", sort=False)
+        }
+
+    def fetch_latest_reading_time(
+        self, cfg: Config, *, start_utc: pd.Timestamp, end_utc: pd.Timestamp
+    ) -> pd.Timestamp | None:
+        return self.fetch_latest_reading_time_for_zones(
+            cfg, [cfg.zone_id], start_utc=start_utc, end_utc=end_utc
+        ).get(cfg.zone_id)
+
+    def fetch_latest_reading_time_for_zones(
+        self, cfg: Config, zone_ids: list[str], *, start_utc: pd.Timestamp, end_utc: pd.Timestamp
+    ) -> dict[str, pd.Timestamp]:
+        # Same rows the readings pivot groups (_pivot_sql)
+        marks, zones = self._in(zone_ids)
+        df = self._query(
+            "fetch_latest_reading_time_for_zones",
+            f"""SELECT zoneId, MAX(timestamp) AS latest_ts FROM {self.readings}
+            WHERE timestamp BETWEEN ? AND ? AND zoneId IN ({marks})
+            GROUP BY zoneId""",
+            (_us(start_utc), _us(end_utc), *zones),
+        )
+        return {str(z): t for z, t in zip(df["zoneId"], _from_us(df["latest_ts"]))}
+
+    # --- interventions -------------------------------------------------------
+
+    def _candle_frame(self, df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
+        if df.empty:
+            return pd.DataFrame(columns=cols)
+        df["timestamp"] = _from_us(df["timestamp"])
+        df["candlesOn"] = df["candlesOn"].astype(bool)
+        return df
+
+    def fetch_candle_events(self, cfg: Config, hours: int = 6) -> pd.DataFrame:
+        since = pd.Timestamp.now(tz="UTC") - pd.Timedelta(hours=hours)
+        df = self._query(
+            "fetch_candle_events",
+            f"SELECT timestamp, candlesOn FROM {self.interventions} WHERE zoneId = ? AND timestamp >= ? ORDER BY timestamp",
+            (cfg.zone_id, _us(since)),
+        )
+        return self._candle_frame(df, ["timestamp", "candlesOn"])
+
+    def fetch_candle_events_for_zones(self, cfg: Config, zone_ids: list[str], since_utc: pd.Timestamp) -> pd.DataFrame:
+        marks, zones = self._in(zone_ids)
+        df = self._query(
+            "fetch_candle_events_for_zones",
+            f"""SELECT zoneId, timestamp, candlesOn FROM {self.interventions}
+            WHERE zoneId IN ({marks}) AND timestamp >= ? ORDER BY zoneId, timestamp""",
+            (*zones, _us(since_utc)),
+        )
+        return self._candle_frame(df, ["zoneId", "timestamp", "candlesOn"])
+
+    # --- predictions -----------------------------------------------------------
+
+    def has_processed_ingest(self, cfg: Config) -> bool:
+        if not cfg.ingest_id:
+            return False
+        return bool(self.fetch_processed_ingest_zones(cfg, [cfg.zone_id]))
+
+    def fetch_processed_ingest_zones(self, cfg: Config, zone_ids: list[str]) -> set[str]:
+        if not cfg.ingest_id:
+            return set()
+        marks, zones = self._in(zone_ids)
+        since = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=30)
+        df = self._query(
+            "fetch_processed_ingest_zones",
+            f"""SELECT DISTINCT zoneId FROM {self.predictions}
+            WHERE zoneId IN ({marks}) AND ingest_id = ? AND timestamp >= ?""",
+            (*zones, cfg.ingest_id, _us(since)),
+        )
+        return set(df["zoneId"].astype(str))
+
+    def fetch_last_prediction_time(self, cfg: Config) -> pd.Timestamp | None:
+        return self.fetch_last_prediction_time_for_zones(cfg, [cfg.zone_id]).get(cfg.zone_id)
+
+    def fetch_last_prediction_time_for_zones(self, cfg: Config, zone_ids: list[str]) -> dict[str, pd.Timestamp]:
+        marks, zones = self._in(zone_ids)
+        since = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=30)
+        df = self._query(
+            "fetch_last_prediction_time_for_zones",
+            f"""SELECT zoneId, MAX(timestamp) AS last_prediction_ts FROM {self.predictions}
+            WHERE zoneId IN ({marks}) AND timestamp >= ? GROUP BY zoneId""",
+            (*zones, _us(since)),
+        )
+        return {str(z): t for z, t in zip(df["zoneId"], _from_us(df["last_prediction_ts"]))}
+
+    def fetch_untrained_matured_predictions(
+        self, cfg: Config, now: pd.Timestamp, limit: int = 50, after: pd.Timestamp | None = None
+    ) -> pd.DataFrame:
+        return self.fetch_untrained_matured_predictions_for_zones(cfg, [cfg.zone_id], now, limit=limit, after=after)
+
+    def fetch_untrained_matured_predictions_for_zones(
+        self, cfg: Config, zone_ids: list[str], now: pd.Timestamp, limit: int = 50, after: pd.Timestamp | None = None
+    ) -> pd.DataFrame:
+        marks, zones = self._in(zone_ids)
+        cutoff = now - pd.Timedelta(minutes=cfg.horizon_minutes)
+        # Keyset paging: rows strictly newer than the previous page (no lower bound without one)
+        after_us = _us(after) if after is not None else -(2**62)
+        df = self._query(
+            "fetch_untrained_matured_predictions",
+            f"""
+            SELECT * FROM (
+              SELECT *, ROW_NUMBER() OVER (PARTITION BY zoneId ORDER BY timestamp ASC) AS _rn
+              FROM {self.predictions}
+              WHERE zoneId IN ({marks}) AND trained_on_label IS NULL AND timestamp <= ? AND timestamp > ?
+            )
+            WHERE _rn <= ?
+            ORDER BY zoneId, timestamp ASC
+            """,
+            (*zones, _us(cutoff), after_us, int(limit)),
+        ).drop(columns=["_rn"])
+        if df.empty:
+            return df
+        return self._prediction_frame(df)
+
+    def _ensure_columns(self, cols) -> None:
+        known = {r[1] for r in self.conn.execute(f"PRAGMA table_info({self.predictions})")}
+        for col in cols:
+            if col not in known:
+                # Optional columns (e.g. the timing column) are added on first use
+                self.conn.execute(f'ALTER TABLE {self.predictions} ADD COLUMN "{col}" TEXT')
+
+    def _insert_prediction(self, row: dict) -> None:
+        row = {k: (_us(v) if k in PREDICTION_TS_COLS else v) for k, v in row.items()}
+        if isinstance(row.get("trained_on_label"), bool):
+            row["trained_on_label"] = int(row["trained_on_label"])
+        self._ensure_columns(row)
+        cols = list(row)
+        col_sql = ", ".join('"' + c + '"' for c in cols)
+        self.conn.execute(
+            f"INSERT INTO {self.predictions} ({col_sql}) VALUES ({', '.join('?' for _ in cols)})",
+            [row[c] for c in cols],
+        )
+
+    def insert_prediction_row(self, cfg: Config, row: dict) -> None:
+        t0 = time.perf_counter()
+        with self.conn:
+            self._insert_prediction(row)
+        self.tel.record_query({
+            "fn": "insert_prediction_row",
+            "op": "insert",
+            "ms": round((time.perf_counter() - t0) * 1000.0, 1),
+            "rows": 1,
+        })
+
+    def insert_prediction_rows(self, cfg: Config, rows: list[dict]) -> None:
+        t0 = time.perf_counter()
+        with self.conn:
+            for row in rows:
+                self._insert_prediction(row)
+        self.tel.record_query({
+            "fn": "insert_prediction_rows",
+            "op": "insert",
+            "ms": round((time.perf_counter() - t0) * 1000.0, 1),
+            "rows": len(rows),
+        })
+
+    def insert_shadow_rows(self, cfg: Config, rows: list[dict]) -> None:
+        t0 = time.perf_counter()
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO {self.shadow} ({', '.join(SHADOW_COLS)}) VALUES ({', '.join('?' for _ in SHADOW_COLS)})",
+                [[_us(row[c]) if c in SHADOW_TS_COLS else row[c] for c in SHADOW_COLS] for row in rows],
+            )
+        self.tel.record_query({
+            "fn": "insert_shadow_rows",
+            "op": "insert",
+            "ms": round((time.perf_counter() - t0) * 1000.0, 1),
+            "rows": len(rows),
+        })
+
+    def apply_prediction_training_statuses(self, cfg: Config, updates: list[TrainingStatusUpdate]) -> dict:
+        """Same contract as bq_io.apply_prediction_training_statuses; one transaction."""
+        t0 = time.perf_counter()
+        by_ts = {}
+        for u in updates:
+            by_ts[u.pred_timestamp_utc] = u
+        updates = list(by_ts.values())
+        if not updates:
+            return {"rows": 0, "dml_jobs": 0, "wall_s": 0.0, "failed": []}
+
+        horizons = bool(cfg.extra_horizons_minutes)
+        horizons_sql = f', "{HORIZON_LABELS_COLUMN}" = ?' if horizons else ""
+        sql = f"""
+        UPDATE {self.predictions}
+        SET trained_on_label = ?, skipped_reason = ?, label_frost_observed = ?,
+            label_window_start = ?, label_window_end = ?{horizons_sql}
+        WHERE zoneId = ? AND timestamp = ?
+        """
+        failed = []
+        tt0 = time.perf_counter()
+        with self.conn:
+            if horizons:
+                self._ensure_columns([HORIZON_LABELS_COLUMN])
+            for u in updates:
+                cur = self.conn.execute(sql, (
+                    int(u.trained_on_label), u.skipped_reason, u.label_frost_observed,
+                    _us(u.label_window_start_utc), _us(u.label_window_end_utc),
+                    *((u.horizon_labels,) if horizons else ()),
+                    cfg.zone_id, _us(u.pred_timestamp_utc),
+                ))
+                if cur.rowcount == 0:
+                    failed.append({"timestamp": u.pred_timestamp_utc.isoformat(), "error": "no matching prediction row"})
+        self.tel.record_query({
+            "fn": "apply_prediction_training_statuses", "op": "sqlite",
+            "ms": round((time.perf_counter() - tt0) * 1000.0, 1), "dml_rows": len(updates) - len(failed),
+        })
+        return {"rows": len(updates), "dml_jobs": 1, "wall_s": time.perf_counter() - t0, "failed": failed}
+
+
+def open_backend(cfg: Config, tel: RunTelemetry):
+    """Storage backend selected by cfg.storage_backend ("bigquery" or "sqlite")."""
+    if cfg.storage_backend == "sqlite":
+        return SQLiteBackend(cfg, tel)
+    if cfg.storage_backend != "bigquery":
+        raise RuntimeError(f"Unknown STORAGE_BACKEND: {cfg.storage_backend}")
+    return BigQueryBackend(bigquery.Client(project=cfg.project_id), tel)
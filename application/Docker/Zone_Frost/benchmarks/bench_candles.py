@@ -0,0 +1,109 @@
+"""
+Candle state lookups: bq_io.latest_candles_on / candles_on_during_window
+(DataFrame filter per call) vs candles.CandleIndex (sorted arrays + searchsorted).
+
+Also checks both give the same answers on randomized event sequences,
+including duplicate timestamps and queries landing exactly on events.
+
+Usage:
+    python benchmarks/bench_candles.py --events 10 100 1000 --queries 50 1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bq_io import latest_candles_on, candles_on_during_window  # noqa: E402
+from candles import CandleIndex  # noqa: E402
+
+START = pd.Timestamp("2026-01-10T00:00:00Z")
+
+
+def random_events(rng, n: int, span_minutes: int) -> pd.DataFrame:
+    """Sorted events on a whole-minute grid so duplicates and exact hits occur."""
+    ts = np.sort(rng.integers(0, span_minutes, n))
+    return pd.DataFrame({
+        "timestamp": START + pd.to_timedelta(ts, unit="min"),
+        "candlesOn": rng.random(n) < 0.5,
+    })
+
+
+def random_windows(rng, k: int, span_minutes: int, horizon_minutes: int):
+    starts = START + pd.to_timedelta(rng.integers(-60, span_minutes + 60, k), unit="min")
+    return list(starts), [t + pd.Timedelta(minutes=horizon_minutes) for t in starts]
+
+
+def check_equivalence(trials: int, seed: int) -> int:
+    """Number of mismatching answers over `trials` random event sequences."""
+    rng = np.random.default_rng(seed)
+    mismatches = 0
+    for _ in range(trials):
+        span = int(rng.integers(10, 600))
+        events = random_events(rng, int(rng.integers(0, 40)), span)
+        starts, ends = random_windows(rng, 30, span, int(rng.integers(0, 120)))
+        idx = CandleIndex(events)
+        states = idx.states_at(starts)
+        during = idx.any_on_during_many(starts, ends)
+        for j, (a, b) in enumerate(zip(starts, ends)):
+            mismatches += int(states[j] != latest_candles_on(events, a))
+            mismatches += int(during[j] != candles_on_during_window(events, a, b))
+            mismatches += int(idx.state_at(a) != states[j])
+            mismatches += int(idx.any_on_during(a, b) != during[j])
+    return mismatches
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--events", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--queries", type=int, nargs="+", default=[50, 1000])
+    ap.add_argument("--trials", type=int, default=500, help="random sequences for the equivalence check")
+    ap.add_argument("--horizon-minutes", type=int, default=120)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    mismatches = check_equivalence(args.trials, args.seed)
+    print(json.dumps({"equivalence_trials": args.trials, "mismatches": mismatches}), file=sys.stderr)
+
+    rng = np.random.default_rng(args.seed + 1)
+    span = 7 * 24 * 60
+    results = []
+    for n in args.events:
+        events = random_events(rng, n, span)
+        for k in args.queries:
+            starts, ends = random_windows(rng, k, span, args.horizon_minutes)
+
+            t0 = time.perf_counter()
+            for a, b in zip(starts, ends):
+                latest_candles_on(events, a)
+                candles_on_during_window(events, a, b)
+            legacy_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            idx = CandleIndex(events)
+            idx.states_at(starts)
+            idx.any_on_during_many(starts, ends)
+            index_s = time.perf_counter() - t0
+
+            row = {
+                "events": n,
+                "queries": k,
+                "legacy_s": round(legacy_s, 4),
+                "index_s": round(index_s, 4),
+                "speedup": round(legacy_s / index_s, 1) if index_s > 0 else None,
+            }
+            results.append(row)
+            print(json.dumps(row), file=sys.stderr)
+
+    print(json.dumps({"mismatches": mismatches, "results": results}, indent=2))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
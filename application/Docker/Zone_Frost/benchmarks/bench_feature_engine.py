@@ -0,0 +1,104 @@
+"""
+Backlog feature-building benchmark: per-anchor resample_to_grid + build_features
+(the old main.py loop) vs feature_engine.build_window_features.
+
+Also checks that both paths produce identical vectors (sha256 of each row).
+
+Usage:
+    python benchmarks/bench_feature_engine.py --backlog 1 10 50 200 1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from features import resample_to_grid, build_features  # noqa: E402
+from feature_engine import build_window_features  # noqa: E402
+
+
+def synthetic_readings(start: pd.Timestamp, end: pd.Timestamp, seed: int = 0) -> pd.DataFrame:
+    """Roughly 5-minute readings with jitter, dropouts and a diurnal cycle."""
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range(start, end, freq="5min", tz="UTC")
+    ts = ts + pd.to_timedelta(rng.integers(0, 240, len(ts)), unit="s")
+    ts = ts[rng.random(len(ts)) > 0.1]
+    hours = (ts.hour + ts.minute / 60.0).to_numpy()
+    return pd.DataFrame({
+        "timestamp": ts,
+        "temperature": 40 + 12 * np.sin(2 * np.pi * (hours - 9) / 24) + rng.normal(0, 1.5, len(ts)),
+        "humidity": np.clip(65 + rng.normal(0, 12, len(ts)), 0, 100),
+        "soilMoisture": 50 + rng.normal(0, 4, len(ts)),
+        "soilTemperature": 48 + 6 * np.sin(2 * np.pi * (hours - 11) / 24) + rng.normal(0, 1, len(ts)),
+        "light": np.clip(60000 * np.sin(2 * np.pi * (hours - 6) / 24), 0, None) + rng.normal(0, 50, len(ts)),
+    })
+
+
+def legacy_windows(readings, anchors, flags, minutes, n_steps):
+    hashes = []
+    for t, flag in zip(anchors, flags):
+        hist = readings[readings["timestamp"] <= t].copy()
+        grid, _ = resample_to_grid(hist, minutes, end_utc=t, required_steps=n_steps)
+        _, h = build_features(grid, flag)
+        hashes.append(h)
+    return hashes
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--backlog", type=int, nargs="+", default=[1, 10, 50, 200])
+    ap.add_argument("--lookback-hours", type=int, default=72)
+    ap.add_argument("--interval-minutes", type=int, default=15)
+    ap.add_argument("--skip-legacy-above", type=int, default=1000,
+                    help="only time the per-anchor path up to this backlog size")
+    args = ap.parse_args()
+    warnings.simplefilter("ignore", RuntimeWarning)
+
+    minutes = args.interval_minutes
+    n_steps = int(args.lookback_hours * 60 / minutes)
+    end = pd.Timestamp("2026-01-15T06:00:00Z")
+    span = pd.Timedelta(minutes=minutes * max(args.backlog)) + pd.Timedelta(hours=args.lookback_hours + 6)
+    readings = synthetic_readings(end - span, end)
+
+    results = []
+    for k in args.backlog:
+        anchors = [(end - pd.Timedelta(hours=6) - pd.Timedelta(minutes=minutes * i)).floor(f"{minutes}min")
+                   for i in range(k)][::-1]
+        flags = [i % 7 == 0 for i in range(k)]
+
+        t0 = time.perf_counter()
+        _, engine_hashes, _ = build_window_features(readings, anchors, flags, minutes, required_steps=n_steps)
+        engine_s = time.perf_counter() - t0
+
+        row = {
+            "backlog": k,
+            "engine_s": round(engine_s, 4),
+            "engine_ms_per_anchor": round(1000 * engine_s / k, 3),
+        }
+        if k <= args.skip_legacy_above:
+            t0 = time.perf_counter()
+            legacy_hashes = legacy_windows(readings, anchors, flags, minutes, n_steps)
+            legacy_s = time.perf_counter() - t0
+            row.update({
+                "legacy_s": round(legacy_s, 4),
+                "legacy_ms_per_anchor": round(1000 * legacy_s / k, 3),
+                "speedup": round(legacy_s / engine_s, 1) if engine_s > 0 else None,
+                "bit_identical": legacy_hashes == engine_hashes,
+            })
+        results.append(row)
+        print(json.dumps(row), file=sys.stderr)
+
+    print(json.dumps({"lookback_hours": args.lookback_hours, "interval_minutes": minutes,
+                      "readings": len(readings), "results": results}, indent=2))
+    if any(r.get("bit_identical") is False for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
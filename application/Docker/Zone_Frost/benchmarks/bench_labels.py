@@ -0,0 +1,75 @@
+"""
+Label resolution benchmark: features.compute_label_frost_in_window per
+backlog row vs labels.LabelIndex (one sorted index, range-min per window).
+
+For each backlog size, labels every matured prediction of a synthetic
+readings history both ways, checks they agree (label or None), and
+reports the wall time of each.
+
+Usage:
+    python benchmarks/bench_labels.py --backlog 100 1000 5000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from bench_feature_engine import synthetic_readings  # noqa: E402
+from features import compute_label_frost_in_window  # noqa: E402
+from labels import LabelIndex  # noqa: E402
+
+
+def run(backlog: int, interval_minutes: int, horizon_minutes: int, lookback_hours: int, threshold: float, seed: int) -> dict:
+    end = pd.Timestamp("2026-01-31T00:00:00Z")
+    horizon = pd.Timedelta(minutes=horizon_minutes)
+    first = end - horizon - pd.Timedelta(minutes=interval_minutes * backlog)
+    readings = synthetic_readings(first - pd.Timedelta(hours=lookback_hours), end, seed=seed)
+    starts = [first + pd.Timedelta(minutes=interval_minutes * i) for i in range(backlog)]
+    ends = [t + horizon for t in starts]
+
+    t0 = time.perf_counter()
+    per_row = [compute_label_frost_in_window(readings, a, b, threshold) for a, b in zip(starts, ends)]
+    per_row_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    labels, _, insufficient = LabelIndex(readings).resolve(starts, ends, threshold)
+    batched = [None if insufficient[i] else int(labels[i]) for i in range(backlog)]
+    batched_s = time.perf_counter() - t0
+
+    return {
+        "backlog": backlog,
+        "readings": len(readings),
+        "frost_labels": sum(1 for v in per_row if v == 1),
+        "per_row_s": round(per_row_s, 4),
+        "label_index_s": round(batched_s, 4),
+        "speedup": round(per_row_s / batched_s, 1) if batched_s > 0 else None,
+        "identical": per_row == batched,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--backlog", type=int, nargs="+", default=[100, 1000])
+    ap.add_argument("--interval-minutes", type=int, default=15)
+    ap.add_argument("--horizon-minutes", type=int, default=6 * 60)
+    ap.add_argument("--lookback-hours", type=int, default=72)
+    ap.add_argument("--threshold", type=float, default=32.0, help="FROST_TEMP_THRESHOLD")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    results = [
+        run(b, args.interval_minutes, args.horizon_minutes, args.lookback_hours, args.threshold, args.seed)
+        for b in args.backlog
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+End-to-end benchmark of main.main() against fake BigQuery / GCS clients.
+
+Readings come from SensorDataGenerator in functions/utils/load_mock_data.py
+(the same model used to seed the dev dataset), a backlog of matured,
+unresolved prediction rows is seeded per zone, and the real main() runs
+unmodified. Each scenario runs in its own subprocess so peak RSS is per
+scenario. Reported per run: per-stage latency, query counts by kind, rows
+inserted, whether torch got imported; per scenario: cold import time of the
+app and RSS after it, peak RSS.
+
+Stage times cover the named main.py calls and storage-backend methods
+(fetches include the fake client's own work); "other_s" is the rest of the
+run (model setup, the training loop, prediction). Fetch stages issued
+concurrently (QUERY_CONCURRENCY > 1) overlap, so their sum can exceed
+their wall time. With
+--env STORAGE_BACKEND=sqlite the same dataset is loaded into a temporary
+SQLite file and main() runs against the embedded backend instead. With
+--seed-weights every zone starts with exported (.npz) model weights, so
+RUN_MODE=predict takes the NumPy path.
+
+Usage:
+    python benchmarks/bench_main.py --lookback-hours 72 --backlog 0 10 50 --reading-minutes 15 5 --zones 1 4
+    python benchmarks/bench_main.py --backlog 50 --env STATUS_WRITE_MODE=row --out row.json
+    python benchmarks/bench_main.py --backlog 50 --env STORAGE_BACKEND=sqlite
+    python benchmarks/bench_main.py --backlog 0 --runs 3 --seed-weights --env RUN_MODE=predict
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import itertools
+import json
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from dataclasses import replace
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+MOCK_DATA_PATH = os.path.join(HERE, "..", "..", "..", "..", "functions", "utils", "load_mock_data.py")
+
+# main.py names and backend methods timed as one stage each (whichever of them a run calls)
+STAGES = {
+    "watermark_check": [
+        "fetch_latest_reading_time", "fetch_latest_reading_time_for_zones", "load_run_record", "_skip_unchanged",
+    ],
+    "ingest_check": ["has_processed_ingest", "fetch_processed_ingest_zones"],
+    "backlog_fetch": ["fetch_untrained_matured_predictions", "fetch_untrained_matured_predictions_for_zones"],
+    "readings_fetch": [
+        "fetch_readings", "fetch_readings_binned", "fetch_readings_for_zones", "fetch_readings_cached",
+        "fetch_readings_for_zones_cached",
+    ],
+    "candles_fetch": ["fetch_candle_events", "fetch_candle_events_for_zones"],
+    "current_features": ["resample_to_grid", "grid_from_bins", "build_features"],
+    "backlog_features": ["build_window_features"],
+    "labels": ["compute_label_frost_in_window", "LabelIndex"],
+    "state_load": ["load_state", "load_weights"],
+    "scaler_update": ["_resume_scaler"],
+    "state_save": ["save_state", "save_state_async"],
+    "status_write": ["apply_prediction_training_statuses"],
+    "insert": ["insert_prediction_row"],
+    "gap_check": ["fetch_last_prediction_time", "fetch_last_prediction_time_for_zones"],
+    "gap_fill": ["_fill_gaps"],
+    "shadow": ["_load_shadows", "_write_shadows"],
+}
+
+BASE_ENV = {
+    "BQ_PROJECT_ID": "bench-project",
+    "BQ_DATASET": "sensor_data",
+    "BQ_READINGS_TABLE": "readings",
+    "BQ_PREDICTIONS_TABLE": "frost_predictions",
+    "BQ_INTERVENTIONS_TABLE": "interventions",
+    "MODEL_GCS_BUCKET": "bench-models",
+    "MODEL_GCS_PREFIX": "frost",
+}
+
+HORIZON_MINUTES = 6 * 60
+INTERVAL_MINUTES = 15
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def load_generator_module():
+    spec = importlib.util.spec_from_file_location("load_mock_data", MOCK_DATA_PATH)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def zone_names(n: int) -> list[str]:
+    return [f"benchZone{i:03d}" for i in range(n)]
+
+
+def synthetic_dataset(s: dict, now: pd.Timestamp):
+    """(readings_long, predictions, interventions) for one scenario."""
+    mock = load_generator_module()
+    random.seed(s["seed"])
+    rng = np.random.default_rng(s["seed"])
+    zones = zone_names(s["zones"])
+
+    backlog_span = pd.Timedelta(minutes=INTERVAL_MINUTES * s["backlog"])
+    start = now - pd.Timedelta(minutes=HORIZON_MINUTES) - backlog_span - pd.Timedelta(hours=s["lookback_hours"] + 2)
+    timestamps = mock.generate_timestamps(
+        start.to_pydatetime(), now.to_pydatetime() + pd.Timedelta(minutes=s["reading_minutes"]), s["reading_minutes"]
+    )
+    rows = mock.generate_bigquery_rows(timestamps, "benchOrg", "benchSite", zones, mock.SensorDataGenerator(0.7))
+    readings = pd.DataFrame(rows, columns=["timestamp", "zoneId", "field", "value"])
+
+    # Matured, unresolved predictions on the model grid
+    newest_pred = (now - pd.Timedelta(minutes=HORIZON_MINUTES)).floor(f"{INTERVAL_MINUTES}min")
+    pred_times = [newest_pred - pd.Timedelta(minutes=INTERVAL_MINUTES * i) for i in range(s["backlog"])][::-1]
+    predictions = pd.DataFrame([
+        {"timestamp": t, "zoneId": z, "probability": 0.1, "probability_percent": 10.0,
+         "model_version": "mlp_v1", "features_hash": "seed", "ingest_id": None,
+         "triggered_at": t.to_pydatetime()}
+        for z in zones for t in pred_times
+    ])
+
+    # A few candle deployments (on, then off 1-3 hours later) per zone
+    events = []
+    span_min = int((now - start).total_seconds() // 60)
+    for z in zones:
+        for on_min in np.sort(rng.integers(0, span_min, s["candle_deployments"])):
+            on_t = start + pd.Timedelta(minutes=int(on_min))
+            events.append({"zoneId": z, "timestamp": on_t, "candlesOn": True})
+            events.append({"zoneId": z, "timestamp": on_t + pd.Timedelta(hours=int(rng.integers(1, 4))), "candlesOn": False})
+    interventions = pd.DataFrame(events, columns=["zoneId", "timestamp", "candlesOn"])
+
+    return readings, predictions, interventions
+
+
+def _timed(fn, stage: str, acc: dict, active: set):
+    def wrapper(*args, **kwargs):
+        # A cached fetch calls the backend fetch: time the outer call only
+        if stage in active:
+            return fn(*args, **kwargs)
+        active.add(stage)
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            active.discard(stage)
+            acc[stage] = acc.get(stage, 0.0) + time.perf_counter() - t0
+    return wrapper
+
+
+def seed_weights(gcs, s: dict, zones: list[str]) -> None:
+    """Random FrostMLP-shaped weights, exported as state.py would, for every zone."""
+    from features import RAW_SENSOR_COLS, build_features
+    from main import required_steps
+
+    n = required_steps(s["lookback_hours"], INTERVAL_MINUTES)
+    grid = pd.DataFrame({
+        "timestamp": pd.date_range("2026-01-01", periods=n, freq=f"{INTERVAL_MINUTES}min", tz="UTC"),
+        **{c: 1.0 for c in RAW_SENSOR_COLS},
+    })
+    dim = build_features(grid, False)[0].shape[0]
+    rng = np.random.default_rng(s["seed"])
+    shapes = {
+        "net.0.weight": (256, dim), "net.0.bias": (256,), "net.1.weight": (256,), "net.1.bias": (256,),
+        "net.3.weight": (128, 256), "net.3.bias": (128,), "net.4.weight": (128,), "net.4.bias": (128,),
+        "net.6.weight": (1, 128), "net.6.bias": (1,),
+    }
+    buf = io.BytesIO()
+    np.savez(buf, **{k: (rng.standard_normal(shape) * 0.05).astype(np.float32) for k, shape in shapes.items()})
+    bucket = gcs.buckets.setdefault(BASE_ENV["MODEL_GCS_BUCKET"], {})
+    for z in zones:
+        bucket[f"{BASE_ENV['MODEL_GCS_PREFIX']}_zone_{z}.npz"] = (buf.getvalue(), 1)
+
+
+def seed_sqlite(path: str, readings, predictions, interventions) -> None:
+    """Load the scenario dataset into a SQLite file for STORAGE_BACKEND=sqlite."""
+    import backends
+    import config
+    from telemetry import RunTelemetry
+
+    db = backends.SQLiteBackend(replace(config.load_config(), local_db_path=path), RunTelemetry("seed"))
+    db.load_readings(readings)
+    db.load_interventions(interventions)
+    db.load_predictions(predictions)
+    db.conn.close()
+
+
+def _sqlite_rows(path: str, table: str) -> int:
+    con = sqlite3.connect(path)
+    try:
+        return con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        con.close()
+
+
+def run_scenario(s: dict) -> dict:
+    """Runs inside the child process."""
+    from google.cloud import bigquery, storage
+    from fakes import FakeBigQueryClient, FakeBlob, FakeStorageClient
+
+    # Cold import of the app (torch is only pulled in by runs that need it)
+    t0 = time.perf_counter()
+    import backends
+    import config
+    import main as frost_main
+    import state
+    import_s = time.perf_counter() - t0
+    rss_after_import = _max_rss_mb()
+
+    t0 = time.perf_counter()
+    now = pd.Timestamp.now(tz="UTC").floor("min")
+    readings, predictions, interventions = synthetic_dataset(s, now)
+    zones = zone_names(s["zones"])
+    env = dict(BASE_ENV, **s["env"])
+    if len(zones) == 1:
+        env["ZONE_ID"] = zones[0]
+    else:
+        env["ZONE_IDS"] = ",".join(zones)
+    sqlite_path = None
+    if env.get("STORAGE_BACKEND") == "sqlite":
+        sqlite_path = env["LOCAL_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="frost_bench_"), "frost.db")
+    os.environ.update(env)
+
+    bq = FakeBigQueryClient(readings, predictions, interventions)
+    gcs = FakeStorageClient()
+    if sqlite_path:
+        seed_sqlite(sqlite_path, readings, predictions, interventions)
+    if s["seed_weights"]:
+        seed_weights(gcs, s, zones)
+    del readings
+    setup_s = time.perf_counter() - t0
+
+    bigquery.Client = lambda *a, **k: bq
+    storage.Client = lambda *a, **k: gcs
+    frost_main.load_config = lambda: replace(config.load_config(), lookback_hours=s["lookback_hours"])
+
+    stage_s: dict[str, float] = {}
+    active: set[str] = set()
+    targets = [frost_main, backends.BigQueryBackend, backends.SQLiteBackend, state.VersionedState]
+    for stage, names in STAGES.items():
+        for name in names:
+            for target in targets:
+                if name in vars(target):
+                    setattr(target, name, _timed(getattr(target, name), stage, stage_s, active))
+
+    rss_before_main = _max_rss_mb()
+    runs = []
+    for _ in range(s["runs"]):
+        stage_s.clear()
+        queries_before = dict(bq.query_counts)
+        inserted_before = _sqlite_rows(sqlite_path, "frost_predictions") if sqlite_path else bq.rows_inserted
+        downloads_before = FakeBlob.downloads
+        out = io.StringIO()
+        error = None
+        r0 = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(out):
+                frost_main.main()
+        except Exception:
+            error = traceback.format_exc(limit=3)
+        total_s = time.perf_counter() - r0
+        queries = {k: v - queries_before.get(k, 0) for k, v in bq.query_counts.items()}
+        inserted = _sqlite_rows(sqlite_path, "frost_predictions") if sqlite_path else bq.rows_inserted
+        runs.append({
+            "total_s": round(total_s, 4),
+            "stages_s": {k: round(v, 4) for k, v in stage_s.items()},
+            "other_s": round(total_s - sum(stage_s.values()), 4),
+            "queries": {k: v for k, v in sorted(queries.items()) if v},
+            "query_total": sum(queries.values()),
+            "rows_inserted": inserted - inserted_before,
+            "state_downloads": FakeBlob.downloads - downloads_before,
+            "torch_loaded": "torch" in sys.modules,
+            "error": error,
+        })
+
+    return {
+        **{k: v for k, v in s.items() if k != "seed"},
+        "readings_rows": int(sum(len(df) for df in bq._readings.values())),
+        "import_s": round(import_s, 3),
+        "rss_after_import_mb": round(rss_after_import, 1),
+        "setup_s": round(setup_s, 3),
+        "rss_before_main_mb": round(rss_before_main, 1),
+        "peak_rss_mb": round(_max_rss_mb(), 1),
+        "runs": runs,
+    }
+
+
+def _child(spec: str) -> None:
+    print(json.dumps(run_scenario(json.loads(spec))))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--lookback-hours", type=int, nargs="+", default=[72])
+    ap.add_argument("--backlog", type=int, nargs="+", default=[0, 10, 50], help="matured predictions per zone")
+    ap.add_argument("--reading-minutes", type=int, nargs="+", default=[15], help="sensor reporting interval")
+    ap.add_argument("--zones", type=int, nargs="+", default=[1], help=">1 runs batch mode (ZONE_IDS)")
+    ap.add_argument("--candle-deployments", type=int, default=3, help="per zone, across the readings span")
+    ap.add_argument("--runs", type=int, default=1, help="consecutive main() runs per scenario (later runs are warm)")
+    ap.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="extra env for main(), e.g. STATUS_WRITE_MODE=row")
+    ap.add_argument("--seed-weights", action="store_true", help="start every zone with exported .npz weights")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="also write the JSON report here")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args.child)
+        return
+
+    extra_env = dict(kv.split("=", 1) for kv in args.env)
+    results = []
+    for lookback, backlog, minutes, zones in itertools.product(
+        args.lookback_hours, args.backlog, args.reading_minutes, args.zones
+    ):
+        spec = {
+            "lookback_hours": lookback,
+            "backlog": backlog,
+            "reading_minutes": minutes,
+            "zones": zones,
+            "candle_deployments": args.candle_deployments,
+            "runs": args.runs,
+            "env": extra_env,
+            "seed_weights": args.seed_weights,
+            "seed": args.seed,
+        }
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            result = {**spec, "error": proc.stderr.strip().splitlines()[-5:]}
+        else:
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(json.dumps({k: result.get(k) for k in ("lookback_hours", "backlog", "reading_minutes", "zones", "peak_rss_mb")}
+                         | {"total_s": [r["total_s"] for r in result.get("runs", [])]}), file=sys.stderr)
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if any("error" in r or any(run["error"] for run in r["runs"]) for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
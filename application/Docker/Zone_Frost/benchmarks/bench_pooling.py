@@ -0,0 +1,125 @@
+"""
+Feature pooling benchmark: the full 288-step feature window vs
+multi-resolution pooled layouts (FEATURE_POOLING, features.pool_steps).
+
+For each layout, over a synthetic readings history: input size, FrostMLP
+parameters, checkpoint / exported-weights size, mean train step time, and
+online accuracy (each anchor scored, then trained on, in time order as
+backlog training does: prequential log-loss and Brier score). Also checks
+that build_window_features and build_features agree bit for bit.
+
+Usage:
+    python benchmarks/bench_pooling.py --days 30 --pooling 8:1,24:4,256:16 16:1,272:8
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from bench_feature_engine import synthetic_readings  # noqa: E402
+from feature_engine import build_window_features  # noqa: E402
+from features import build_features, feature_layout, resample_to_grid  # noqa: E402
+from labels import LabelIndex  # noqa: E402
+from main import _train_step, required_steps  # noqa: E402
+from model import FrostMLP  # noqa: E402
+from model_numpy import export_npz  # noqa: E402
+
+
+def parse_pooling(spec: str) -> tuple[tuple[int, int], ...]:
+    return tuple((int(s), int(f)) for s, _, f in (p.partition(":") for p in spec.split(",")))
+
+
+def run(readings, anchors, labels, pooling, n_steps: int, interval: int, seed: int) -> dict:
+    t0 = time.perf_counter()
+    X, hashes, _ = build_window_features(
+        readings, anchors, [False] * len(anchors), interval, required_steps=n_steps, pooling=pooling
+    )
+    features_s = time.perf_counter() - t0
+
+    # Spot-check the vectorized windows against the per-window path
+    identical = True
+    for i in np.linspace(0, len(anchors) - 1, 5).astype(int):
+        t = anchors[i]
+        grid, _ = resample_to_grid(readings[readings["timestamp"] <= t], interval, end_utc=t, required_steps=n_steps)
+        identical &= build_features(grid, False, None, pooling)[1] == hashes[i]
+
+    torch.manual_seed(seed)
+    model = FrostMLP(input_dim=X.shape[1])
+    opt = torch.optim.AdamW(model.parameters(), lr=1e-3, weight_decay=1e-6)
+    model.train()
+
+    probs = np.empty(len(X))
+    step_s = 0.0
+    for i, (x, y) in enumerate(zip(X, labels)):
+        with torch.no_grad():
+            probs[i] = torch.sigmoid(model(torch.from_numpy(x[None, :]))).item()
+        t0 = time.perf_counter()
+        _train_step(model, opt, x, float(y))
+        step_s += time.perf_counter() - t0
+
+    buf = io.BytesIO()
+    torch.save({"model": model.state_dict(), "opt": opt.state_dict()}, buf)
+    p = np.clip(probs, 1e-7, 1 - 1e-7)
+    # Second half only: after both models have seen the same warm-up
+    half = len(p) // 2
+    log_loss = -(labels * np.log(p) + (1 - labels) * np.log1p(-p))
+    return {
+        "layout": feature_layout(pooling),
+        "input_dim": int(X.shape[1]),
+        "parameters": sum(v.numel() for v in model.parameters()),
+        "checkpoint_kb": round(len(buf.getvalue()) / 1024, 1),
+        "weights_npz_kb": round(len(export_npz(model.state_dict())) / 1024, 1),
+        "features_s": round(features_s, 3),
+        "train_step_ms": round(step_s / len(X) * 1000.0, 3),
+        "log_loss": round(float(log_loss[half:].mean()), 4),
+        "brier": round(float(((probs - labels) ** 2)[half:].mean()), 4),
+        "identical_to_build_features": bool(identical),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--pooling", nargs="+", default=["8:1,24:4,256:16"], help="FEATURE_POOLING layouts")
+    ap.add_argument("--lookback-hours", type=int, default=72)
+    ap.add_argument("--interval-minutes", type=int, default=15)
+    ap.add_argument("--horizon-minutes", type=int, default=360)
+    ap.add_argument("--threshold", type=float, default=32.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args()
+
+    n_steps = required_steps(args.lookback_hours, args.interval_minutes)
+    end = pd.Timestamp("2026-03-01T00:00:00Z")
+    horizon = pd.Timedelta(minutes=args.horizon_minutes)
+    first = end - horizon - pd.Timedelta(days=args.days)
+    readings = synthetic_readings(first - pd.Timedelta(hours=args.lookback_hours), end, seed=args.seed)
+    anchors = list(pd.date_range(first, end - horizon, freq=f"{args.interval_minutes}min"))
+    labels, _, missing = LabelIndex(readings).resolve(anchors, [t + horizon for t in anchors], args.threshold)
+    anchors = [t for t, m in zip(anchors, missing) if not m]
+    labels = labels[~missing].astype(np.float64)
+
+    results = []
+    for pooling in [()] + [parse_pooling(p) for p in args.pooling]:
+        results.append(run(readings, anchors, labels, pooling, n_steps, args.interval_minutes, args.seed))
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    report = {"anchors": len(anchors), "frost_rate": round(float(labels.mean()), 3), "results": results}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Historical replay benchmark: replay.replay_site over a synthetic site in
+an embedded SQLite store (STORAGE_BACKEND=sqlite), for several worker
+counts.
+
+Every zone gets --days of synthetic readings; each run replays all of
+them from scratch (no model bucket, so nothing is saved) and reports wall
+time, anchors trained on and the per-zone replay time.
+
+Usage:
+    python benchmarks/bench_replay.py --zones 8 --days 60 --workers 1 4 8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from bench_feature_engine import synthetic_readings  # noqa: E402
+from backends import SQLiteBackend  # noqa: E402
+from config import Config  # noqa: E402
+from features import RAW_SENSOR_COLS  # noqa: E402
+from replay import replay_site  # noqa: E402
+from telemetry import RunTelemetry  # noqa: E402
+
+
+def seed_site(cfg: Config, zones: list[str], start: pd.Timestamp, end: pd.Timestamp) -> None:
+    db = SQLiteBackend(cfg, RunTelemetry("seed"))
+    for i, z in enumerate(zones):
+        wide = synthetic_readings(start, end, seed=i)
+        long = wide.melt(id_vars="timestamp", value_vars=RAW_SENSOR_COLS, var_name="field", value_name="value")
+        db.load_readings(long.assign(zoneId=z))
+    db.conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--zones", type=int, default=4)
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    ap.add_argument("--batch-size", type=int, default=32)
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args()
+
+    end = pd.Timestamp("2026-03-01T00:00:00Z")
+    start = end - pd.Timedelta(days=args.days)
+    zones = [f"zone{i:03d}" for i in range(args.zones)]
+    cfg = Config(
+        project_id="bench",
+        dataset="bench",
+        readings_table="readings",
+        predictions_table="predictions",
+        interventions_table="interventions",
+        zone_id=zones[0],
+        frost_temp_threshold=32.0,
+        storage_backend="sqlite",
+        local_db_path=os.path.join(tempfile.mkdtemp(prefix="frost_replay_"), "frost.db"),
+    )
+    t0 = time.perf_counter()
+    seed_site(cfg, zones, start - pd.Timedelta(hours=cfg.lookback_hours), end)
+    setup_s = time.perf_counter() - t0
+
+    results = []
+    for workers in args.workers:
+        t0 = time.perf_counter()
+        summaries, failures = replay_site(cfg, zones, start, end, workers=workers, batch_size=args.batch_size)
+        results.append({
+            "workers": workers,
+            "total_s": round(time.perf_counter() - t0, 3),
+            "trained": sum(s.get("trained", 0) for s in summaries),
+            "steps": sum(s.get("steps", 0) for s in summaries),
+            "zone_s_max": max((s.get("elapsed_s", 0.0) for s in summaries), default=None),
+            "failed": failures,
+        })
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    report = {"zones": args.zones, "days": args.days, "setup_s": round(setup_s, 3), "results": results}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
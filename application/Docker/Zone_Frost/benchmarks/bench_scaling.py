@@ -0,0 +1,131 @@
+"""
+Robust-scaling benchmark: per-window median / IQR (SCALING_MODE=window,
+features._robust_scale) vs running P² statistics (SCALING_MODE=streaming,
+scaling.StreamingScaler).
+
+Replays a synthetic readings history bin by bin, as consecutive runs would:
+every step the window ending at that bin is scaled, the streaming scaler
+having been fed just the new bin. Reports per window:
+
+  - scaling cost (window: the percentile sorts; streaming: update + scale)
+  - P² accuracy: streaming median / IQR vs exact percentiles of the same
+    history, as a fraction of the exact IQR
+  - consistency: how much one bin's scaled value moves between the windows
+    that contain it (mean over bins of its std across windows)
+  - mean |z_window - z_streaming| of the final window
+
+Columns whose history has (near) zero IQR, e.g. frost_index without frost,
+are scaled by eps alone in both modes and left out of the z metrics.
+
+Usage:
+    python benchmarks/bench_scaling.py --days 14 30
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from bench_feature_engine import synthetic_readings  # noqa: E402
+from features import SCALED_COLS, _robust_scale, resample_to_grid, scaling_block  # noqa: E402
+from scaling import StreamingScaler  # noqa: E402
+
+
+def run(days: int, minutes: int, lookback_hours: int, sample_every: int, seed: int) -> dict:
+    end = pd.Timestamp("2026-01-31T00:00:00Z")
+    readings = synthetic_readings(end - pd.Timedelta(days=days), end, seed=seed)
+    total = int(days * 24 * 60 / minutes)
+    grid, _ = resample_to_grid(readings, minutes, end_utc=readings["timestamp"].max(), required_steps=total)
+    block = scaling_block(grid)
+    ts = grid["timestamp"]
+    n = int(lookback_hours * 60 / minutes)
+
+    scaler = StreamingScaler(len(SCALED_COLS))
+    scaler.update(ts[:n], block[:n])
+
+    window_s, streaming_s = [], []
+    z_window = np.full((total, len(SCALED_COLS)), 0.0)
+    z_window_sq = np.zeros_like(z_window)
+    z_stream = np.zeros_like(z_window)
+    z_stream_sq = np.zeros_like(z_window)
+    seen = np.zeros(total)
+    p2_err = []
+    for end_pos in range(n, total + 1):
+        lo = end_pos - n
+        win = block[lo:end_pos]
+
+        t0 = time.perf_counter()
+        zw = _robust_scale(win)
+        window_s.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        scaler.update(ts[lo:end_pos], win)
+        zs = scaler.scale(win)
+        streaming_s.append(time.perf_counter() - t0)
+
+        z_window[lo:end_pos] += zw
+        z_window_sq[lo:end_pos] += zw.astype(np.float64) ** 2
+        z_stream[lo:end_pos] += zs
+        z_stream_sq[lo:end_pos] += zs.astype(np.float64) ** 2
+        seen[lo:end_pos] += 1
+
+        if (end_pos - n) % sample_every == 0:
+            # Exact percentiles of the history the scaler has seen (row 0's zero deltas excluded)
+            exact = np.nanpercentile(block[1:end_pos], [25, 50, 75], axis=0)
+            est = scaler.quantiles.quantiles()
+            iqr = exact[2] - exact[0]
+            ok = iqr > 1e-9
+            p2_err.append({
+                "median": np.abs(est[1] - exact[1])[ok] / iqr[ok],
+                "iqr": np.abs((est[2] - est[0]) - iqr)[ok] / iqr[ok],
+            })
+
+    full = seen >= n  # bins that appeared in a full set of windows
+    q = np.nanpercentile(block[1:], [25, 75], axis=0)
+    cols = np.nonzero(q[1] - q[0] > 1e-6)[0]
+
+    def spread(s, sq):
+        mean = s[full][:, cols] / seen[full, None]
+        return float(np.sqrt(np.maximum(sq[full][:, cols] / seen[full, None] - mean**2, 0.0)).mean())
+
+    return {
+        "days": days,
+        "windows": len(window_s),
+        "window_scale_us": round(1e6 * float(np.mean(window_s)), 1),
+        "streaming_update_scale_us": round(1e6 * float(np.mean(streaming_s)), 1),
+        "p2_median_err_frac_iqr": round(float(np.mean(np.concatenate([e["median"] for e in p2_err]))), 4),
+        "p2_iqr_err_frac_iqr": round(float(np.mean(np.concatenate([e["iqr"] for e in p2_err]))), 4),
+        "bin_z_std_across_windows": {
+            "window": round(spread(z_window, z_window_sq), 4),
+            "streaming": round(spread(z_stream, z_stream_sq), 4),
+        },
+        "final_window_mean_abs_z_diff": round(float(np.nanmean(np.abs(zw - zs)[:, cols])), 4),
+        "degenerate_cols": [SCALED_COLS[c] for c in range(len(SCALED_COLS)) if c not in cols],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--days", type=int, nargs="+", default=[14])
+    ap.add_argument("--interval-minutes", type=int, default=15)
+    ap.add_argument("--lookback-hours", type=int, default=72)
+    ap.add_argument("--sample-every", type=int, default=96, help="windows between P² accuracy samples")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    results = [
+        run(d, args.interval_minutes, args.lookback_hours, args.sample_every, args.seed)
+        for d in args.days
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
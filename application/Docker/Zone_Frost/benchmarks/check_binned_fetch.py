@@ -0,0 +1,172 @@
+"""
+Offline equivalence check for READINGS_FETCH_MODE=binned.
+
+Loads random long-format readings (jitter, gaps, duplicate timestamps,
+sensors missing per timestamp) into an in-memory SQLite database and runs
+SQLite translations of the two bq_io queries:
+
+  raw:    fetch_readings pivot            -> features.resample_to_grid
+  binned: fetch_readings_binned (bins)    -> features.grid_from_bins
+
+Grids must match to float tolerance (AVG vs pandas mean summation order)
+and the coverage/gap metadata exactly. The fake BigQuery client used by
+bench_main.py is checked against the SQLite bins too. Also reports how many
+rows each mode returns.
+
+Usage:
+    python benchmarks/check_binned_fetch.py --trials 200
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bq_io import fetch_readings_binned  # noqa: E402
+from features import RAW_SENSOR_COLS, resample_to_grid, grid_from_bins  # noqa: E402
+from fakes import FakeBigQueryClient  # noqa: E402
+
+FIELDS_SQL = ",\n".join(f"MAX(CASE WHEN field = '{c}' THEN value END) AS {c}" for c in RAW_SENSOR_COLS)
+
+# Timestamps are stored as integer microseconds (BigQuery TIMESTAMP precision)
+RAW_SQL = f"""
+SELECT ts_us, {FIELDS_SQL}
+FROM readings
+WHERE ts_us BETWEEN :start AND :end AND zoneId = :zone
+GROUP BY ts_us
+ORDER BY ts_us
+"""
+
+BINNED_SQL = f"""
+WITH per_ts AS (
+  SELECT ts_us, {FIELDS_SQL}
+  FROM readings
+  WHERE ts_us BETWEEN :start AND :end AND zoneId = :zone
+  GROUP BY ts_us
+)
+SELECT
+  ((ts_us / 1000000) / :bin_seconds) * :bin_seconds AS bin_start_s,
+  {", ".join(f"AVG({c}) AS {c}" for c in RAW_SENSOR_COLS)},
+  COUNT(temperature) AS n_temperature,
+  COUNT(*) AS n_timestamps,
+  MAX(ts_us) AS last_ts_us
+FROM per_ts
+GROUP BY bin_start_s
+ORDER BY bin_start_s
+"""
+
+
+def random_readings(rng, zone: str, start: pd.Timestamp, hours: int) -> pd.DataFrame:
+    n = int(hours * 60 / rng.choice([1, 5, 15]))
+    offsets = np.sort(rng.integers(0, hours * 3600 * 10**6, n))
+    # Duplicate some timestamps (two sensors reporting the same instant)
+    offsets = np.concatenate([offsets, rng.choice(offsets, n // 20)])
+    # Knock out a couple of multi-hour gaps
+    for _ in range(int(rng.integers(0, 3))):
+        a = int(rng.integers(0, hours * 3600 * 10**6))
+        offsets = offsets[(offsets < a) | (offsets > a + int(rng.integers(1, 4)) * 3600 * 10**6)]
+    rows = []
+    for off in offsets:
+        for c in RAW_SENSOR_COLS:
+            if rng.random() < 0.9:
+                rows.append((zone, int(start.value // 1000 + off), c, float(rng.normal(40, 10))))
+    return pd.DataFrame(rows, columns=["zoneId", "ts_us", "field", "value"])
+
+
+def _to_utc(us) -> pd.Series:
+    return pd.to_datetime(pd.Series(us, dtype="int64"), unit="us", utc=True)
+
+
+def run_trial(rng, con, minutes: int, lookback_hours: int, trial: int) -> dict:
+    zone = f"z{trial}"
+    start = pd.Timestamp("2026-01-10T00:00:00Z") + pd.Timedelta(seconds=int(rng.integers(0, 86400)))
+    long = random_readings(rng, zone, start, lookback_hours + 6)
+    long.to_sql("readings", con, if_exists="append", index=False)
+
+    end = start + pd.Timedelta(hours=lookback_hours + 6)
+    params = {"start": start.value // 1000, "end": end.value // 1000, "zone": zone, "bin_seconds": minutes * 60}
+
+    raw = pd.read_sql_query(RAW_SQL, con, params=params)
+    raw.insert(0, "timestamp", _to_utc(raw.pop("ts_us")))
+
+    bins = pd.read_sql_query(BINNED_SQL, con, params=params)
+    bins.insert(0, "bin_start", pd.to_datetime(bins.pop("bin_start_s"), unit="s", utc=True))
+    bins["last_ts"] = _to_utc(bins.pop("last_ts_us"))
+
+    n_steps = int(lookback_hours * 60 / minutes)
+    now = raw["timestamp"].max()
+    assert now == bins["last_ts"].max()
+
+    g_raw, m_raw = resample_to_grid(raw, minutes, end_utc=now, required_steps=n_steps)
+    g_bin, m_bin = grid_from_bins(bins, minutes, end_utc=now, required_steps=n_steps)
+
+    ok = (
+        m_raw == m_bin
+        and g_raw["timestamp"].equals(g_bin["timestamp"])
+        and np.allclose(g_raw[RAW_SENSOR_COLS].to_numpy(float), g_bin[RAW_SENSOR_COLS].to_numpy(float),
+                        rtol=1e-12, atol=1e-9, equal_nan=True)
+    )
+    return {"ok": bool(ok), "raw_rows": len(raw), "binned_rows": len(bins), "zone": zone,
+            "long": long, "bins": bins, "params": params}
+
+
+def check_fake_client(trial: dict, minutes: int) -> bool:
+    """The bench fake's binned handler must agree with the SQLite bins."""
+    long = trial["long"].assign(timestamp=lambda d: _to_utc(d["ts_us"]).to_numpy()).drop(columns="ts_us")
+    fake = FakeBigQueryClient(long)
+    cfg = SimpleNamespace(
+        project_id="p", dataset="d", readings_table="readings", zone_id=trial["zone"], interval_minutes=minutes
+    )
+    got = fetch_readings_binned(
+        fake, cfg,
+        start_utc=pd.Timestamp(trial["params"]["start"], unit="us", tz="UTC"),
+        end_utc=pd.Timestamp(trial["params"]["end"], unit="us", tz="UTC"),
+    )
+    want = trial["bins"]
+    return (
+        len(got) == len(want)
+        and got["bin_start"].reset_index(drop=True).equals(want["bin_start"])
+        and (got["n_temperature"].to_numpy() == want["n_temperature"].to_numpy()).all()
+        and np.allclose(got[RAW_SENSOR_COLS].to_numpy(float), want[RAW_SENSOR_COLS].to_numpy(float), equal_nan=True)
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--trials", type=int, default=100)
+    ap.add_argument("--interval-minutes", type=int, default=15)
+    ap.add_argument("--lookback-hours", type=int, default=72)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    con = sqlite3.connect(":memory:")
+    failures, fake_failures, raw_rows, binned_rows = [], [], [], []
+    for i in range(args.trials):
+        t = run_trial(rng, con, args.interval_minutes, args.lookback_hours, i)
+        raw_rows.append(t["raw_rows"])
+        binned_rows.append(t["binned_rows"])
+        if not t["ok"]:
+            failures.append(i)
+        if i < 10 and not check_fake_client(t, args.interval_minutes):
+            fake_failures.append(i)
+
+    print(json.dumps({
+        "trials": args.trials,
+        "mismatched_trials": failures,
+        "fake_client_mismatches": fake_failures,
+        "mean_raw_rows": round(float(np.mean(raw_rows)), 1),
+        "mean_binned_rows": round(float(np.mean(binned_rows)), 1),
+    }, indent=2))
+    if failures or fake_failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
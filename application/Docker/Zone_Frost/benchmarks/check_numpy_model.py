@@ -0,0 +1,133 @@
+"""
+Offline equivalence check for the NumPy FrostMLP runtime (model_numpy.py).
+
+Trains randomly initialised FrostMLPs for a few AdamW steps (so LayerNorm
+affine parameters move off their defaults), round-trips their state_dict
+through export_npz / NumpyFrostMLP.from_npz, and compares the predicted
+probability with torch's on random inputs across several scales. The
+largest absolute difference must stay below --tol.
+
+Also times a cold predict in fresh interpreters both ways (import + load
+weights + one forward pass) and reports the peak RSS of each.
+
+Usage:
+    python benchmarks/check_numpy_model.py --trials 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import torch  # noqa: E402
+import torch.nn.functional as F  # noqa: E402
+
+from model import FrostMLP  # noqa: E402
+from model_numpy import NumpyFrostMLP, export_npz  # noqa: E402
+
+# VmHWM, not ru_maxrss: the latter carries over the parent's peak through fork/exec
+PEAK_RSS = """
+def peak_rss_mb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024.0
+"""
+
+COLD_NUMPY = PEAK_RSS + """
+import sys, time
+t0 = time.perf_counter()
+import numpy as np
+from model_numpy import NumpyFrostMLP
+m = NumpyFrostMLP.from_npz(sys.argv[1])
+p = m.predict_proba(np.ones(m.input_dim))
+print(time.perf_counter() - t0, peak_rss_mb(), "torch" in sys.modules)
+"""
+
+COLD_TORCH = PEAK_RSS + """
+import sys, time
+t0 = time.perf_counter()
+import torch
+from model import FrostMLP
+state = torch.load(sys.argv[1], map_location="cpu", weights_only=True)
+m = FrostMLP(input_dim=state["model"]["net.0.weight"].shape[1])
+m.load_state_dict(state["model"])
+m.eval()
+with torch.no_grad():
+    p = torch.sigmoid(m(torch.ones(1, m.net[0].in_features))).item()
+print(time.perf_counter() - t0, peak_rss_mb(), "torch" in sys.modules)
+"""
+
+
+def trained_model(rng, input_dim: int, steps: int) -> FrostMLP:
+    model = FrostMLP(input_dim=input_dim)
+    opt = torch.optim.AdamW(model.parameters(), lr=1e-2)
+    for _ in range(steps):
+        x = torch.from_numpy(rng.normal(0, 3, (1, input_dim)).astype(np.float32))
+        y = torch.tensor([[float(rng.random() < 0.3)]])
+        opt.zero_grad()
+        F.binary_cross_entropy_with_logits(model(x), y).backward()
+        opt.step()
+    return model.eval()
+
+
+def max_diff(rng, model: FrostMLP, inputs: int) -> float:
+    npm = NumpyFrostMLP.from_npz(export_npz(model.state_dict()))
+    worst = 0.0
+    for _ in range(inputs):
+        x_np = rng.normal(0, 1, model.net[0].in_features) * rng.choice([0.01, 1.0, 10.0, 1000.0])
+        with torch.no_grad():
+            want = torch.sigmoid(model(torch.from_numpy(x_np.astype(np.float32)).unsqueeze(0))).item()
+        worst = max(worst, abs(want - npm.predict_proba(x_np)))
+    return worst
+
+
+def cold_start(model: FrostMLP) -> dict:
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        npz_path = os.path.join(tmp, "w.npz")
+        pt_path = os.path.join(tmp, "s.pt")
+        with open(npz_path, "wb") as f:
+            f.write(export_npz(model.state_dict()))
+        torch.save({"model": model.state_dict()}, pt_path)
+        for name, code, path in (("numpy", COLD_NUMPY, npz_path), ("torch", COLD_TORCH, pt_path)):
+            proc = subprocess.run([sys.executable, "-c", code, path], capture_output=True, text=True, cwd=ROOT, check=True)
+            secs, rss, torch_loaded = proc.stdout.split()
+            out[name] = {"cold_s": round(float(secs), 3), "peak_rss_mb": round(float(rss), 1),
+                         "torch_loaded": torch_loaded == "True"}
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--trials", type=int, default=10)
+    ap.add_argument("--inputs", type=int, default=100, help="random inputs per model")
+    ap.add_argument("--train-steps", type=int, default=20)
+    ap.add_argument("--tol", type=float, default=1e-6)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    torch.manual_seed(args.seed)
+    diffs = []
+    for _ in range(args.trials):
+        model = trained_model(rng, int(rng.choice([16, 303, 1215])), args.train_steps)
+        diffs.append(max_diff(rng, model, args.inputs))
+
+    worst = float(max(diffs))
+    print(json.dumps({
+        "trials": args.trials,
+        "max_abs_prob_diff": worst,
+        "tol": args.tol,
+        "cold_predict": cold_start(model),
+    }, indent=2))
+    if worst > args.tol:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+In-memory stand-ins for google.cloud.bigquery.Client and storage.Client.
+
+They understand exactly the SQL shapes bq_io.py issues (recognised by the
+query text, with parameters read from the QueryJobConfig), so main.py runs
+unmodified against them. Every query is counted by kind.
+"""
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from google.api_core.exceptions import NotFound, NotModified, PreconditionFailed
+
+from features import RAW_SENSOR_COLS
+
+PREDICTION_COLS = [
+    "timestamp", "zoneId", "probability", "probability_percent", "model_version",
+    "features_hash", "trained_on_label", "label_frost_observed", "label_window_start",
+    "label_window_end", "skipped_reason", "ingest_id", "triggered_at",
+    "horizon_probabilities", "horizon_labels",
+]
+STATUS_COLS = [
+    "trained_on_label", "skipped_reason", "label_frost_observed", "label_window_start", "label_window_end",
+    "horizon_labels",
+]
+
+
+def _utc(v) -> pd.Timestamp:
+    t = pd.Timestamp(v)
+    return t.tz_convert("UTC") if t.tzinfo else t.tz_localize("UTC")
+
+
+def _params(job_config) -> dict:
+    out = {}
+    for p in (job_config.query_parameters if job_config is not None else []):
+        if hasattr(p, "values"):
+            out[p.name] = [v.struct_values if hasattr(v, "struct_values") else v for v in p.values]
+        else:
+            out[p.name] = p.value
+    return out
+
+
+def _zones(p: dict) -> list[str]:
+    return list(p["zones"]) if "zones" in p else [p["zoneId"]]
+
+
+class FakeQueryJob:
+    def __init__(self, df: pd.DataFrame | None = None, affected: int | None = None):
+        self._df = df if df is not None else pd.DataFrame()
+        self.num_dml_affected_rows = affected
+        self.total_bytes_processed = int(self._df.memory_usage(index=False).sum())
+        self.total_bytes_billed = self.total_bytes_processed
+        self.slot_millis = 0
+        self.cache_hit = False
+        self.job_id = "fake"
+
+    def result(self, **kwargs):
+        return self
+
+    def to_dataframe(self, **kwargs) -> pd.DataFrame:
+        return self._df.copy()
+
+
+class FakeBigQueryClient:
+    """
+    readings:      long format (zoneId, timestamp, field, value), as in sensor_data.readings
+    predictions:   prediction rows (PREDICTION_COLS)
+    shadow_rows:   rows inserted into the shadow table, as JSON dicts
+    interventions: candle events (zoneId, timestamp, candlesOn)
+    """
+
+    def __init__(
+        self,
+        readings: pd.DataFrame,
+        predictions: pd.DataFrame | None = None,
+        interventions: pd.DataFrame | None = None,
+    ):
+        readings = readings[readings["field"].isin(RAW_SENSOR_COLS)].copy()
+        readings["timestamp"] = pd.to_datetime(readings["timestamp"], utc=True)
+        wide = readings.pivot_table(
+            index=["zoneId", "timestamp"], columns="field", values="value", aggfunc="max"
+        ).reset_index()
+        for c in RAW_SENSOR_COLS:
+            if c not in wide.columns:
+                wide[c] = np.nan
+        # Pre-pivoted and sorted per zone so the fake itself stays cheap next to main.py
+        self._readings = {
+            str(z): df[["timestamp"] + RAW_SENSOR_COLS].sort_values("timestamp").reset_index(drop=True)
+            for z, df in wide.groupby("zoneId", sort=False)
+        }
+        self.predictions = (
+            predictions.reindex(columns=PREDICTION_COLS) if predictions is not None
+            else pd.DataFrame(columns=PREDICTION_COLS)
+        )
+        self.predictions["timestamp"] = pd.to_datetime(self.predictions["timestamp"], utc=True)
+        self.interventions = (
+            interventions if interventions is not None
+            else pd.DataFrame(columns=["zoneId", "timestamp", "candlesOn"])
+        )
+        self.query_counts = Counter()
+        self.rows_inserted = 0
+        self.shadow_rows: list[dict] = []
+
+    # --- query routing -------------------------------------------------
+
+    def query(self, query: str, job_config=None, **kwargs) -> FakeQueryJob:
+        p = _params(job_config)
+        q = " ".join(query.split())
+        for kind, match, handler in (
+            ("merge_status", lambda: q.startswith("MERGE"), self._merge_status),
+            ("update_status", lambda: q.startswith("UPDATE"), self._update_status),
+            ("missing_rows", lambda: "IN UNNEST(@pred_ts)" in q, self._missing_rows),
+            ("readings_binned", lambda: "@bin_seconds" in q, self._readings_binned),
+            ("readings", lambda: "MAX(IF(field" in q, self._readings_query),
+            ("latest", lambda: "AS latest_ts" in q, self._latest),
+            ("last_prediction", lambda: "AS last_prediction_ts" in q, self._last_prediction),
+            ("candles", lambda: "candlesOn" in q, self._candles),
+            ("ingest", lambda: "ingest_id = @ingest_id" in q, self._ingest),
+            ("backlog", lambda: "trained_on_label IS NULL" in q and "@now" in q, self._backlog),
+        ):
+            if match():
+                self.query_counts[kind] += 1
+                return handler(q, p)
+        raise NotImplementedError(f"FakeBigQueryClient does not understand: {q[:120]}")
+
+    def insert_rows_json(self, table_id: str, rows: list[dict]) -> list:
+        if "shadow" in table_id:
+            # SHADOW_MODELS side table: kept as inserted
+            self.shadow_rows += rows
+            self.query_counts["insert_shadow"] += 1
+            return []
+        new = pd.DataFrame(rows).reindex(columns=PREDICTION_COLS)
+        new["timestamp"] = pd.to_datetime(new["timestamp"], utc=True)
+        self.predictions = pd.concat([self.predictions, new], ignore_index=True) if len(self.predictions) else new
+        self.query_counts["insert"] += 1
+        self.rows_inserted += len(rows)
+        return []
+
+    # --- handlers ------------------------------------------------------
+
+    def _readings_query(self, q: str, p: dict) -> FakeQueryJob:
+        start, end = _utc(p["start"]), _utc(p["end"])
+        parts = []
+        for z in _zones(p):
+            df = self._readings.get(z)
+            if df is None:
+                continue
+            lo = df["timestamp"].searchsorted(start, side="left")
+            hi = df["timestamp"].searchsorted(end, side="right")
+            part = df.iloc[lo:hi]
+            if "zones" in p:
+                part = part.assign(zoneId=z)[["zoneId", "timestamp"] + RAW_SENSOR_COLS]
+            parts.append(part)
+        cols = (["zoneId"] if "zones" in p else []) + ["timestamp"] + RAW_SENSOR_COLS
+        out = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=cols)
+        return FakeQueryJob(out)
+
+    def _readings_binned(self, q: str, p: dict) -> FakeQueryJob:
+        df = self._readings_query(q, p).to_dataframe()
+        cols = ["bin_start"] + RAW_SENSOR_COLS + ["n_temperature", "n_timestamps", "last_ts"]
+        if df.empty:
+            return FakeQueryJob(pd.DataFrame(columns=cols))
+        secs = df["timestamp"].astype("int64") // 10**9
+        df["bin_start"] = pd.to_datetime((secs // p["bin_seconds"]) * p["bin_seconds"], unit="s", utc=True)
+        g = df.groupby("bin_start", sort=True)
+        out = g[RAW_SENSOR_COLS].mean()
+        out["n_temperature"] = g["temperature"].count()
+        out["n_timestamps"] = g.size()
+        out["last_ts"] = g["timestamp"].max()
+        return FakeQueryJob(out.reset_index()[cols])
+
+    def _latest(self, q: str, p: dict) -> FakeQueryJob:
+        start, end = _utc(p["start"]), _utc(p["end"])
+        rows = []
+        for z in _zones(p):
+            ts = self._readings.get(z, pd.DataFrame(columns=["timestamp"]))["timestamp"]
+            ts = ts[(ts >= start) & (ts <= end)]
+            if len(ts):
+                rows.append({"zoneId": z, "latest_ts": ts.max()})
+        return FakeQueryJob(pd.DataFrame(rows, columns=["zoneId", "latest_ts"]))
+
+    def _last_prediction(self, q: str, p: dict) -> FakeQueryJob:
+        d = self.predictions
+        d = d[d["zoneId"].isin(_zones(p))]
+        out = d.groupby("zoneId", sort=False)["timestamp"].max().rename("last_prediction_ts").reset_index()
+        return FakeQueryJob(out)
+
+    def _candles(self, q: str, p: dict) -> FakeQueryJob:
+        c = self.interventions[self.interventions["zoneId"].isin(_zones(p))]
+        if "since" in p:
+            since = _utc(p["since"])
+        else:
+            hours = int(re.search(r"INTERVAL (\d+) HOUR", q).group(1))
+            since = pd.Timestamp.now(tz="UTC") - pd.Timedelta(hours=hours)
+        c = c[c["timestamp"] >= since].sort_values(["zoneId", "timestamp"], kind="stable")
+        cols = (["zoneId"] if "zones" in p else []) + ["timestamp", "candlesOn"]
+        return FakeQueryJob(c[cols].reset_index(drop=True))
+
+    def _ingest(self, q: str, p: dict) -> FakeQueryJob:
+        d = self.predictions
+        d = d[d["zoneId"].isin(_zones(p)) & (d["ingest_id"] == p["ingest_id"])]
+        return FakeQueryJob(d[["zoneId"]].drop_duplicates().reset_index(drop=True))
+
+    def _backlog(self, q: str, p: dict) -> FakeQueryJob:
+        horizon = int(re.search(r"INTERVAL (\d+) MINUTE", q).group(1))
+        limit = int(re.search(r"(?:LIMIT|<=) (\d+)", q.split("MINUTE")[-1]).group(1))
+        d = self.predictions
+        d = d[
+            d["zoneId"].isin(_zones(p))
+            & d["trained_on_label"].isna()
+            & (d["timestamp"] <= _utc(p["now"]) - pd.Timedelta(minutes=horizon))
+        ]
+        if p.get("after") is not None:
+            d = d[d["timestamp"] > _utc(p["after"])]
+        d = d.sort_values(["zoneId", "timestamp"], kind="stable").groupby("zoneId", sort=False).head(limit)
+        return FakeQueryJob(d.reset_index(drop=True))
+
+    def _set_status(self, zone_id: str, pred_ts, values: dict) -> int:
+        m = (self.predictions["zoneId"] == zone_id) & (self.predictions["timestamp"] == _utc(pred_ts))
+        for col in STATUS_COLS:
+            if col not in values:
+                continue  # horizon_labels is only set with extra horizons
+            self.predictions[col] = self.predictions[col].astype(object)
+            self.predictions.loc[m, col] = values[col]
+        return int(m.sum())
+
+    def _merge_status(self, q: str, p: dict) -> FakeQueryJob:
+        n = sum(self._set_status(p["zoneId"], u["pred_ts"], u) for u in p["updates"])
+        return FakeQueryJob(affected=n)
+
+    def _update_status(self, q: str, p: dict) -> FakeQueryJob:
+        return FakeQueryJob(affected=self._set_status(p["zoneId"], p["pred_ts"], p))
+
+    def _missing_rows(self, q: str, p: dict) -> FakeQueryJob:
+        d = self.predictions
+        d = d[(d["zoneId"] == p["zoneId"]) & d["timestamp"].isin([_utc(t) for t in p["pred_ts"]])]
+        return FakeQueryJob(d[["timestamp"]].drop_duplicates().reset_index(drop=True))
+
+
+class FakeBlob:
+    downloads = 0  # class-wide count of full downloads
+
+    def __init__(self, store: dict, name: str):
+        self._store = store
+        self.name = name
+
+    @property
+    def generation(self) -> int | None:
+        entry = self._store.get(self.name)
+        return entry[1] if entry else None
+
+    def exists(self, **kwargs) -> bool:
+        return self.name in self._store
+
+    def download_as_bytes(self, if_generation_not_match=None, **kwargs) -> bytes:
+        if self.name not in self._store:
+            raise NotFound(self.name)
+        data, generation = self._store[self.name]
+        if if_generation_not_match is not None and generation == if_generation_not_match:
+            raise NotModified(self.name)
+        FakeBlob.downloads += 1
+        return data
+
+    def upload_from_file(self, file_obj, rewind: bool = False, if_generation_match=None, **kwargs) -> None:
+        if if_generation_match is not None and (self.generation or 0) != if_generation_match:
+            raise PreconditionFailed(self.name)
+        if rewind:
+            file_obj.seek(0)
+        self._store[self.name] = (file_obj.read(), (self.generation or 0) + 1)
+
+
+class FakeBucket:
+    def __init__(self, store: dict):
+        self._store = store
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self._store, name)
+
+
+class FakeStorageClient:
+    """All buckets share one dict of {blob_name: (bytes, generation)} per bucket name."""
+
+    def __init__(self):
+        self.buckets: dict[str, dict] = {}
+
+    def bucket(self, name: str) -> FakeBucket:
+        return FakeBucket(self.buckets.setdefault(name, {}))
@@ -1,3 +1,5 @@
+import time
+from dataclasses import dataclass
 from typing import Optional, Dict, Any
 import pandas as pd
 import numpy as np
@@ -6,6 +8,12 @@ from google.cloud import bigquery
 from config import Config
 
 
+# Optional STRING (JSON) prediction columns, written with EXTRA_HORIZONS_MINUTES:
+# {horizon_minutes: probability} at insert, {horizon_minutes: label} at resolution
+HORIZON_PROBS_COLUMN = "horizon_probabilities"
+HORIZON_LABELS_COLUMN = "horizon_labels"
+
+
 def bq_table(project: str, dataset: str, table: str) -> str:
     if "." in table:
         return f"`{project}.{table}`"
@@ -18,6 +26,7 @@ def fetch_readings(
     *,
     start_utc: pd.Timestamp | None = None,
     end_utc: pd.Timestamp | None = None,
+    allow_empty: bool = False,
 ) -> pd.DataFrame:
     if end_utc is None:
         end_utc = pd.Timestamp.now(tz="UTC")
@@ -52,11 +61,176 @@ def fetch_readings(
     )
     df = job.to_dataframe()
     if df.empty:
+        if allow_empty:
+            return df
         raise RuntimeError("No sensor data returned for this zone in the requested window.")
     df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
     return df
 
 
+def fetch_readings_binned(
+    bq: bigquery.Client,
+    cfg: Config,
+    *,
+    start_utc: pd.Timestamp,
+    end_utc: pd.Timestamp,
+) -> pd.DataFrame:
+    """
+    Readings already averaged into cfg.interval_minutes bins by BigQuery.
+
+    Same per-timestamp pivot as fetch_readings, then AVG per bin, so at most
+    one row per bin comes back instead of every raw timestamp. Columns:
+      bin_start, RAW_SENSOR_COLS (bin means), n_temperature (real temperature
+      points in the bin), n_timestamps, last_ts (newest reading in the bin).
+    Feed to features.grid_from_bins; bins are aligned like pandas resample.
+    """
+    query = f"""
+    WITH per_ts AS (
+      SELECT
+        timestamp,
+        MAX(IF(field = "temperature", value, NULL)) AS temperature,
+        MAX(IF(field = "humidity", value, NULL)) AS humidity,
+        MAX(IF(field = "soilMoisture", value, NULL)) AS soilMoisture,
+        MAX(IF(field = "soilTemperature", value, NULL)) AS soilTemperature,
+        MAX(IF(field = "light", value, NULL)) AS light
+      FROM {bq_table(cfg.project_id, cfg.dataset, cfg.readings_table)}
+      WHERE
+        timestamp BETWEEN @start AND @end
+        AND field IN ("temperature", "humidity", "soilMoisture", "soilTemperature", "light")
+        AND zoneId = @zoneId
+      GROUP BY timestamp
+    )
+    SELECT
+      TIMESTAMP_SECONDS(DIV(UNIX_SECONDS(timestamp), @bin_seconds) * @bin_seconds) AS bin_start,
+      AVG(temperature) AS temperature,
+      AVG(humidity) AS humidity,
+      AVG(soilMoisture) AS soilMoisture,
+      AVG(soilTemperature) AS soilTemperature,
+      AVG(light) AS light,
+      COUNT(temperature) AS n_temperature,
+      COUNT(*) AS n_timestamps,
+      MAX(timestamp) AS last_ts
+    FROM per_ts
+    GROUP BY bin_start
+    ORDER BY bin_start
+    """
+    job = bq.query(
+        query,
+        job_config=bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("zoneId", "STRING", cfg.zone_id),
+                bigquery.ScalarQueryParameter("start", "TIMESTAMP", start_utc.to_pydatetime()),
+                bigquery.ScalarQueryParameter("end", "TIMESTAMP", end_utc.to_pydatetime()),
+                bigquery.ScalarQueryParameter("bin_seconds", "INT64", int(cfg.interval_minutes) * 60),
+            ]
+        ),
+    )
+    df = job.to_dataframe()
+    if df.empty:
+        raise RuntimeError("No sensor data returned for this zone in the requested window.")
+    df["bin_start"] = pd.to_datetime(df["bin_start"], utc=True)
+    df["last_ts"] = pd.to_datetime(df["last_ts"], utc=True)
+    return df
+
+
+def fetch_readings_for_zones(
+    bq: bigquery.Client,
+    cfg: Config,
+    zone_ids: list[str],
+    *,
+    start_utc: pd.Timestamp,
+    end_utc: pd.Timestamp,
+) -> dict[str, pd.DataFrame]:
+    """
+    Batch variant of fetch_readings: one query for every zone in zone_ids.
+
+    Returns {zoneId: readings_df} with the same columns as fetch_readings.
+    Zones without any readings in the window are absent from the result.
+    """
+    query = f"""
+    SELECT
+      zoneId,
+      timestamp,
+      MAX(IF(field = "temperature", value, NULL)) AS temperature,
+      MAX(IF(field = "humidity", value, NULL)) AS humidity,
+      MAX(IF(field = "soilMoisture", value, NULL)) AS soilMoisture,
+      MAX(IF(field = "soilTemperature", value, NULL)) AS soilTemperature,
+      MAX(IF(field = "light", value, NULL)) AS light
+    FROM {bq_table(cfg.project_id, cfg.dataset, cfg.readings_table)}
+    WHERE
+      timestamp BETWEEN @start AND @end
+      AND field IN ("temperature", "humidity", "soilMoisture", "soilTemperature", "light")
+      AND zoneId IN UNNEST(@zones)
+    GROUP BY zoneId, timestamp
+    ORDER BY zoneId, timestamp
+    """
+    job = bq.query(
+        query,
+        job_config=bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("zones", "STRING", list(zone_ids)),
+                bigquery.ScalarQueryParameter("start", "TIMESTAMP", start_utc.to_pydatetime()),
+                bigquery.ScalarQueryParameter("end", "TIMESTAMP", end_utc.to_pydatetime()),
+            ]
+        ),
+    )
+    df = job.to_dataframe()
+    if df.empty:
+        return {}
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    return {
+        str(zone_id): zone_df.drop(columns=["zoneId"]).reset_index(drop=True)
+        for zone_id, zone_df in df.groupby("zoneId", sort=False)
+    }
+
+
+def fetch_latest_reading_time(
+    bq: bigquery.Client,
+    cfg: Config,
+    *,
+    start_utc: pd.Timestamp,
+    end_utc: pd.Timestamp,
+) -> pd.Timestamp | None:
+    """
+    Newest reading timestamp in [start_utc, end_utc] (the sensor-time now a
+    run over that window would use), or None without readings. Aggregates
+    server-side: one row back, however many readings.
+    """
+    return fetch_latest_reading_time_for_zones(bq, cfg, [cfg.zone_id], start_utc=start_utc, end_utc=end_utc).get(cfg.zone_id)
+
+
+def fetch_latest_reading_time_for_zones(
+    bq: bigquery.Client,
+    cfg: Config,
+    zone_ids: list[str],
+    *,
+    start_utc: pd.Timestamp,
+    end_utc: pd.Timestamp,
+) -> dict[str, pd.Timestamp]:
+    """Batch variant of fetch_latest_reading_time: {zoneId: newest reading}, zones without readings absent."""
+    query = f"""
+    SELECT zoneId, MAX(timestamp) AS latest_ts
+    FROM {bq_table(cfg.project_id, cfg.dataset, cfg.readings_table)}
+    WHERE
+      timestamp BETWEEN @start AND @end
+      AND field IN ("temperature", "humidity", "soilMoisture", "soilTemperature", "light")
+      AND zoneId IN UNNEST(@zones)
+    GROUP BY zoneId
+    """
+    job = bq.query(
+        query,
+        job_config=bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("zones", "STRING", list(zone_ids)),
+                bigquery.ScalarQueryParameter("start", "TIMESTAMP", start_utc.to_pydatetime()),
+                bigquery.ScalarQueryParameter("end", "TIMESTAMP", end_utc.to_pydatetime()),
+            ]
+        ),
+    )
+    df = job.to_dataframe()
+    return {str(z): pd.to_datetime(t, utc=True) for z, t in zip(df["zoneId"], df["latest_ts"])} if not df.empty else {}
+
+
 def fetch_prediction_near_time(
     bq: bigquery.Client,
     cfg: Config,
@@ -123,6 +297,40 @@ def fetch_candle_events(bq: bigquery.Client, cfg: Config, hours: int = 6) -> pd.
     return df
 
 
+def fetch_candle_events_for_zones(
+    bq: bigquery.Client,
+    cfg: Config,
+    zone_ids: list[str],
+    since_utc: pd.Timestamp,
+) -> pd.DataFrame:
+    """
+    Batch variant of fetch_candle_events: candle events for every zone in zone_ids
+    at or after since_utc, with a zoneId column.
+    """
+    query = f"""
+    SELECT zoneId, timestamp, candlesOn
+    FROM {bq_table(cfg.project_id, cfg.dataset, cfg.interventions_table)}
+    WHERE zoneId IN UNNEST(@zones)
+      AND timestamp >= @since
+    ORDER BY zoneId, timestamp
+    """
+    job = bq.query(
+        query,
+        job_config=bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("zones", "STRING", list(zone_ids)),
+                bigquery.ScalarQueryParameter("since", "TIMESTAMP", since_utc.to_pydatetime()),
+            ]
+        ),
+    )
+    df = job.to_dataframe()
+    if df.empty:
+        return pd.DataFrame(columns=["zoneId", "timestamp", "candlesOn"])
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    df["candlesOn"] = df["candlesOn"].astype(bool)
+    return df
+
+
 def latest_candles_on(candle_df: pd.DataFrame, t_utc: pd.Timestamp) -> bool:
     if candle_df.empty:
         return False
@@ -158,9 +366,25 @@ def _jsonify_row(row: dict) -> dict:
     return out
 
 def insert_prediction_row(bq: bigquery.Client, cfg: Config, row: dict) -> None:
+    insert_prediction_rows(bq, cfg, [row])
+
+
+def insert_prediction_rows(bq: bigquery.Client, cfg: Config, rows: list[dict]) -> None:
+    """Several prediction rows in one streaming insert (gap fill)."""
+    if not rows:
+        return
     table_id = f"{cfg.project_id}.{cfg.dataset}.{cfg.predictions_table}" if "." not in cfg.predictions_table else f"{cfg.project_id}.{cfg.predictions_table}"
-    json_row = _jsonify_row(row)
-    errors = bq.insert_rows_json(table_id, [json_row])
+    errors = bq.insert_rows_json(table_id, [_jsonify_row(row) for row in rows])
+    if errors:
+        raise RuntimeError(f"BigQuery insert errors: {errors}")
+
+
+def insert_shadow_rows(bq: bigquery.Client, cfg: Config, rows: list[dict]) -> None:
+    """Shadow model rows (SHADOW_MODELS) in one streaming insert into cfg.shadow_table."""
+    if not rows:
+        return
+    table_id = f"{cfg.project_id}.{cfg.dataset}.{cfg.shadow_table}" if "." not in cfg.shadow_table else f"{cfg.project_id}.{cfg.shadow_table}"
+    errors = bq.insert_rows_json(table_id, [_jsonify_row(row) for row in rows])
     if errors:
         raise RuntimeError(f"BigQuery insert errors: {errors}")
 
@@ -190,26 +414,125 @@ def has_processed_ingest(bq: bigquery.Client, cfg: Config) -> bool:
     return not df.empty
 
 
+def fetch_last_prediction_time(bq: bigquery.Client, cfg: Config) -> pd.Timestamp | None:
+    """Timestamp of the zone's newest prediction row (skip rows included) in the last 30 days, or None."""
+    return fetch_last_prediction_time_for_zones(bq, cfg, [cfg.zone_id]).get(cfg.zone_id)
+
+
+def fetch_last_prediction_time_for_zones(bq: bigquery.Client, cfg: Config, zone_ids: list[str]) -> dict[str, pd.Timestamp]:
+    """Batch variant of fetch_last_prediction_time: {zoneId: newest row}, zones without one absent."""
+    query = f"""
+    SELECT zoneId, MAX(timestamp) AS last_prediction_ts
+    FROM {bq_table(cfg.project_id, cfg.dataset, cfg.predictions_table)}
+    WHERE zoneId IN UNNEST(@zones)
+    AND timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 30 DAY)
+    GROUP BY zoneId
+    """
+    job = bq.query(
+        query,
+        job_config=bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("zones", "STRING", list(zone_ids)),
+            ]
+        ),
+    )
+    df = job.to_dataframe()
+    return {str(z): pd.to_datetime(t, utc=True) for z, t in zip(df["zoneId"], df["last_prediction_ts"])} if not df.empty else {}
+
+
+def fetch_processed_ingest_zones(bq: bigquery.Client, cfg: Config, zone_ids: list[str]) -> set[str]:
+    """
+    Batch variant of has_processed_ingest: the subset of zone_ids that already
+    have a prediction row for cfg.ingest_id.
+    """
+    if not cfg.ingest_id:
+        return set()
+
+    query = f"""
+    SELECT DISTINCT zoneId
+    FROM {bq_table(cfg.project_id, cfg.dataset, cfg.predictions_table)}
+    WHERE zoneId IN UNNEST(@zones)
+    AND ingest_id = @ingest_id
+    AND timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 30 DAY)
+    """
+    job = bq.query(
+        query,
+        job_config=bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("zones", "STRING", list(zone_ids)),
+                bigquery.ScalarQueryParameter("ingest_id", "STRING", cfg.ingest_id),
+            ]
+        ),
+    )
+    df = job.to_dataframe()
+    return set(df["zoneId"].astype(str)) if not df.empty else set()
+
+
 def fetch_untrained_matured_predictions(
     bq: bigquery.Client,
     cfg: Config,
     now: pd.Timestamp,
     limit: int = 50,
+    after: pd.Timestamp | None = None,
 ) -> pd.DataFrame:
+    """
+    The oldest `limit` matured, untrained rows; with `after`, only rows newer
+    than it (the next page of the backlog).
+    """
+    params = [
+        bigquery.ScalarQueryParameter("zoneId", "STRING", cfg.zone_id),
+        bigquery.ScalarQueryParameter("now", "TIMESTAMP", now.to_pydatetime()),
+    ]
+    after_sql = ""
+    if after is not None:
+        after_sql = "AND timestamp > @after"
+        params.append(bigquery.ScalarQueryParameter("after", "TIMESTAMP", after.to_pydatetime()))
     query = f"""
     SELECT *
     FROM {bq_table(cfg.project_id, cfg.dataset, cfg.predictions_table)}
     WHERE zoneId = @zoneId
       AND trained_on_label IS NULL
       AND timestamp <= TIMESTAMP_SUB(@now, INTERVAL {cfg.horizon_minutes} MINUTE)
+      {after_sql}
     ORDER BY timestamp ASC
     LIMIT {limit}
     """
+    job = bq.query(query, job_config=bigquery.QueryJobConfig(query_parameters=params))
+    df = job.to_dataframe()
+    if df.empty:
+        return df
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    return df
+
+
+def fetch_untrained_matured_predictions_for_zones(
+    bq: bigquery.Client,
+    cfg: Config,
+    zone_ids: list[str],
+    now: pd.Timestamp,
+    limit: int = 50,
+) -> pd.DataFrame:
+    """
+    Batch variant of fetch_untrained_matured_predictions: the oldest `limit`
+    matured, untrained rows per zone.
+
+    Rows are ordered by timestamp within each zone, so filtering a zone's rows to
+    an earlier `now` yields exactly what the single-zone query would return for it.
+    """
+    query = f"""
+    SELECT *
+    FROM {bq_table(cfg.project_id, cfg.dataset, cfg.predictions_table)}
+    WHERE zoneId IN UNNEST(@zones)
+      AND trained_on_label IS NULL
+      AND timestamp <= TIMESTAMP_SUB(@now, INTERVAL {cfg.horizon_minutes} MINUTE)
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY zoneId ORDER BY timestamp ASC) <= {limit}
+    ORDER BY zoneId, timestamp ASC
+    """
     job = bq.query(
         query,
         job_config=bigquery.QueryJobConfig(
             query_parameters=[
-                bigquery.ScalarQueryParameter("zoneId", "STRING", cfg.zone_id),
+                bigquery.ArrayQueryParameter("zones", "STRING", list(zone_ids)),
                 bigquery.ScalarQueryParameter("now", "TIMESTAMP", now.to_pydatetime()),
             ]
         ),
@@ -230,7 +553,13 @@ def update_prediction_training_status(
     label_frost_observed: int | None,
     label_window_start_utc: pd.Timestamp | None,
     label_window_end_utc: pd.Timestamp | None,
+    horizon_labels: str | None = None,
 ) -> None:
+    horizons_sql = ""
+    extra_params = []
+    if cfg.extra_horizons_minutes:
+        horizons_sql = f",\n      {HORIZON_LABELS_COLUMN} = @horizon_labels"
+        extra_params.append(bigquery.ScalarQueryParameter("horizon_labels", "STRING", horizon_labels))
     query = f"""
     UPDATE {bq_table(cfg.project_id, cfg.dataset, cfg.predictions_table)}
     SET
@@ -238,7 +567,7 @@ def update_prediction_training_status(
       skipped_reason = @skipped_reason,
       label_frost_observed = @label_frost_observed,
       label_window_start = @label_window_start,
-      label_window_end = @label_window_end
+      label_window_end = @label_window_end{horizons_sql}
     WHERE zoneId = @zoneId
       AND timestamp = @pred_ts
     """
@@ -246,6 +575,7 @@ def update_prediction_training_status(
         query,
         job_config=bigquery.QueryJobConfig(
             query_parameters=[
+                *extra_params,
                 bigquery.ScalarQueryParameter("trained_on_label", "BOOL", trained_on_label),
                 bigquery.ScalarQueryParameter("skipped_reason", "STRING", skipped_reason),
                 bigquery.ScalarQueryParameter("label_frost_observed", "INT64", label_frost_observed),
@@ -266,3 +596,151 @@ def update_prediction_training_status(
     )
     job.result()  # wait; raises on failure
 
+
+
+@dataclass
+class TrainingStatusUpdate:
+    """One backlog resolution; fields mirror update_prediction_training_status."""
+    pred_timestamp_utc: pd.Timestamp
+    trained_on_label: bool
+    skipped_reason: str | None
+    label_frost_observed: int | None
+    label_window_start_utc: pd.Timestamp | None
+    label_window_end_utc: pd.Timestamp | None
+    # JSON {horizon_minutes: label}, written to HORIZON_LABELS_COLUMN with extra horizons
+    horizon_labels: str | None = None
+
+
+def _ts_or_none(t: pd.Timestamp | None):
+    return t.to_pydatetime() if t is not None else None
+
+
+def _status_struct(u: TrainingStatusUpdate, horizons: bool = False) -> bigquery.StructQueryParameter:
+    fields = [
+        bigquery.ScalarQueryParameter("pred_ts", "TIMESTAMP", u.pred_timestamp_utc.to_pydatetime()),
+        bigquery.ScalarQueryParameter("trained_on_label", "BOOL", u.trained_on_label),
+        bigquery.ScalarQueryParameter("skipped_reason", "STRING", u.skipped_reason),
+        bigquery.ScalarQueryParameter("label_frost_observed", "INT64", u.label_frost_observed),
+        bigquery.ScalarQueryParameter("label_window_start", "TIMESTAMP", _ts_or_none(u.label_window_start_utc)),
+        bigquery.ScalarQueryParameter("label_window_end", "TIMESTAMP", _ts_or_none(u.label_window_end_utc)),
+    ]
+    if horizons:
+        fields.append(bigquery.ScalarQueryParameter(HORIZON_LABELS_COLUMN, "STRING", u.horizon_labels))
+    return bigquery.StructQueryParameter(None, *fields)
+
+
+def _missing_prediction_rows(
+    bq: bigquery.Client,
+    cfg: Config,
+    pred_timestamps: list[pd.Timestamp],
+) -> list[pd.Timestamp]:
+    """Which of pred_timestamps have no prediction row for this zone."""
+    query = f"""
+    SELECT DISTINCT timestamp
+    FROM {bq_table(cfg.project_id, cfg.dataset, cfg.predictions_table)}
+    WHERE zoneId = @zoneId
+      AND timestamp IN UNNEST(@pred_ts)
+    """
+    job = bq.query(
+        query,
+        job_config=bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("zoneId", "STRING", cfg.zone_id),
+                bigquery.ArrayQueryParameter("pred_ts", "TIMESTAMP", [t.to_pydatetime() for t in pred_timestamps]),
+            ]
+        ),
+    )
+    df = job.to_dataframe()
+    found = set(pd.to_datetime(df["timestamp"], utc=True)) if not df.empty else set()
+    return [t for t in pred_timestamps if t not in found]
+
+
+def _apply_statuses_per_row(bq: bigquery.Client, cfg: Config, updates: list[TrainingStatusUpdate]) -> list[dict]:
+    failed = []
+    for u in updates:
+        try:
+            update_prediction_training_status(
+                bq=bq,
+                cfg=cfg,
+                pred_timestamp_utc=u.pred_timestamp_utc,
+                trained_on_label=u.trained_on_label,
+                skipped_reason=u.skipped_reason,
+                label_frost_observed=u.label_frost_observed,
+                label_window_start_utc=u.label_window_start_utc,
+                label_window_end_utc=u.label_window_end_utc,
+                horizon_labels=u.horizon_labels,
+            )
+        except Exception as e:
+            failed.append({"timestamp": u.pred_timestamp_utc.isoformat(), "error": f"{type(e).__name__}: {e}"})
+    return failed
+
+
+def apply_prediction_training_statuses(
+    bq: bigquery.Client,
+    cfg: Config,
+    updates: list[TrainingStatusUpdate],
+) -> dict:
+    """
+    Write every backlog resolution collected during a run.
+
+    status_write_mode "merge" (default) applies them with one MERGE from an
+    array-of-structs parameter; "row" keeps the one-UPDATE-per-row path.
+    If the MERGE fails as a whole, rows are retried one by one so failures
+    can be attributed; if it matches fewer rows than submitted, the missing
+    prediction rows are looked up. Never raises for per-row problems.
+
+    Returns {"rows", "dml_jobs", "wall_s", "failed": [{"timestamp", "error"}]}.
+    """
+    t0 = time.perf_counter()
+
+    # MERGE needs at most one source row per target row: last resolution wins
+    by_ts = {}
+    for u in updates:
+        by_ts[u.pred_timestamp_utc] = u
+    updates = list(by_ts.values())
+
+    if not updates:
+        return {"rows": 0, "dml_jobs": 0, "wall_s": 0.0, "failed": []}
+
+    if cfg.status_write_mode == "row":
+        failed = _apply_statuses_per_row(bq, cfg, updates)
+        return {"rows": len(updates), "dml_jobs": len(updates), "wall_s": time.perf_counter() - t0, "failed": failed}
+
+    horizons = bool(cfg.extra_horizons_minutes)
+    horizons_sql = f",\n      {HORIZON_LABELS_COLUMN} = S.{HORIZON_LABELS_COLUMN}" if horizons else ""
+    query = f"""
+    MERGE {bq_table(cfg.project_id, cfg.dataset, cfg.predictions_table)} T
+    USING UNNEST(@updates) S
+    ON T.zoneId = @zoneId AND T.timestamp = S.pred_ts
+    WHEN MATCHED THEN UPDATE SET
+      trained_on_label = S.trained_on_label,
+      skipped_reason = S.skipped_reason,
+      label_frost_observed = S.label_frost_observed,
+      label_window_start = S.label_window_start,
+      label_window_end = S.label_window_end{horizons_sql}
+    """
+    dml_jobs = 1
+    try:
+        job = bq.query(
+            query,
+            job_config=bigquery.QueryJobConfig(
+                query_parameters=[
+                    bigquery.ScalarQueryParameter("zoneId", "STRING", cfg.zone_id),
+                    bigquery.ArrayQueryParameter("updates", "STRUCT", [_status_struct(u, horizons) for u in updates]),
+                ]
+            ),
+        )
+        job.result()  # wait; raises on failure
+    except Exception as e:
+        print(f"WARNING: status MERGE failed for zone {cfg.zone_id} ({e}); retrying row by row")
+        failed = _apply_statuses_per_row(bq, cfg, updates)
+        dml_jobs += len(updates)
+        return {"rows": len(updates), "dml_jobs": dml_jobs, "wall_s": time.perf_counter() - t0, "failed": failed}
+
+    failed = []
+    affected = job.num_dml_affected_rows
+    if affected is not None and affected < len(updates):
+        missing = _missing_prediction_rows(bq, cfg, [u.pred_timestamp_utc for u in updates])
+        failed = [{"timestamp": t.isoformat(), "error": "no matching prediction row"} for t in missing]
+
+    return {"rows": len(updates), "dml_jobs": dml_jobs, "wall_s": time.perf_counter() - t0, "failed": failed}
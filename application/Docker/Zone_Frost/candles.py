@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+
+def _to_ns(times) -> np.ndarray:
+    """UTC nanosecond int64 array for a Timestamp or a sequence of them."""
+    idx = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(np.asarray(times, dtype=object)), utc=True))
+    return idx.astype("datetime64[ns, UTC]").asi8
+
+
+class CandleIndex:
+    """
+    Candle (intervention) events compiled once into sorted NumPy arrays.
+
+    Answers the same questions as bq_io.latest_candles_on and
+    bq_io.candles_on_during_window with binary searches instead of
+    boolean-filtering the events DataFrame on every call:
+
+      state_at(t):             candle state of the latest event at or before t
+      any_on_during(a, b):     candles on at a, or switched on within [a, b]
+
+    plus batched variants taking arrays of times.
+    """
+
+    def __init__(self, candle_df: pd.DataFrame):
+        if candle_df is None or candle_df.empty:
+            self._ts = np.zeros(0, dtype=np.int64)
+            self._on = np.zeros(0, dtype=bool)
+        else:
+            ts = _to_ns(candle_df["timestamp"])
+            # Stable sort: among equal timestamps the last row wins, as with iloc[-1]
+            order = np.argsort(ts, kind="stable")
+            self._ts = ts[order]
+            self._on = candle_df["candlesOn"].to_numpy(dtype=bool)[order]
+        # _on_before[i] = number of "on" events among the first i events
+        self._on_before = np.concatenate([[0], np.cumsum(self._on)])
+
+    def __len__(self) -> int:
+        return len(self._ts)
+
+    def states_at(self, times) -> np.ndarray:
+        """Candle state at each time (False before the first event)."""
+        i = np.searchsorted(self._ts, _to_ns(times), side="right") - 1
+        if not len(self._on):
+            return np.zeros(len(i), dtype=bool)
+        return (i >= 0) & self._on[np.maximum(i, 0)]
+
+    def any_on_during_many(self, starts, ends) -> np.ndarray:
+        """Per [start, end] window: on at start, or any on-event inside the window."""
+        a = _to_ns(starts)
+        b = _to_ns(ends)
+        lo = np.searchsorted(self._ts, a, side="left")
+        hi = np.searchsorted(self._ts, b, side="right")
+        switched_on = self._on_before[np.maximum(hi, lo)] - self._on_before[lo] > 0
+        return self.states_at(starts) | switched_on
+
+    def state_at(self, t: pd.Timestamp) -> bool:
+        return bool(self.states_at(t)[0])
+
+    def any_on_during(self, start: pd.Timestamp, end: pd.Timestamp) -> bool:
+        return bool(self.any_on_during_many(start, end)[0])
@@ -15,6 +15,10 @@ class Config:
     lookback_hours: int = 24 * 3  # 3 days
     interval_minutes: int = 15
     horizon_minutes: int = 60 * 6  # 6 hours
+    # Shorter horizons scored by the same model (extra outputs) and resolved in the
+    # same backlog pass; written as JSON to the horizon_probabilities /
+    # horizon_labels STRING columns of the prediction row. () = HORIZON_MINUTES only
+    extra_horizons_minutes: tuple[int, ...] = ()
 
     lr: float = 1e-3
     weight_decay: float = 1e-6
@@ -23,8 +27,79 @@ class Config:
 
     gcs_bucket: str | None = None
     gcs_prefix: str | None = None
+    # Local copy of each zone's model state, keyed by blob generation; off when unset
+    state_cache_dir: str | None = None
+    # Saves are conditional on the generation last read; on conflict the run's steps are replayed and retried
+    state_save_attempts: int = 5
     ingest_id: str | None = None
 
+    # Batch mode: when set, one process runs every listed zone (zone_id is the first)
+    zone_ids: tuple[str, ...] = ()
+
+    # Incremental readings cache (local dir or mounted GCS stand-in); off when unset
+    readings_cache_dir: str | None = None
+    readings_cache_overlap_minutes: int = 30
+    readings_cache_verify: bool = False
+
+    # How backlog resolutions are written: "merge" (one MERGE per run) or "row" (UPDATE per row)
+    status_write_mode: str = "merge"
+
+    # STRING column on the predictions table that gets a compact per-stage timing JSON; off when unset
+    timing_column: str | None = None
+
+    # "raw" (every reading timestamp) or "binned" (BigQuery averages into interval bins; single-zone runs)
+    readings_fetch_mode: str = "raw"
+
+    # Storage backend: "bigquery" or "sqlite" (embedded store at local_db_path, optionally synced from Parquet)
+    storage_backend: str = "bigquery"
+    local_db_path: str | None = None
+    local_parquet_dir: str | None = None
+
+    # Backlog draining: pages of backlog_page_size rows until backlog_max_rows or the
+    # wall-clock budget (seconds spent draining; 0 = none) runs out. Checkpointed per page.
+    backlog_page_size: int = 50
+    backlog_max_rows: int = 50
+    backlog_time_budget_s: float = 0.0
+
+    # Independent read queries issued at once per run (1 = one after another)
+    query_concurrency: int = 4
+
+    # Where each prediction's feature vector is kept for training on it once it
+    # matures (local directory or gs://bucket/prefix); None = rebuild from readings
+    feature_store_uri: str | None = None
+
+    # Multi-resolution step pooling of the feature window: (steps, factor) segments from
+    # the newest step back, each averaged in runs of factor (features.pool_steps);
+    # they must cover lookback_hours. () = every step at full resolution
+    feature_pooling: tuple[tuple[int, int], ...] = ()
+
+    # Robust scaling of sensor features: "window" (each window's own median / IQR)
+    # or "streaming" (running P² estimates persisted with the model, scaling.py)
+    scaling_mode: str = "window"
+
+    # full: resolve backlog, train, predict. predict: just the prediction (no backlog
+    # fetch, no training, no state save). train: just the backlog, no prediction.
+    # A predict run with train_backlog_threshold > 0 follows up with a train run once
+    # that many matured predictions are waiting.
+    run_mode: str = "full"
+    train_backlog_threshold: int = 0
+
+    # Change detection: before anything else, compare the newest reading's bin with
+    # the bin the zone's last run predicted / drained its backlog at (a small JSON
+    # record next to the model state) and exit when the run would only repeat it
+    skip_unchanged: bool = False
+
+    # Gap fill: predicting runs also write rows for the anchors (bin ends) missed since
+    # the zone's last prediction row, e.g. after an outage, the newest gap_fill_max_bins
+    # of them at most, scored in one batch; 0 = off
+    gap_fill_max_bins: int = 0
+
+    # Shadow evaluation: candidate models (model_version, hidden size) kept per zone
+    # next to the model state, scored on the same feature vectors as the model and
+    # trained on the same labels; probabilities and online log-loss go to shadow_table
+    shadow_models: tuple[tuple[str, int], ...] = ()
+    shadow_table: str = "frost_shadow_predictions"
+
 
 def load_config() -> Config:
     def req(name: str) -> str:
@@ -33,18 +108,56 @@ def load_config() -> Config:
             raise RuntimeError(f"Missing required env var: {name}")
         return v
 
+    zone_ids = tuple(z.strip() for z in os.getenv("ZONE_IDS", "").split(",") if z.strip())
+    # "8:1,24:4,256:16" -> ((8, 1), (24, 4), (256, 16))
+    feature_pooling = tuple(
+        (int(steps), int(factor))
+        for steps, _, factor in (s.partition(":") for s in os.getenv("FEATURE_POOLING", "").split(",") if s.strip())
+    )
+    # "mlp_v2:64,mlp_v3" -> (("mlp_v2", 64), ("mlp_v3", 128)); 128 is FrostMLP's default hidden size
+    shadow_models = tuple(
+        (name.strip(), int(hidden or 128))
+        for name, _, hidden in (s.partition(":") for s in os.getenv("SHADOW_MODELS", "").split(",") if s.strip())
+    )
+
     return Config(
         project_id=req("BQ_PROJECT_ID"),
         dataset=req("BQ_DATASET"),
         readings_table=req("BQ_READINGS_TABLE"),
         predictions_table=req("BQ_PREDICTIONS_TABLE"),
         interventions_table=req("BQ_INTERVENTIONS_TABLE"),
-        zone_id=req("ZONE_ID"),
+        zone_id=os.getenv("ZONE_ID") or (zone_ids[0] if zone_ids else req("ZONE_ID")),
         frost_temp_threshold=float(os.getenv("FROST_TEMP_THRESHOLD", "32.0")),
         gcs_bucket=os.getenv("MODEL_GCS_BUCKET"),
         gcs_prefix=os.getenv("MODEL_GCS_PREFIX"),
+        state_cache_dir=os.getenv("STATE_CACHE_DIR"),
+        state_save_attempts=int(os.getenv("STATE_SAVE_ATTEMPTS", "5")),
         lr=float(os.getenv("LR", "0.001")),
         weight_decay=float(os.getenv("WEIGHT_DECAY", "1e-6")),
         model_version=os.getenv("MODEL_VERSION", "mlp_v1"),
         ingest_id=os.getenv("INGEST_ID"),
+        zone_ids=zone_ids,
+        extra_horizons_minutes=tuple(int(h) for h in os.getenv("EXTRA_HORIZONS_MINUTES", "").split(",") if h.strip()),
+        readings_cache_dir=os.getenv("READINGS_CACHE_DIR"),
+        readings_cache_overlap_minutes=int(os.getenv("READINGS_CACHE_OVERLAP_MINUTES", "30")),
+        readings_cache_verify=os.getenv("READINGS_CACHE_VERIFY", "").lower() in ("1", "true", "yes"),
+        status_write_mode=os.getenv("STATUS_WRITE_MODE", "merge"),
+        timing_column=os.getenv("PREDICTION_TIMING_COLUMN") or None,
+        readings_fetch_mode=os.getenv("READINGS_FETCH_MODE", "raw"),
+        storage_backend=os.getenv("STORAGE_BACKEND", "bigquery"),
+        local_db_path=os.getenv("LOCAL_DB_PATH"),
+        local_parquet_dir=os.getenv("LOCAL_PARQUET_DIR"),
+        backlog_page_size=int(os.getenv("BACKLOG_PAGE_SIZE", "50")),
+        backlog_max_rows=int(os.getenv("BACKLOG_MAX_ROWS", "50")),
+        backlog_time_budget_s=float(os.getenv("BACKLOG_TIME_BUDGET_S", "0")),
+        query_concurrency=int(os.getenv("QUERY_CONCURRENCY", "4")),
+        feature_store_uri=os.getenv("FEATURE_STORE_URI"),
+        feature_pooling=feature_pooling,
+        scaling_mode=os.getenv("SCALING_MODE", "window"),
+        run_mode=os.getenv("RUN_MODE", "full"),
+        train_backlog_threshold=int(os.getenv("TRAIN_BACKLOG_THRESHOLD", "0")),
+        skip_unchanged=os.getenv("SKIP_UNCHANGED", "").lower() in ("1", "true", "yes"),
+        gap_fill_max_bins=int(os.getenv("GAP_FILL_MAX_BINS", "0")),
+        shadow_models=shadow_models,
+        shadow_table=os.getenv("SHADOW_TABLE", "frost_shadow_predictions"),
     )
@@ -0,0 +1,345 @@
+"""
+Vectorized sliding-window feature engine.
+
+build_features() works on one resampled window at a time, so resolving a
+backlog of K matured predictions costs K resample + feature passes over
+overlapping 288-step windows. This module resamples the readings span once
+and builds the windows for every anchor time together as strided NumPy
+views, producing the same vectors (bit for bit) and metadata as
+
+    hist = readings[readings["timestamp"] <= anchor]
+    grid, meta = resample_to_grid(hist, minutes, end_utc=anchor, required_steps=n)
+    x, h = build_features(grid, candle_flag)
+
+for each anchor.
+"""
+import hashlib
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from features import (
+    RAW_SENSOR_COLS,
+    SCALED_COLS,
+    _add_time_cyclic_features,
+    _add_frost_index_features,
+    pool_steps,
+)
+
+# Column layout of the per-step feature matrix (matches build_features)
+CYC_COLS = ["tod_sin", "tod_cos", "doy_sin", "doy_cos", "light_sin", "light_cos"]
+FEATURE_COLS = SCALED_COLS + CYC_COLS
+
+
+def _prepare_readings(readings: pd.DataFrame) -> pd.DataFrame:
+    """Same cleaning resample_to_grid applies: UTC index, sorted, numeric sensor columns."""
+    df = readings.copy()
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True).astype("datetime64[ns, UTC]")
+    df = df.set_index("timestamp").sort_index()
+    for c in RAW_SENSOR_COLS:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+        else:
+            df[c] = np.nan
+    return df[RAW_SENSOR_COLS]
+
+
+def _last_bin_means(df: pd.DataFrame, bin_starts: pd.DatetimeIndex, anchors: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Mean of the readings in [bin_start, anchor] per anchor.
+
+    A window anchored at t only sees readings <= t, so its last bin can hold
+    fewer readings than the same bin in the full-span resample.
+    """
+    ts = df.index.asi8
+    lo = np.searchsorted(ts, bin_starts.asi8, side="left")
+    hi = np.searchsorted(ts, anchors.asi8, side="right")
+    counts = np.maximum(hi - lo, 0)
+
+    out = np.full((len(anchors), len(RAW_SENSOR_COLS)), np.nan, dtype=np.float64)
+    if counts.sum() == 0:
+        return out
+
+    # Row indices of every [lo, hi) range, concatenated, keyed by anchor
+    key = np.repeat(np.arange(len(anchors)), counts)
+    rows = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+    means = df.iloc[rows].reset_index(drop=True).groupby(key).mean()
+    out[means.index.to_numpy()] = means.to_numpy(dtype=np.float64)
+    return out
+
+
+def _interpolate_windows(y: np.ndarray, x: np.ndarray, global_interp: np.ndarray) -> np.ndarray:
+    """
+    Per-window equivalent of DataFrame.interpolate(method="time", limit_direction="both")
+    for one column.
+
+    y:  (A, n) window values with NaN gaps (last step is window-specific)
+    x:  (A, n) float64 nanosecond positions of each step
+    global_interp: (A, n) the same column interpolated over the full span,
+                   which is exact wherever both neighbours are interior steps.
+    """
+    n_anchors, n = y.shape
+    valid = ~np.isnan(y)
+    if valid.all():
+        return y
+
+    idx = np.arange(n)
+    prev_valid = np.maximum.accumulate(np.where(valid, idx, -1), axis=1)
+    next_valid = np.flip(np.minimum.accumulate(np.flip(np.where(valid, idx, n), axis=1), axis=1), axis=1)
+    rows = np.arange(n_anchors)[:, None]
+
+    out = y.copy()
+    has_prev = prev_valid >= 0
+    has_next = next_valid < n
+
+    # Leading / trailing gaps: np.interp clamps to the nearest valid value
+    lead = ~valid & ~has_prev & has_next
+    out[lead] = y[rows, np.where(has_next, next_valid, 0)][lead]
+    trail = ~valid & has_prev & ~has_next
+    out[trail] = y[rows, np.where(has_prev, prev_valid, 0)][trail]
+
+    # Interior gaps between two interior steps: identical to the full-span interpolation
+    inner = ~valid & has_prev & has_next
+    interior = inner & (next_valid < n - 1)
+    out[interior] = global_interp[interior]
+
+    # Gaps closed by the (window-specific) last step: interpolate per window
+    for a in np.flatnonzero((inner & ~interior).any(axis=1)):
+        gap = inner[a] & (next_valid[a] == n - 1)
+        left = prev_valid[a][gap][0]
+        out[a, gap] = np.interp(x[a, gap], x[a, [left, n - 1]], y[a, [left, n - 1]])
+    return out
+
+
+def _max_nan_run(missing: np.ndarray) -> np.ndarray:
+    """Longest run of consecutive True per row of a (A, n) mask."""
+    idx = np.arange(missing.shape[1])
+    last_present = np.maximum.accumulate(np.where(missing, -1, idx), axis=1)
+    run = np.where(missing, idx - last_present, 0)
+    return run.max(axis=1) if missing.shape[1] else np.zeros(missing.shape[0], dtype=int)
+
+
+def resample_windows(
+    readings: pd.DataFrame,
+    anchors,
+    minutes: int,
+    *,
+    required_steps: int,
+) -> tuple[pd.DatetimeIndex, np.ndarray, np.ndarray, list[dict]]:
+    """
+    resample_to_grid() for many anchor times in one pass.
+
+    Returns:
+      grid_ts:   DatetimeIndex of the shared grid spanning all windows
+      start_pos: (A,) index into grid_ts of each window's first step
+      grid:      (A, required_steps, len(RAW_SENSOR_COLS)) float64, interpolated
+      metas:     per-anchor metadata dicts (same keys as resample_to_grid)
+    """
+    anchors = pd.DatetimeIndex(pd.to_datetime(anchors, utc=True)).astype("datetime64[ns, UTC]")
+    n = int(required_steps)
+    step = pd.Timedelta(minutes=minutes)
+    ends = anchors.floor(f"{minutes}min")
+
+    grid_ts = pd.date_range(start=ends.min() - (n - 1) * step, end=ends.max(), freq=f"{minutes}min", tz="UTC")
+    end_pos = ((ends - grid_ts[0]) // step).to_numpy(dtype=np.int64)
+    start_pos = end_pos - (n - 1)
+
+    df = _prepare_readings(readings) if readings is not None else pd.DataFrame(columns=RAW_SENSOR_COLS)
+    if df.empty:
+        binned = np.full((len(grid_ts), len(RAW_SENSOR_COLS)), np.nan)
+        last = np.full((len(anchors), len(RAW_SENSOR_COLS)), np.nan)
+    else:
+        binned = df.resample(f"{minutes}min").mean().reindex(grid_ts).to_numpy(dtype=np.float64)
+        last = _last_bin_means(df, ends, anchors)
+
+    # (A, n, C) windows as strided views over the shared grid, then patch the last step
+    raw = sliding_window_view(binned, n, axis=0)[start_pos].transpose(0, 2, 1).copy()
+    raw[:, -1, :] = last
+
+    # Coverage / gaps BEFORE interpolation (temperature bins)
+    temp_missing = np.isnan(raw[:, :, RAW_SENSOR_COLS.index("temperature")])
+    real_points = (~temp_missing).sum(axis=1)
+    max_gap = _max_nan_run(temp_missing)
+
+    x_global = grid_ts.asi8.astype(np.float64)
+    x = sliding_window_view(x_global, n)[start_pos]
+    grid = np.empty_like(raw)
+    for c in range(len(RAW_SENSOR_COLS)):
+        col = binned[:, c]
+        ok = ~np.isnan(col)
+        full = col.copy()
+        if ok.any() and not ok.all():
+            full[~ok] = np.interp(x_global[~ok], x_global[ok], col[ok])
+        grid[:, :, c] = _interpolate_windows(raw[:, :, c], x, sliding_window_view(full, n)[start_pos])
+
+    metas = []
+    for i in range(len(anchors)):
+        coverage = float(real_points[i]) / float(n) if n > 0 else 0.0
+        metas.append({
+            "needed_points": n,
+            "real_points": int(real_points[i]),
+            "coverage": coverage,
+            "coverage_pct": float(coverage * 100.0),
+            "max_gap_bins": int(max_gap[i]),
+            "max_gap_minutes": int(max_gap[i] * minutes),
+            "end_utc": ends[i].isoformat(),
+            "start_utc": grid_ts[start_pos[i]].isoformat(),
+        })
+    return grid_ts, start_pos, grid, metas
+
+
+def _light_daily_cyclic(light: np.ndarray, day: np.ndarray, eps: float = 1e-6) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized _add_light_daily_cyclic_features: min/max per (window, UTC day).
+
+    light: (A, n) float32; day: (A, n) int day number of each step.
+    """
+    rel = day - day[:, :1]
+    day_min = np.full(light.shape, np.nan, dtype=np.float32)
+    day_max = np.full(light.shape, np.nan, dtype=np.float32)
+    ok = ~np.isnan(light)
+    for d in range(int(rel.max()) + 1 if rel.size else 0):
+        in_day = rel == d
+        sel = in_day & ok
+        any_sel = sel.any(axis=1, keepdims=True)
+        lo = np.where(sel, light, np.inf).min(axis=1, keepdims=True)
+        hi = np.where(sel, light, -np.inf).max(axis=1, keepdims=True)
+        lo = np.where(any_sel, lo, np.nan).astype(np.float32)
+        hi = np.where(any_sel, hi, np.nan).astype(np.float32)
+        day_min = np.where(in_day, lo, day_min)
+        day_max = np.where(in_day, hi, day_max)
+
+    day_rng = (day_max - day_min).astype(np.float32)
+    with np.errstate(invalid="ignore"):
+        big = day_rng > eps
+    safe_rng = np.where(big, day_rng, np.float32(1.0))
+    light_norm = ((light - day_min) / safe_rng).astype(np.float32)
+    light_norm = np.where(big, light_norm, np.float32(0.0))
+
+    angle = (2.0 * np.pi * light_norm).astype(np.float32)
+    light_sin = np.sin(angle).astype(np.float32)
+    light_cos = np.cos(angle).astype(np.float32)
+    return np.where(np.isnan(light_sin), 0.0, light_sin), np.where(np.isnan(light_cos), 1.0, light_cos)
+
+
+def _delta(a: np.ndarray) -> np.ndarray:
+    """Series.diff().fillna(0.0).astype(float32) along the step axis, in a's own dtype."""
+    d = np.zeros_like(a)
+    d[:, 1:] = a[:, 1:] - a[:, :-1]
+    d[np.isnan(d)] = 0.0
+    return d.astype(np.float32)
+
+
+def _robust_scale_windows(mat: np.ndarray, eps: float = 1e-6) -> np.ndarray:
+    """_robust_scale applied to every window of a (A, n, C) tensor at once."""
+    # nanpercentile falls back to a Python loop over every 1-D slice; after
+    # interpolation only all-NaN sensor columns leave NaNs, so use the
+    # vectorized (and per-slice identical) percentile when there are none.
+    pct = np.nanpercentile if np.isnan(mat).any() else np.percentile
+    med = np.nanmedian(mat, axis=1, keepdims=True)
+    q25 = pct(mat, 25, axis=1, keepdims=True)
+    q75 = pct(mat, 75, axis=1, keepdims=True)
+    iqr = (q75 - q25)
+    return (mat - med) / (iqr + eps)
+
+
+def window_scaling_blocks(grid: np.ndarray) -> np.ndarray:
+    """
+    scaling_block() of every window: the (A, n, len(SCALED_COLS)) float32
+    raw + delta sensor tensor window_feature_tensor scales.
+    """
+    n_anchors, n, _ = grid.shape
+    col = {c: grid[:, :, i] for i, c in enumerate(RAW_SENSOR_COLS)}
+
+    # frost_index is elementwise: run the pandas implementation on the flattened windows
+    flat = pd.DataFrame({
+        "temperature": col["temperature"].reshape(-1),
+        "humidity": col["humidity"].reshape(-1),
+    })
+    frost_index = _add_frost_index_features(flat)["frost_index"].to_numpy(dtype=np.float32).reshape(n_anchors, n)
+
+    sensors = [col[c] for c in RAW_SENSOR_COLS] + [frost_index]
+    return np.stack([s.astype(np.float32) for s in sensors] + [_delta(s) for s in sensors], axis=2)
+
+
+def window_feature_tensor(
+    grid_ts: pd.DatetimeIndex,
+    start_pos: np.ndarray,
+    grid: np.ndarray,
+    scaler=None,
+) -> np.ndarray:
+    """
+    Scaled per-step features for every window: (A, n, len(FEATURE_COLS)) float32,
+    column order FEATURE_COLS (the layout build_features flattens). Scaled
+    with each window's own statistics, or scaler's running ones (a
+    scaling.ScalerSnapshots scales each window with its own snapshot).
+    """
+    n = grid.shape[1]
+
+    # Time-of-day / day-of-year only depend on the timestamp: compute once on the shared grid
+    cyc = _add_time_cyclic_features(pd.DataFrame({"timestamp": grid_ts}))
+    tod_doy = sliding_window_view(
+        cyc[["tod_sin", "tod_cos", "doy_sin", "doy_cos"]].to_numpy(dtype=np.float32), n, axis=0
+    )[start_pos].transpose(0, 2, 1)
+
+    day_global = (grid_ts.asi8 // (24 * 3600 * 10**9)).astype(np.int64)
+    day = sliding_window_view(day_global, n)[start_pos]
+    light = grid[:, :, RAW_SENSOR_COLS.index("light")]
+    light_sin, light_cos = _light_daily_cyclic(light.astype(np.float32), day)
+
+    raw_delta = window_scaling_blocks(grid)
+    scaled = _robust_scale_windows(raw_delta) if scaler is None else scaler.scale(raw_delta)
+
+    return np.concatenate(
+        [scaled, tod_doy, light_sin[:, :, None].astype(np.float32), light_cos[:, :, None].astype(np.float32)],
+        axis=2,
+    )
+
+
+def build_window_features(
+    readings: pd.DataFrame,
+    anchors,
+    candle_flags,
+    minutes: int,
+    *,
+    required_steps: int,
+    scaler=None,
+    pooling=(),
+) -> tuple[np.ndarray, list[str], list[dict]]:
+    """
+    build_features() for every anchor at once (scaler and pooling as there).
+
+    Returns:
+      X: (A, D) float32 feature vectors (row i == build_features for anchor i)
+      hashes: sha256 of each row
+      metas: resample metadata per anchor
+    """
+    anchors = list(anchors)
+    if not anchors:
+        return np.zeros((0, 0), dtype=np.float32), [], []
+
+    grid_ts, start_pos, grid, metas = resample_windows(
+        readings, anchors, minutes, required_steps=required_steps
+    )
+    X, hashes = window_rows(grid_ts, start_pos, grid, candle_flags, scaler=scaler, pooling=pooling)
+    return X, hashes, metas
+
+
+def window_rows(
+    grid_ts: pd.DatetimeIndex,
+    start_pos: np.ndarray,
+    grid: np.ndarray,
+    candle_flags,
+    *,
+    scaler=None,
+    pooling=(),
+) -> tuple[np.ndarray, list[str]]:
+    """build_window_features() rows and hashes from resample_windows() output."""
+    tensor = pool_steps(window_feature_tensor(grid_ts, start_pos, grid, scaler), pooling)
+
+    flags = np.array([[1.0 if f else 0.0] for f in candle_flags], dtype=np.float32)
+    X = np.ascontiguousarray(
+        np.concatenate([tensor.reshape(len(grid), -1).astype(np.float32), flags], axis=1)
+    )
+    hashes = [hashlib.sha256(row.tobytes()).hexdigest() for row in X]
+    return X, hashes
@@ -0,0 +1,130 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from config import Config
+from features import feature_layout
+
+# Parallel object reads per lookup (one Parquet file per zone and day)
+READ_WORKERS = 8
+
+
+@lru_cache(maxsize=None)
+def _filesystem(uri: str) -> tuple[pafs.FileSystem, str]:
+    # A local directory, or gs://bucket/prefix in production
+    if "://" not in uri:
+        uri = os.path.abspath(uri)
+    return pafs.FileSystem.from_uri(uri)
+
+
+def vector_path(cfg: Config, zone_id: str, ts: pd.Timestamp) -> str:
+    """
+    One file per zone and UTC day, holding that day's prediction vectors.
+    The feature layout (model version, window, grid, scaling, pooling) is
+    part of the key, so a config change never serves vectors of another
+    shape.
+    """
+    _, root = _filesystem(cfg.feature_store_uri)
+    layout = f"{cfg.model_version}_{cfg.lookback_hours}h_{cfg.interval_minutes}m"
+    if cfg.scaling_mode != "window":
+        layout += f"_{cfg.scaling_mode}"
+    if cfg.feature_pooling:
+        layout += f"_{feature_layout(cfg.feature_pooling)}"
+    day = pd.Timestamp(ts).tz_convert("UTC").strftime("%Y%m%d")
+    return f"{root}/zone_{zone_id}/{layout}/{day}.parquet"
+
+
+def _write_day(fs: pafs.FileSystem, path: str, table: pa.Table) -> None:
+    # Rows already in the day's file are kept unless the run re-stores their timestamp
+    try:
+        old = pq.read_table(path, filesystem=fs)
+    except FileNotFoundError:
+        old = None
+    except Exception as e:
+        print(f"WARNING: replacing unreadable stored feature vectors {path}: {e}")
+        old = None
+    if old is not None:
+        keep = pc.invert(pc.is_in(old["timestamp"], value_set=table["timestamp"]))
+        table = pa.concat_tables([old.filter(keep).cast(table.schema), table])
+    table = table.sort_by("timestamp")
+
+    fs.create_dir(path.rsplit("/", 1)[0], recursive=True)
+    if isinstance(fs, pafs.LocalFileSystem):
+        # Write-then-rename so a crashed run never leaves a torn file behind
+        # (object stores write whole objects already)
+        tmp = f"{path}.tmp"
+        pq.write_table(table, tmp, filesystem=fs)
+        fs.move(tmp, path)
+    else:
+        pq.write_table(table, path, filesystem=fs)
+
+
+def store_vectors(cfg: Config, vectors: list[tuple[pd.Timestamp, np.ndarray, str, dict]]) -> None:
+    """
+    Persist a run's prediction input vectors, (timestamp, x, features_hash,
+    window meta) each, for training on them later: merged into the zone's
+    day files, one read and one write per day touched. Two runs of a zone
+    writing the same day at once can lose each other's rows, which only
+    costs those rows a window rebuild.
+    """
+    if not vectors:
+        return
+    fs, _ = _filesystem(cfg.feature_store_uri)
+    by_day: dict[str, list] = {}
+    for ts, x, features_hash, meta in vectors:
+        by_day.setdefault(vector_path(cfg, cfg.zone_id, ts), []).append((ts, x, features_hash, meta))
+    for path, rows in by_day.items():
+        table = pa.table({
+            "timestamp": pa.array([pd.Timestamp(r[0]).tz_convert("UTC") for r in rows], pa.timestamp("us", tz="UTC")),
+            "features_hash": pa.array([r[2] for r in rows], pa.string()),
+            "meta": pa.array([json.dumps(r[3]) for r in rows], pa.string()),
+            "x": pa.array([np.asarray(r[1], dtype=np.float32) for r in rows], pa.list_(pa.float32())),
+        })
+        _write_day(fs, path, table)
+
+
+def _read_day(fs: pafs.FileSystem, path: str) -> dict[pd.Timestamp, tuple[np.ndarray, dict]]:
+    try:
+        table = pq.read_table(path, filesystem=fs, columns=["timestamp", "meta", "x"])
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"WARNING: ignoring unreadable stored feature vectors {path}: {e}")
+        return {}
+    return {
+        pd.Timestamp(row["timestamp"]): (np.asarray(row["x"], dtype=np.float32), json.loads(row["meta"]))
+        for row in table.to_pylist()
+    }
+
+
+def load_vectors(cfg: Config, backlog: pd.DataFrame) -> dict[tuple[str, pd.Timestamp], tuple[np.ndarray, dict]]:
+    """
+    Stored (x, window meta) for the backlog rows (zoneId, timestamp) that
+    have one, keyed by (zoneId, timestamp). Rows without are missing from
+    the result and have their windows rebuilt from readings. Each zone's
+    day file is read once.
+    """
+    if backlog.empty:
+        return {}
+    fs, _ = _filesystem(cfg.feature_store_uri)
+    keys = [
+        (str(z), pd.to_datetime(t, utc=True))
+        for z, t in zip(backlog["zoneId"], backlog["timestamp"])
+    ]
+    paths = sorted({vector_path(cfg, z, t) for z, t in keys})
+    with ThreadPoolExecutor(min(READ_WORKERS, len(paths)), thread_name_prefix="frost-features") as pool:
+        days = dict(zip(paths, pool.map(lambda p: _read_day(fs, p), paths)))
+    found = {}
+    for z, t in keys:
+        v = days[vector_path(cfg, z, t)].get(t)
+        if v is not None:
+            found[(z, t)] = v
+    return found
@@ -12,6 +12,9 @@ DERIVED_COLS = ["frost_index"]
 # Columns that participate in delta feature creation + robust scaling
 SENSOR_COLS = RAW_SENSOR_COLS + DERIVED_COLS
 
+# Robust-scaled per-step columns: sensors and their deltas
+SCALED_COLS = SENSOR_COLS + [f"d_{c}" for c in SENSOR_COLS]
+
 def _max_consecutive_nans(series: pd.Series) -> int:
     """
     Returns the maximum run length of consecutive NaNs in a Series.
@@ -87,6 +90,43 @@ def resample_to_grid(
     # 1) Aggregate into N-minute bins
     binned = df[RAW_SENSOR_COLS].resample(f"{minutes}min").mean()
 
+    return _anchor_bins(binned, idx, minutes, required_steps)
+
+
+def grid_from_bins(
+    bins: pd.DataFrame,
+    minutes: int,
+    *,
+    end_utc: pd.Timestamp,
+    required_steps: int,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Same grid and meta as resample_to_grid, from readings already averaged
+    into {minutes}-minute bins (bq_io.fetch_readings_binned: bin_start +
+    RAW_SENSOR_COLS means + n_temperature real-point counts).
+    """
+    if bins is None or bins.empty:
+        return resample_to_grid(None, minutes, end_utc=end_utc, required_steps=required_steps)
+
+    end_utc = pd.to_datetime(end_utc, utc=True).floor(f"{minutes}min")
+    idx = pd.date_range(end=end_utc, periods=required_steps, freq=f"{minutes}min", tz="UTC")
+
+    binned = bins.copy()
+    binned.index = pd.DatetimeIndex(pd.to_datetime(binned["bin_start"], utc=True))
+    for c in RAW_SENSOR_COLS:
+        binned[c] = pd.to_numeric(binned[c], errors="coerce") if c in binned.columns else np.nan
+    if "n_temperature" in binned.columns:
+        # A bin is "real" only if it holds at least one temperature reading
+        binned.loc[binned["n_temperature"].fillna(0) <= 0, "temperature"] = np.nan
+
+    return _anchor_bins(binned[RAW_SENSOR_COLS].astype("float64"), idx, minutes, required_steps)
+
+
+def _anchor_bins(binned: pd.DataFrame, idx: pd.DatetimeIndex, minutes: int, required_steps: int) -> tuple[pd.DataFrame, dict]:
+    """Steps shared by resample_to_grid and grid_from_bins once readings are binned."""
+    end_utc = idx[-1]
+    start_utc = idx[0]
+
     # 2) Force the anchored window (exact length)
     binned = binned.reindex(idx)
 
@@ -271,9 +311,62 @@ def _robust_scale(mat: np.ndarray, eps: float = 1e-6) -> np.ndarray:
     return (mat - med) / (iqr + eps)
 
 
+def _feature_frame(grid_df: pd.DataFrame) -> pd.DataFrame:
+    df = grid_df.copy()
+    df = _add_time_cyclic_features(df)
+
+    # derived features
+    df = _add_frost_index_features(df)
+    df = _add_light_daily_cyclic_features(df)
+
+    return _add_delta_features(df)
+
+
+def scaling_block(grid_df: pd.DataFrame) -> np.ndarray:
+    """
+    The per-step raw + delta sensor matrix build_features robust-scales,
+    (n, len(SCALED_COLS)) float32: what a StreamingScaler is fed.
+    """
+    return _feature_frame(grid_df)[SCALED_COLS].to_numpy(dtype=np.float32)
+
+
+def feature_layout(pooling) -> str:
+    """Name of a step pooling layout (FEATURE_POOLING), e.g. "pool_8x1_24x4_256x16"; "full" without pooling."""
+    if not pooling:
+        return "full"
+    return "pool_" + "_".join(f"{steps}x{factor}" for steps, factor in pooling)
+
+
+def pool_steps(mat: np.ndarray, pooling) -> np.ndarray:
+    """
+    Multi-resolution pooling of a (..., n, C) per-step matrix (time
+    ascending). pooling lists (steps, factor) segments from the newest step
+    back: each segment's steps are averaged in runs of factor, so (8, 1)
+    keeps the last 8 steps as they are and (256, 16) turns the 256 before
+    them into 16 rows. The segments cover all n steps.
+    """
+    if not pooling:
+        return mat
+    parts = []
+    end = mat.shape[-2]
+    for steps, factor in pooling:
+        seg = mat[..., end - steps:end, :]
+        runs = seg.reshape(*seg.shape[:-2], steps // factor, factor, seg.shape[-1])
+        # Summed run by run (elementwise), so one window and a stack of
+        # windows (feature_engine) pool to the same bits
+        total = runs[..., 0, :].astype(np.float32)
+        for j in range(1, factor):
+            total = total + runs[..., j, :]
+        parts.append(total / np.float32(factor))
+        end -= steps
+    return np.concatenate(parts[::-1], axis=-2)
+
+
 def build_features(
     grid_df: pd.DataFrame,
     candle_now: bool,
+    scaler=None,
+    pooling=(),
 ) -> tuple[np.ndarray, str]:
     """
     Build a 1D feature vector from a time-grid DataFrame.
@@ -284,30 +377,26 @@ def build_features(
       - cyclical time features (sin/cos) (already bounded)
       - candle flag
 
+    Robust scaling uses the window's own median / IQR, or the running
+    statistics of scaler (a scaling.StreamingScaler) when given. With
+    pooling (pool_steps) the scaled steps are pooled before flattening.
+
     Returns:
       x: np.ndarray float32 shape (D,)
       h: sha256 hash for debugging
     """
-    df = grid_df.copy()
-    df = _add_time_cyclic_features(df)
-
-    # derived features
-    df = _add_frost_index_features(df)
-    df = _add_light_daily_cyclic_features(df)
-
-    df = _add_delta_features(df)
+    df = _feature_frame(grid_df)
 
     # Robust scale everything except sin/cos (they are already [-1,1])
     # We’ll scale in two blocks so we don't distort cyclic features.
-    raw_and_delta_cols = SENSOR_COLS + [f"d_{c}" for c in SENSOR_COLS]
     cyc_cols = ["tod_sin", "tod_cos", "doy_sin", "doy_cos", "light_sin", "light_cos"]
 
-    raw_delta = df[raw_and_delta_cols].to_numpy(dtype=np.float32)
-    raw_delta_scaled = _robust_scale(raw_delta)
+    raw_delta = df[SCALED_COLS].to_numpy(dtype=np.float32)
+    raw_delta_scaled = _robust_scale(raw_delta) if scaler is None else scaler.scale(raw_delta)
 
     cyc = df[cyc_cols].to_numpy(dtype=np.float32)
 
-    mat_scaled = np.concatenate([raw_delta_scaled, cyc], axis=1)
+    mat_scaled = pool_steps(np.concatenate([raw_delta_scaled, cyc], axis=1), pooling)
 
     # Flatten time dimension
     x = mat_scaled.reshape(-1).astype(np.float32)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from candles import _to_ns
+
+
+class LabelIndex:
+    """
+    Readings compiled once for resolving the frost labels of many matured
+    predictions.
+
+    Gives the same answer as features.compute_label_frost_in_window for
+    every [start, end] window, without boolean-filtering the readings per
+    window: the window's rows are found with binary searches on the sorted
+    timestamps, its minimum temperature with a sparse-table range-min, and
+    its number of temperature readings from a prefix count.
+    O(n log n) to build, O(log n) per window.
+    """
+
+    def __init__(self, readings_df: pd.DataFrame):
+        if readings_df is None or readings_df.empty:
+            self._ts = np.zeros(0, dtype=np.int64)
+            temp = np.zeros(0)
+        else:
+            ts = _to_ns(readings_df["timestamp"])
+            order = np.argsort(ts, kind="stable")
+            self._ts = ts[order]
+            temp = pd.to_numeric(readings_df["temperature"], errors="coerce").to_numpy(dtype=np.float64)[order]
+
+        has_temp = ~np.isnan(temp)
+        # _points_before[i] = temperature readings among the first i rows
+        self._points_before = np.concatenate([[0], np.cumsum(has_temp)])
+        # _min[k][i] = min temperature of rows i .. i + 2**k - 1 (missing = +inf)
+        level = np.where(has_temp, temp, np.inf)
+        self._min = [level]
+        width = 1
+        while 2 * width <= len(level):
+            level = np.minimum(level[:-width], level[width:])
+            self._min.append(level)
+            width *= 2
+
+    def _range_min(self, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+        """Min over rows [lo, hi) for non-empty ranges."""
+        k = np.floor(np.log2(hi - lo)).astype(np.int64)
+        out = np.empty(len(lo))
+        for level in np.unique(k):
+            sel = k == level
+            table = self._min[level]
+            out[sel] = np.minimum(table[lo[sel]], table[hi[sel] - (1 << level)])
+        return out
+
+    def resolve(self, starts, ends, threshold: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Labels for windows [starts[i], ends[i]] (inclusive).
+
+        Returns:
+          labels:       1 if the window's min temperature <= threshold, else 0
+          points:       temperature readings in the window
+          insufficient: no temperature reading in the window (label undefined;
+                        compute_label_frost_in_window returns None)
+        """
+        lo = np.searchsorted(self._ts, _to_ns(starts), side="left")
+        hi = np.maximum(np.searchsorted(self._ts, _to_ns(ends), side="right"), lo)
+        points = self._points_before[hi] - self._points_before[lo]
+        insufficient = points == 0
+
+        labels = np.zeros(len(lo), dtype=np.int64)
+        some = ~insufficient
+        if some.any():
+            labels[some] = self._range_min(lo[some], hi[some]) <= threshold
+        return labels, points, insufficient
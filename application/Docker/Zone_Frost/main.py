@@ -1,25 +1,39 @@
 import json
+import time
+from dataclasses import replace
+from functools import partial
+from typing import TYPE_CHECKING, Callable
 import numpy as np
 import pandas as pd
-import torch
-import torch.nn.functional as F
 from datetime import datetime, timezone
-from google.cloud import bigquery
 
 from config import load_config, Config
-from model import FrostMLP
-from features import resample_to_grid, build_features, compute_label_frost_in_window
-from bq_io import (
-    fetch_readings,
-    fetch_untrained_matured_predictions,
-    fetch_candle_events,
-    latest_candles_on,
-    candles_on_during_window,
-    insert_prediction_row,
-    has_processed_ingest,
-    update_prediction_training_status,
+from features import (
+    RAW_SENSOR_COLS,
+    resample_to_grid,
+    grid_from_bins,
+    build_features,
+    feature_layout,
+    scaling_block,
 )
-from state import load_state, save_state
+from feature_engine import build_window_features
+from bq_io import HORIZON_PROBS_COLUMN, TrainingStatusUpdate
+from backends import open_backend
+from candles import CandleIndex
+from labels import LabelIndex
+from feature_store import load_vectors, store_vectors
+from readings_cache import fetch_readings_cached, fetch_readings_for_zones_cached
+from state import VersionedState, load_run_record, load_weights, save_run_record
+from scaling import StreamingScaler
+from planner import QueryPlanner
+from telemetry import RunTelemetry
+
+# torch is only imported by runs that train (or predict without exported
+# weights); the predict-only path runs on model_numpy
+if TYPE_CHECKING:
+    import torch
+    from model import FrostMLP
+    from shadow import ShadowModels
 
 # minimum fraction of real bins required to train
 COVERAGE_THRESHOLD = 0.75
@@ -51,266 +65,1235 @@ def _coverage_skip_reason(prefix: str, meta: dict) -> str:
     )
 
 
-def main():
-    cfg = load_config()
-    bq = bigquery.Client(project=cfg.project_id)
+def _skipped_summary(pred_row: dict) -> dict:
+    return {
+        "zoneId": pred_row["zoneId"],
+        "timestamp": pd.to_datetime(pred_row["timestamp"], utc=True).isoformat(),
+        "probability_percent": pred_row["probability_percent"],
+        "skipped_reason": pred_row["skipped_reason"],
+    }
 
-    # Idempotency guard by ingest_id
-    if cfg.ingest_id and has_processed_ingest(bq, cfg):
-        print(f"Ingest {cfg.ingest_id} already processed for zone {cfg.zone_id}, skipping.")
-        return
 
-    torch.manual_seed(cfg.seed)
-    np.random.seed(cfg.seed)
+def _skipped_row(cfg: Config, meta: dict, reason: str) -> dict:
+    # Prediction row for a window failing Rule A / B: no probability
+    return {
+        "timestamp": pd.to_datetime(meta["end_utc"]).to_pydatetime(),
+        "zoneId": cfg.zone_id,
+        "probability": -1.0,
+        "probability_percent": -1.0,
+        "model_version": cfg.model_version,
+        "features_hash": None,
+        "trained_on_label": False,
+        "label_frost_observed": None,
+        "label_window_start": None,
+        "label_window_end": None,
+        "skipped_reason": reason,
+        "ingest_id": cfg.ingest_id,
+        "triggered_at": datetime.now(timezone.utc),
+    }
+
+
+def _horizons(cfg: Config) -> tuple[int, ...]:
+    # The model's outputs, in order: HORIZON_MINUTES first, then EXTRA_HORIZONS_MINUTES
+    return (cfg.horizon_minutes, *cfg.extra_horizons_minutes)
+
+
+def _horizon_json(cfg: Config, values) -> str:
+    return json.dumps({str(h): v for h, v in zip(_horizons(cfg), values)})
+
+
+def _prediction_row(
+    cfg: Config, meta: dict, prob: float, features_hash: str, probs: np.ndarray | None = None
+) -> dict:
+    # A new prediction row, unresolved initially; probs: every horizon's probability
+    row = {
+        "timestamp": pd.to_datetime(meta["end_utc"], utc=True).to_pydatetime(),
+        "zoneId": cfg.zone_id,
+        "probability": float(prob),
+        "probability_percent": float(prob * 100.0),
+        "model_version": cfg.model_version,
+        "features_hash": features_hash,
+        "trained_on_label": None,
+        "label_frost_observed": None,
+        "label_window_start": None,
+        "label_window_end": None,
+        "skipped_reason": None,
+        "ingest_id": cfg.ingest_id,
+        "triggered_at": datetime.now(timezone.utc),
+    }
+    if cfg.extra_horizons_minutes and probs is not None:
+        row[HORIZON_PROBS_COLUMN] = _horizon_json(cfg, [float(p) for p in probs])
+    return row
+
+
+def _attach_timings(cfg: Config, tel: RunTelemetry, pred_row: dict) -> dict:
+    # Optional compact per-stage timing column on the prediction row
+    if cfg.timing_column:
+        pred_row[cfg.timing_column] = tel.timing_summary()
+    return pred_row
+
+
+def _backlog_start(cfg: Config, backlog: pd.DataFrame, stored: dict | None = None) -> pd.Timestamp:
+    """
+    Earliest reading time the (non-empty) backlog needs: its rows' feature
+    windows, or just their label windows for rows with a stored feature vector.
+    """
+    window = pd.Timedelta(hours=cfg.lookback_hours) + pd.Timedelta(minutes=cfg.interval_minutes)
+    times = pd.to_datetime(backlog["timestamp"], utc=True)
+    if not stored:
+        return times.min() - window
+    is_stored = np.array([(str(z), t) in stored for z, t in zip(backlog["zoneId"], times)])
+    starts = []
+    if is_stored.any():
+        starts.append(times[is_stored].min())
+    if not is_stored.all():
+        starts.append(times[~is_stored].min() - window)
+    return min(starts)
 
-    # 1) Use wall-clock just to discover backlog + decide how far back to query
-    wall_now = pd.Timestamp.now(tz="UTC")
-    backlog = fetch_untrained_matured_predictions(bq, cfg, wall_now, limit=50)
 
-    # 2) Compute earliest start needed to cover feature windows for backlog
+def _gap_from(cfg: Config, last_predicted: pd.Timestamp | None, wall_now: pd.Timestamp) -> pd.Timestamp | None:
+    """
+    First anchor (bin end) to gap-fill: the one after the zone's last
+    prediction row, no earlier than gap_fill_max_bins before now. None when
+    gap fill is off or the zone has no prediction to continue from.
+    """
+    if not cfg.gap_fill_max_bins or last_predicted is None:
+        return None
+    freq = f"{cfg.interval_minutes}min"
+    step = pd.Timedelta(minutes=cfg.interval_minutes)
+    return max(last_predicted.floor(freq) + step, wall_now.floor(freq) - cfg.gap_fill_max_bins * step)
+
+
+def _readings_start(
+    cfg: Config,
+    backlog: pd.DataFrame,
+    wall_now: pd.Timestamp,
+    stored: dict | None = None,
+    gap_from: pd.Timestamp | None = None,
+) -> pd.Timestamp:
+    """Earliest reading time needed to cover the feature windows of the backlog, of gap-fill anchors (or of now)."""
+    window = pd.Timedelta(hours=cfg.lookback_hours) + pd.Timedelta(minutes=cfg.interval_minutes)
+    starts = [wall_now - window]
     if not backlog.empty:
-        earliest_pred = pd.to_datetime(backlog["timestamp"].min(), utc=True)
-        start_utc = (
-            earliest_pred
-            - pd.Timedelta(hours=cfg.lookback_hours)
-            - pd.Timedelta(minutes=cfg.interval_minutes)
+        starts.append(_backlog_start(cfg, backlog, stored))
+    if gap_from is not None:
+        starts.append(gap_from - window)
+    return min(starts)
+
+
+def _label_end(cfg: Config, backlog: pd.DataFrame) -> pd.Timestamp:
+    """End of the newest backlog row's label window."""
+    return pd.to_datetime(backlog["timestamp"].max(), utc=True) + pd.Timedelta(minutes=cfg.horizon_minutes)
+
+
+def _candle_hours(now: pd.Timestamp, start_utc: pd.Timestamp) -> int:
+    # Candles across the readings span (start_utc..now), plus buffer
+    return int(np.ceil((now - start_utc).total_seconds() / 3600.0)) + 2
+
+
+def _run_layout(cfg: Config) -> str:
+    # Settings that change what a run computes from the same readings
+    horizons = "_".join(f"{h}m" for h in _horizons(cfg))
+    layout = f"{cfg.model_version}_{cfg.lookback_hours}h_{cfg.interval_minutes}m_{horizons}_{cfg.scaling_mode}"
+    if cfg.feature_pooling:
+        layout += f"_{feature_layout(cfg.feature_pooling)}"
+    return layout
+
+
+# Run record entries (bin end ISO timestamps) that cover each run mode's work
+RECORD_KEYS = {
+    "full": ("predicted_end_utc", "trained_end_utc"),
+    "predict": ("predicted_end_utc",),
+    "train": ("trained_end_utc",),
+}
+
+
+def _unchanged(cfg: Config, record: dict | None, latest: pd.Timestamp | None) -> bool:
+    """
+    Whether a run would only repeat the zone's last one: the newest reading
+    falls in the bin the run record says was already predicted (and the
+    backlog drained at) with the same settings. Prediction timestamps are
+    bin ends and the horizon a whole number of bins, so no new bin also
+    means no newly matured prediction.
+    """
+    if not record or latest is None or record.get("layout") != _run_layout(cfg):
+        return False
+    bin_end = latest.floor(f"{cfg.interval_minutes}min").isoformat()
+    return all(record.get(k) == bin_end for k in RECORD_KEYS[cfg.run_mode])
+
+
+def _skip_unchanged(cfg: Config, record: dict, generation: int) -> int:
+    """Count a skipped run in the zone's run record; returns the zone's skipped runs so far."""
+    skipped = int(record.get("skipped_runs", 0)) + 1
+    try:
+        save_run_record(cfg, {**record, "skipped_runs": skipped}, generation)
+    except Exception as e:
+        print(f"WARNING: could not update run record for zone {cfg.zone_id}: {e}")
+    return skipped
+
+
+def _record_run(cfg: Config, record: dict | None, generation: int, summary: dict) -> None:
+    """Note the bin a finished run predicted / drained the backlog at in the zone's run record."""
+    layout = _run_layout(cfg)
+    updated = dict(record) if record and record.get("layout") == layout else {"layout": layout}
+    if cfg.run_mode != "train":
+        # A prediction row (or a coverage / gap skip row) was written for the bin
+        updated["predicted_end_utc"] = summary["timestamp"]
+    if cfg.run_mode != "predict" and summary.get("backlog_stop") == "drained" and not summary.get("status_failed"):
+        updated["trained_end_utc"] = summary["timestamp"]
+    try:
+        if not save_run_record(cfg, updated, generation):
+            print(f"Run record for zone {cfg.zone_id} was written by another run meanwhile; keeping it.")
+    except Exception as e:
+        print(f"WARNING: could not write run record for zone {cfg.zone_id}: {e}")
+
+
+RUN_MODES = ("full", "predict", "train")
+SCALING_MODES = ("window", "streaming")
+READINGS_FETCH_MODES = ("raw", "binned")
+STATUS_WRITE_MODES = ("merge", "row")
+STORAGE_BACKENDS = ("bigquery", "sqlite")
+
+
+def check_config(cfg: Config) -> None:
+    """Settings load_config cannot check on its own; raises RuntimeError."""
+    if cfg.run_mode not in RUN_MODES:
+        raise RuntimeError(f"Unknown RUN_MODE {cfg.run_mode!r}; expected one of {RUN_MODES}")
+    if cfg.scaling_mode not in SCALING_MODES:
+        raise RuntimeError(f"Unknown SCALING_MODE {cfg.scaling_mode!r}; expected one of {SCALING_MODES}")
+    if cfg.readings_fetch_mode not in READINGS_FETCH_MODES:
+        raise RuntimeError(
+            f"Unknown READINGS_FETCH_MODE {cfg.readings_fetch_mode!r}; expected one of {READINGS_FETCH_MODES}"
         )
-    else:
-        start_utc = (
-            wall_now
-            - pd.Timedelta(hours=cfg.lookback_hours)
-            - pd.Timedelta(minutes=cfg.interval_minutes)
+    if cfg.status_write_mode not in STATUS_WRITE_MODES:
+        raise RuntimeError(
+            f"Unknown STATUS_WRITE_MODE {cfg.status_write_mode!r}; expected one of {STATUS_WRITE_MODES}"
         )
+    if cfg.storage_backend not in STORAGE_BACKENDS:
+        raise RuntimeError(f"Unknown STORAGE_BACKEND {cfg.storage_backend!r}; expected one of {STORAGE_BACKENDS}")
+    # Extra horizons' label windows have to lie within the backlog's matured window
+    bad = [h for h in cfg.extra_horizons_minutes if not 0 < h <= cfg.horizon_minutes]
+    if bad:
+        raise RuntimeError(f"EXTRA_HORIZONS_MINUTES {bad} outside (0, HORIZON_MINUTES={cfg.horizon_minutes}]")
+    if cfg.feature_pooling:
+        n_steps = required_steps(cfg.lookback_hours, cfg.interval_minutes)
+        if sum(steps for steps, _ in cfg.feature_pooling) != n_steps or any(
+            factor < 1 or steps % factor for steps, factor in cfg.feature_pooling
+        ):
+            raise RuntimeError(
+                f"FEATURE_POOLING {cfg.feature_pooling} must split the {n_steps}-step window "
+                "into segments whose steps are a multiple of their factor"
+            )
 
-    # 3) Fetch readings over the correct span (end at wall-clock now for safety)
-    readings = fetch_readings(bq, cfg, start_utc=start_utc, end_utc=wall_now)
 
-    # 4) Define model "now" as latest sensor timestamp (this is what you predict forward from)
-    now = pd.to_datetime(readings["timestamp"].max(), utc=True)
+def main():
+    cfg = load_config()
+    check_config(cfg)
+    if cfg.zone_ids:
+        run_batch(cfg)
+    else:
+        run_single(cfg)
 
-    # 5) Re-fetch backlog using sensor-time now (maturity should be based on this clock)
-    backlog = fetch_untrained_matured_predictions(bq, cfg, now, limit=50)
 
-    # 6) Fetch candles across the same span (start_utc..now), plus buffer
-    hours = int(np.ceil((now - start_utc).total_seconds() / 3600.0)) + 2
-    candles = fetch_candle_events(bq, cfg, hours=hours)
+def run_single(cfg: Config) -> None:
+    tel = RunTelemetry("single", zoneId=cfg.zone_id, ingest_id=cfg.ingest_id)
+    db = open_backend(cfg, tel)
+    try:
+        _run_single(db, cfg, tel)
+    except Exception as e:
+        tel.emit(error=f"{type(e).__name__}: {e}")
+        raise
+    tel.emit()
 
-    n_steps = required_steps(cfg.lookback_hours, cfg.interval_minutes)
 
-    # Build FIXED-LENGTH grid for the new prediction, anchored to sensor-time now
-    grid, meta = resample_to_grid(
+def _submit_window_fetches(
+    plan: QueryPlanner,
+    db,
+    cfg: Config,
+    backlog: pd.DataFrame,
+    wall_now: pd.Timestamp,
+    stored: dict | None = None,
+    gap_from: pd.Timestamp | None = None,
+) -> pd.Timestamp:
+    """
+    Issue the readings (or bins plus backlog / gap-fill readings) and candle
+    fetches covering the current window, the backlog's feature windows
+    (label windows only, for stored vectors) and those of the gap-fill
+    anchors from gap_from; they run concurrently. Returns the readings start.
+    """
+    # Earliest start needed to cover feature windows for backlog and gaps
+    start_utc = _readings_start(cfg, backlog, wall_now, stored, gap_from)
+
+    # Readings end at wall-clock now for safety; candles across the readings
+    # span up to wall-clock now, plus buffer
+    if cfg.readings_cache_dir:
+        fetch = partial(fetch_readings_cached, db)
+    else:
+        fetch = db.fetch_readings
+    if cfg.readings_fetch_mode == "binned":
+        # Bins for the current grid; raw readings only around the backlog
+        # (training windows and labels still need them) and the gap-fill windows
+        plan.submit("bins", "readings_fetch", db.fetch_readings_binned, cfg, start_utc=start_utc, end_utc=wall_now)
+        spans = []
+        if not backlog.empty:
+            spans.append((_backlog_start(cfg, backlog, stored), _label_end(cfg, backlog)))
+        if gap_from is not None:
+            spans.append((_readings_start(cfg, pd.DataFrame(), gap_from), wall_now))
+        if spans:
+            plan.submit(
+                "readings", "readings_fetch", fetch,
+                cfg, start_utc=min(a for a, _ in spans), end_utc=max(b for _, b in spans),
+            )
+    else:
+        plan.submit("readings", "readings_fetch", fetch, cfg, start_utc=start_utc, end_utc=wall_now)
+    plan.submit("candles", "candles_fetch", db.fetch_candle_events, cfg, hours=_candle_hours(wall_now, start_utc))
+    return start_utc
+
+
+def _run_single(db, cfg: Config, tel: RunTelemetry) -> None:
+    t0 = time.perf_counter()
+    check_ingest = bool(cfg.ingest_id) and cfg.run_mode != "train"
+    waiting = 0
+    with QueryPlanner(db, tel, cfg.query_concurrency) as plan:
+        # 0) Change detection, on its own so an unchanged zone exits before
+        #    any other query is in flight: the run record and the newest
+        #    reading, concurrently
+        wall_now = pd.Timestamp.now(tz="UTC")
+        if cfg.skip_unchanged:
+            plan.submit("record", "watermark_check", load_run_record, cfg)
+            plan.submit(
+                "latest", "watermark_check", db.fetch_latest_reading_time,
+                cfg, start_utc=_readings_start(cfg, pd.DataFrame(), wall_now), end_utc=wall_now,
+            )
+            record, record_generation = plan.result("record")
+            if _unchanged(cfg, record, plan.result("latest")):
+                skipped = _skip_unchanged(cfg, record, record_generation)
+                tel.attrs["skipped"] = "unchanged"
+                print(
+                    f"No new reading bin for zone {cfg.zone_id} since {record[RECORD_KEYS[cfg.run_mode][0]]} "
+                    f"(RUN_MODE={cfg.run_mode}), skipping; {skipped} unchanged run(s) skipped so far."
+                )
+                return
+
+        # 1) Use wall-clock just to discover backlog + decide how far back to query.
+        #    The backlog is fetched once, with the widest bound and every page the
+        #    run may drain; sensor-time maturity and paging filter it locally.
+        #    The idempotency check, and the last prediction row gap fill
+        #    continues from, run alongside.
+        gap_fill = cfg.gap_fill_max_bins > 0 and cfg.run_mode != "train"
+        if check_ingest:
+            plan.submit("ingest", "ingest_check", db.has_processed_ingest, cfg)
+        if gap_fill:
+            plan.submit("last_predicted", "gap_check", db.fetch_last_prediction_time, cfg)
+        if cfg.run_mode != "predict":
+            plan.submit(
+                "backlog", "backlog_fetch", db.fetch_untrained_matured_predictions,
+                cfg, wall_now, limit=max(cfg.backlog_max_rows, cfg.backlog_page_size),
+            )
+            backlog = None
+        else:
+            # Predict-only: no backlog, so the readings window is known up front and
+            # every query goes out in this first round (with gap fill, once the
+            # last prediction is known). The backlog is only probed for whether
+            # enough of it is waiting to train after predicting.
+            backlog = pd.DataFrame()
+            if cfg.train_backlog_threshold > 0:
+                plan.submit(
+                    "waiting", "backlog_fetch", db.fetch_untrained_matured_predictions,
+                    cfg, wall_now, limit=cfg.train_backlog_threshold,
+                )
+            gap_from = _gap_from(cfg, plan.result("last_predicted"), wall_now) if gap_fill else None
+            _submit_window_fetches(plan, db, cfg, backlog, wall_now, gap_from=gap_from)
+
+        # Idempotency guard by ingest_id
+        if check_ingest and plan.result("ingest"):
+            print(f"Ingest {cfg.ingest_id} already processed for zone {cfg.zone_id}, skipping.")
+            return
+
+        # 2) Readings and candles over the span the backlog needs; backlog rows
+        #    whose feature vectors were stored at prediction time need only
+        #    their label windows
+        stored = None
+        if backlog is None:
+            backlog = plan.result("backlog")
+            if cfg.feature_store_uri and not backlog.empty:
+                stored = plan.submit("stored", "feature_store_load", load_vectors, cfg, backlog).result()
+            gap_from = _gap_from(cfg, plan.result("last_predicted"), wall_now) if gap_fill else None
+            _submit_window_fetches(plan, db, cfg, backlog, wall_now, stored, gap_from)
+
+        bins = None
+        if cfg.readings_fetch_mode == "binned":
+            bins = plan.result("bins")
+            readings = (
+                plan.result("readings") if not backlog.empty or gap_from is not None
+                else pd.DataFrame(columns=["timestamp"] + RAW_SENSOR_COLS)
+            )
+        else:
+            readings = plan.result("readings")
+        candles = plan.result("candles")
+        if cfg.train_backlog_threshold > 0 and cfg.run_mode == "predict":
+            waiting = len(plan.result("waiting"))
+
+    # 3) run_zone takes model "now" from the latest sensor timestamp and
+    #    filters the backlog to it (maturity is based on this clock)
+    summary = run_zone(
+        db,
+        cfg,
         readings,
-        cfg.interval_minutes,
-        end_utc=now,
-        required_steps=n_steps,
+        candles,
+        lambda t, after: _zone_backlog(backlog, cfg, t, after),
+        tel,
+        bins=bins,
+        stored=stored,
+        gap_from=gap_from,
     )
+    summary["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    print(json.dumps(summary, indent=2))
+    if cfg.skip_unchanged:
+        with tel.span("run_record"):
+            _record_run(cfg, record, record_generation, summary)
 
-    # Rule A: coverage threshold
-    if meta["coverage"] < COVERAGE_THRESHOLD:
-        pred_row = {
-            "timestamp": pd.to_datetime(meta["end_utc"]).to_pydatetime(),
-            "zoneId": cfg.zone_id,
-            "probability": -1.0,
-            "probability_percent": -1.0,
-            "model_version": cfg.model_version,
-            "features_hash": None,
-            "trained_on_label": False,
-            "label_frost_observed": None,
-            "label_window_start": None,
-            "label_window_end": None,
-            "skipped_reason": _coverage_skip_reason("insufficient_real_points", meta),
-            "ingest_id": cfg.ingest_id,
-            "triggered_at": datetime.now(timezone.utc),
-        }
-        insert_prediction_row(bq, cfg, pred_row)
-        return
+    # The prediction is written; now the backlog, if enough of it piled up
+    if waiting and waiting >= cfg.train_backlog_threshold:
+        print(f"{waiting} matured predictions waiting (TRAIN_BACKLOG_THRESHOLD={cfg.train_backlog_threshold}); training.")
+        _run_single(db, replace(cfg, run_mode="train"), tel)
 
-    # Rule B: max-gap threshold
-    if meta["max_gap_bins"] > MAX_GAP_BINS:
-        pred_row = {
-            "timestamp": pd.to_datetime(meta["end_utc"]).to_pydatetime(),
-            "zoneId": cfg.zone_id,
-            "probability": -1.0,
-            "probability_percent": -1.0,
-            "model_version": cfg.model_version,
-            "features_hash": None,
-            "trained_on_label": False,
-            "label_frost_observed": None,
-            "label_window_start": None,
-            "label_window_end": None,
-            "skipped_reason": _gap_skip_reason("gap_too_large_for_prediction", meta),
-            "ingest_id": cfg.ingest_id,
-            "triggered_at": datetime.now(timezone.utc),
-        }
-        insert_prediction_row(bq, cfg, pred_row)
-        return
 
-    # Build "current" feature vector (grid is already exactly n_steps long)
-    candle_now = latest_candles_on(candles, pd.to_datetime(meta["end_utc"], utc=True))
-    x_np, features_hash = build_features(grid, candle_now)
+def _zone_backlog(
+    backlog: pd.DataFrame, cfg: Config, now: pd.Timestamp, after: pd.Timestamp | None = None
+) -> pd.DataFrame:
+    """
+    Slice one zone's matured backlog page out of the run's prefetched
+    backlog, as fetch_untrained_matured_predictions(now, after=after) would
+    return it.
+    """
+    if backlog.empty:
+        return backlog
+    cutoff = now - pd.Timedelta(minutes=cfg.horizon_minutes)
+    mask = (backlog["zoneId"] == cfg.zone_id) & (backlog["timestamp"] <= cutoff)
+    if after is not None:
+        mask &= backlog["timestamp"] > after
+    rows = backlog[mask]
+    return rows.sort_values("timestamp", kind="stable").head(cfg.backlog_page_size).reset_index(drop=True)
 
-    # Model + optimizer
-    model = FrostMLP(input_dim=x_np.shape[0])
-    opt = torch.optim.AdamW(model.parameters(), lr=cfg.lr, weight_decay=cfg.weight_decay)
 
-    # Load persisted state (weights/optimizer)
-    state = load_state(cfg)
-    if state:
-        try:
-            model.load_state_dict(state["model"])
-            opt.load_state_dict(state["opt"])
-        except Exception as e:
-            print(f"WARNING: could not load persisted model/optimizer state (starting fresh): {e}")
+def run_batch(cfg: Config) -> None:
+    """
+    Run every zone in cfg.zone_ids in one process.
 
-    model.train()
+    Readings, backlog and candle events are fetched once for all zones
+    (zoneId IN UNNEST(@zones)), independent queries concurrently (planner.py);
+    each zone then goes through the same
+    run_zone() path as a single-zone job. Prints one summary per zone and a
+    batch report with per-zone timings. With RUN_MODE=predict, zones with at
+    least TRAIN_BACKLOG_THRESHOLD matured predictions waiting get a
+    RUN_MODE=train batch afterwards. With SKIP_UNCHANGED, zones without a
+    new reading bin since their last run are dropped before anything else
+    is fetched.
+    """
+    t0 = time.perf_counter()
+    zone_ids = list(dict.fromkeys(cfg.zone_ids))
+    zone_cfgs = {z: replace(cfg, zone_id=z, zone_ids=()) for z in zone_ids}
 
-    # Learn from any mature prediction not yet trained on
-    backlog = fetch_untrained_matured_predictions(bq, cfg, now, limit=50)
+    if cfg.readings_fetch_mode != "raw":
+        print(f"WARNING: READINGS_FETCH_MODE={cfg.readings_fetch_mode} applies to single-zone runs; batch fetches raw readings")
 
-    trained_count = 0
-    skipped_count = 0
+    # Shared fetches are one telemetry record; each zone run emits its own
+    tel = RunTelemetry("batch", zoneIds=zone_ids, ingest_id=cfg.ingest_id)
+    db = open_backend(cfg, tel)
 
-    for _, prev_pred in backlog.iterrows():
-        pred_time = pd.to_datetime(prev_pred["timestamp"], utc=True)
-        label_start = pred_time
-        label_end = pred_time + pd.Timedelta(minutes=cfg.horizon_minutes)
+    with QueryPlanner(db, tel, cfg.query_concurrency) as plan:
+        # Change detection first: every zone's run record and newest reading;
+        # zones whose run would only repeat their last one drop out here
+        wall_now = pd.Timestamp.now(tz="UTC")
+        records = {}
+        unchanged = []
+        if cfg.skip_unchanged:
+            for z in zone_ids:
+                plan.submit(f"record:{z}", "watermark_check", load_run_record, zone_cfgs[z])
+            plan.submit(
+                "latest", "watermark_check", db.fetch_latest_reading_time_for_zones,
+                cfg, zone_ids, start_utc=_readings_start(cfg, pd.DataFrame(), wall_now), end_utc=wall_now,
+            )
+            latest = plan.result("latest")
+            records = {z: plan.result(f"record:{z}") for z in zone_ids}
+            unchanged = [z for z in zone_ids if _unchanged(zone_cfgs[z], records[z][0], latest.get(z))]
+            skipped = {
+                z: plan.submit(f"skip:{z}", "watermark_check", _skip_unchanged, zone_cfgs[z], *records[z])
+                for z in unchanged
+            }
+            for z in unchanged:
+                print(f"No new reading bin for zone {z} (RUN_MODE={cfg.run_mode}), skipping; "
+                      f"{skipped[z].result()} unchanged run(s) skipped so far.")
+        active = [z for z in zone_ids if z not in unchanged]
 
-        # If candles were active in the label window -> resolve but DO NOT train
-        if candles_on_during_window(candles, label_start, label_end):
-            update_prediction_training_status(
-                bq=bq,
-                cfg=cfg,
-                pred_timestamp_utc=pred_time,
-                trained_on_label=False,
-                skipped_reason="frost candles deployed",
-                label_frost_observed=None,
-                label_window_start_utc=label_start,
-                label_window_end_utc=label_end,
+        # Widest bound (wall-clock now) covers every zone's sensor-time backlog;
+        # every page a zone may drain is fetched here and sliced locally. The
+        # ingest check runs alongside; zones it rules out are dropped locally.
+        check_ingest = bool(cfg.ingest_id) and cfg.run_mode != "train" and bool(active)
+        gap_fill = cfg.gap_fill_max_bins > 0 and cfg.run_mode != "train" and bool(active)
+        if check_ingest:
+            plan.submit("ingest", "ingest_check", db.fetch_processed_ingest_zones, cfg, active)
+        if gap_fill:
+            plan.submit("last_predicted", "gap_check", db.fetch_last_prediction_time_for_zones, cfg, active)
+        if active and cfg.run_mode != "predict":
+            plan.submit(
+                "backlog", "backlog_fetch", db.fetch_untrained_matured_predictions_for_zones,
+                cfg, active, wall_now, limit=max(cfg.backlog_max_rows, cfg.backlog_page_size),
+            )
+        elif active and cfg.train_backlog_threshold > 0:
+            # Predict-only: just probe how much backlog is waiting per zone
+            plan.submit(
+                "waiting", "backlog_fetch", db.fetch_untrained_matured_predictions_for_zones,
+                cfg, active, wall_now, limit=cfg.train_backlog_threshold,
             )
-            skipped_count += 1
+
+        done = plan.result("ingest") if check_ingest else set()
+        for z in done:
+            print(f"Ingest {cfg.ingest_id} already processed for zone {z}, skipping.")
+        pending = [z for z in active if z not in done]
+
+        stored = None
+        if pending:
+            backlog = plan.result("backlog") if cfg.run_mode != "predict" else pd.DataFrame()
+            if cfg.feature_store_uri and not backlog.empty:
+                stored = plan.submit("stored", "feature_store_load", load_vectors, cfg, backlog).result()
+            last_predicted = plan.result("last_predicted") if gap_fill else {}
+            gap_from = {z: _gap_from(zone_cfgs[z], last_predicted.get(z), wall_now) for z in pending}
+            starts = {
+                z: _readings_start(
+                    zone_cfgs[z], _zone_backlog(backlog, zone_cfgs[z], wall_now), wall_now, stored, gap_from[z]
+                )
+                for z in pending
+            }
+            # Readings and candles concurrently; candles across each zone's
+            # readings span up to wall-clock now, plus buffer
+            hours = {z: _candle_hours(wall_now, starts[z]) for z in pending}
+            if cfg.readings_cache_dir:
+                fetch_for_zones = partial(fetch_readings_for_zones_cached, db)
+            else:
+                fetch_for_zones = db.fetch_readings_for_zones
+            plan.submit(
+                "readings", "readings_fetch", fetch_for_zones,
+                cfg, pending, start_utc=min(starts.values()), end_utc=wall_now,
+            )
+            plan.submit(
+                "candles", "candles_fetch", db.fetch_candle_events_for_zones,
+                cfg, pending, wall_now - pd.Timedelta(hours=max(hours.values())),
+            )
+            readings_all = plan.result("readings")
+            candles_all = plan.result("candles")
+
+        train_zones = []
+        if pending and cfg.run_mode == "predict" and cfg.train_backlog_threshold > 0:
+            waiting = plan.result("waiting")
+            counts = waiting["zoneId"].value_counts() if not waiting.empty else {}
+            train_zones = [z for z in pending if counts.get(z, 0) >= cfg.train_backlog_threshold]
+    shared_fetch_s = time.perf_counter() - t0
+
+    summaries = []
+    failures = {}
+    readings_by_zone = {}
+    for z in pending:
+        df = readings_all.get(z)
+        if df is not None:
+            df = df[df["timestamp"] >= starts[z]].reset_index(drop=True)
+        if df is None or df.empty:
+            failures[z] = "No sensor data returned for this zone in the requested window."
             continue
+        readings_by_zone[z] = df
 
-        # Compute label from realized temps in the future window
-        label_val = compute_label_frost_in_window(
-            readings, label_start, label_end, cfg.frost_temp_threshold
-        )
-        if label_val is None:
-            update_prediction_training_status(
-                bq=bq,
-                cfg=cfg,
-                pred_timestamp_utc=pred_time,
-                trained_on_label=False,
-                skipped_reason="insufficient_label_data",
-                label_frost_observed=None,
-                label_window_start_utc=label_start,
-                label_window_end_utc=label_end,
+    for z, readings in readings_by_zone.items():
+        zt0 = time.perf_counter()
+        zcfg = zone_cfgs[z]
+        candles = candles_all[
+            (candles_all["zoneId"] == z)
+            & (candles_all["timestamp"] >= wall_now - pd.Timedelta(hours=hours[z]))
+        ][["timestamp", "candlesOn"]].reset_index(drop=True)
+        zone_tel = RunTelemetry("zone", zoneId=z, ingest_id=cfg.ingest_id)
+        try:
+            summary = run_zone(
+                db.with_telemetry(zone_tel),
+                zcfg,
+                readings,
+                candles,
+                lambda t, after, zcfg=zcfg: _zone_backlog(backlog, zcfg, t, after),
+                zone_tel,
+                stored=stored,
+                gap_from=gap_from[z],
             )
-            skipped_count += 1
+        except Exception as e:
+            failures[z] = f"{type(e).__name__}: {e}"
+            zone_tel.emit(error=failures[z])
             continue
+        if cfg.skip_unchanged:
+            with zone_tel.span("run_record"):
+                _record_run(zcfg, *records[z], summary)
+        zone_tel.emit()
+        summary["elapsed_s"] = round(time.perf_counter() - zt0, 3)
+        print(json.dumps(summary, indent=2))
+        summaries.append(summary)
+
+    total_s = time.perf_counter() - t0
+    tel.emit(zones_run=len(summaries), zones_failed=sorted(failures), zones_skipped_unchanged=len(unchanged))
+    print(json.dumps({
+        "zones": len(zone_ids),
+        "zones_run": len(summaries),
+        "zones_skipped_ingest": len(done),
+        "zones_skipped_unchanged": len(unchanged),
+        "zones_failed": failures,
+        "shared_fetch_s": round(shared_fetch_s, 3),
+        "zone_elapsed_s": {s["zoneId"]: s["elapsed_s"] for s in summaries},
+        "total_s": round(total_s, 3),
+        "mean_s_per_zone": round(total_s / max(len(zone_ids), 1), 3),
+    }, indent=2))
+
+    # Predictions are written; now the zones whose backlog piled up
+    train_zones = [z for z in train_zones if z not in failures]
+    if train_zones:
+        print(f"{len(train_zones)} zone(s) at TRAIN_BACKLOG_THRESHOLD={cfg.train_backlog_threshold}; training.")
+        run_batch(replace(cfg, run_mode="train", zone_ids=tuple(train_zones)))
+
+    if failures:
+        raise RuntimeError(f"Frost batch failed for {len(failures)} zone(s): {sorted(failures)}")
+
+
+def _resolve_labels(
+    cfg: Config, candle_index: CandleIndex, label_index: LabelIndex, times: list[pd.Timestamp]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    For predictions at times: whether candles were on in each label window
+    [t, t + horizon], the realized frost label and whether it was
+    unresolvable (no readings), and the extra horizons' labels as an
+    (n, len(extra_horizons_minutes)) array, NaN where unresolvable.
+    """
+    horizon = pd.Timedelta(minutes=cfg.horizon_minutes)
+    label_ends = [t + horizon for t in times]
+    candles_in_label = candle_index.any_on_during_many(times, label_ends)
+    labels, _, no_label = label_index.resolve(times, label_ends, cfg.frost_temp_threshold)
+    # Extra horizons' labels from the same index, one column per horizon
+    extra_labels = np.full((len(times), len(cfg.extra_horizons_minutes)), np.nan)
+    for k, h in enumerate(cfg.extra_horizons_minutes):
+        ends = [t + pd.Timedelta(minutes=h) for t in times]
+        extra, _, missing = label_index.resolve(times, ends, cfg.frost_temp_threshold)
+        extra_labels[:, k] = np.where(missing, np.nan, extra)
+    return candles_in_label, labels, no_label, extra_labels
+
+
+def _train_on_backlog(
+    cfg: Config,
+    tel: RunTelemetry,
+    model: "FrostMLP",
+    opt: "torch.optim.Optimizer",
+    readings: pd.DataFrame,
+    candle_index: CandleIndex,
+    label_index: LabelIndex,
+    backlog: pd.DataFrame,
+    n_steps: int,
+    examples: list[tuple[np.ndarray, float | np.ndarray]],
+    stored: dict | None = None,
+    scaler: StreamingScaler | None = None,
+) -> tuple[list[TrainingStatusUpdate], int, int]:
+    """
+    One training step per resolvable row of a backlog page. Returns the
+    resolutions to write and the trained / skipped counts; each step's
+    (features, label) is appended to examples.
 
-        
-        # Anchor training and prediction to ingest timestamp
-        hist = readings[readings["timestamp"] <= pred_time].copy()
+    With extra horizons the label is an array, one per model output (NaN
+    where that horizon's window had no readings), and a row trains when
+    its HORIZON_MINUTES label resolves.
 
-        hist_grid, hist_meta = resample_to_grid(
-            hist,
+    stored: (x, window meta) saved at prediction time, by (zoneId,
+    timestamp); those rows skip the window rebuild.
+    """
+    # Feature windows for every backlog anchor not in the store, in one vectorized pass
+    with tel.span("backlog_features", rows=len(backlog)):
+        backlog_times = [pd.to_datetime(t, utc=True) for t in backlog["timestamp"]] if not backlog.empty else []
+        found = [stored.get((cfg.zone_id, t)) for t in backlog_times] if stored else [None] * len(backlog_times)
+        rebuild = [i for i, v in enumerate(found) if v is None]
+        rebuild_times = [backlog_times[i] for i in rebuild]
+        rebuilt_X, _, rebuilt_metas = build_window_features(
+            readings,
+            rebuild_times,
+            candle_index.states_at(rebuild_times).tolist(),
             cfg.interval_minutes,
-            end_utc=pred_time,
             required_steps=n_steps,
+            scaler=scaler,
+            pooling=cfg.feature_pooling,
         )
+        for j, i in enumerate(rebuild):
+            found[i] = (rebuilt_X[j], rebuilt_metas[j])
+        hist_X = [x for x, _ in found]
+        hist_metas = [m for _, m in found]
+        candles_in_label, labels, no_label, extra_labels = _resolve_labels(
+            cfg, candle_index, label_index, backlog_times
+        )
+
+    trained_count = 0
+    skipped_count = 0
+    # Resolutions are collected here and written with one MERGE per page
+    statuses: list[TrainingStatusUpdate] = []
+
+    with tel.span("train", rows=len(backlog)):
+        for i, (_, prev_pred) in enumerate(backlog.iterrows()):
+            pred_time = pd.to_datetime(prev_pred["timestamp"], utc=True)
+            label_start = pred_time
+            label_end = pred_time + pd.Timedelta(minutes=cfg.horizon_minutes)
+
+            # If candles were active in the label window -> resolve but DO NOT train
+            if candles_in_label[i]:
+                statuses.append(TrainingStatusUpdate(
+                    pred_timestamp_utc=pred_time,
+                    trained_on_label=False,
+                    skipped_reason="frost candles deployed",
+                    label_frost_observed=None,
+                    label_window_start_utc=label_start,
+                    label_window_end_utc=label_end,
+                ))
+                skipped_count += 1
+                continue
+
+            # Label from realized temps in the future window
+            if no_label[i]:
+                statuses.append(TrainingStatusUpdate(
+                    pred_timestamp_utc=pred_time,
+                    trained_on_label=False,
+                    skipped_reason="insufficient_label_data",
+                    label_frost_observed=None,
+                    label_window_start_utc=label_start,
+                    label_window_end_utc=label_end,
+                ))
+                skipped_count += 1
+                continue
+            label_val = int(labels[i])
+            horizon_labels = None
+            target = float(label_val)
+            if cfg.extra_horizons_minutes:
+                target = np.array([label_val, *extra_labels[i]], dtype=np.float32)
+                horizon_labels = _horizon_json(cfg, [None if np.isnan(v) else int(v) for v in target])
+
+            # Training window anchored to the prediction timestamp (readings <= pred_time)
+            hist_meta = hist_metas[i]
 
-        # Rule A: coverage check for training window
-        if hist_meta["coverage"] < COVERAGE_THRESHOLD:
-            update_prediction_training_status(
-                bq=bq,
-                cfg=cfg,
+            # Rule A: coverage check for training window
+            if hist_meta["coverage"] < COVERAGE_THRESHOLD:
+                statuses.append(TrainingStatusUpdate(
+                    pred_timestamp_utc=pred_time,
+                    trained_on_label=False,
+                    skipped_reason=_coverage_skip_reason("insufficient_real_points_for_training", hist_meta),
+                    label_frost_observed=int(label_val),
+                    label_window_start_utc=label_start,
+                    label_window_end_utc=label_end,
+                    horizon_labels=horizon_labels,
+                ))
+                skipped_count += 1
+                continue
+
+            # Rule B: max-gap check for training window
+            if hist_meta["max_gap_bins"] > MAX_GAP_BINS:
+                statuses.append(TrainingStatusUpdate(
+                    pred_timestamp_utc=pred_time,
+                    trained_on_label=False,
+                    skipped_reason=_gap_skip_reason("gap_too_large_for_training", hist_meta),
+                    label_frost_observed=int(label_val),
+                    label_window_start_utc=label_start,
+                    label_window_end_utc=label_end,
+                    horizon_labels=horizon_labels,
+                ))
+                skipped_count += 1
+                continue
+
+            x_prev_np = hist_X[i]
+            _train_step(model, opt, x_prev_np, target)
+            examples.append((x_prev_np, target))
+
+            statuses.append(TrainingStatusUpdate(
                 pred_timestamp_utc=pred_time,
-                trained_on_label=False,
-                skipped_reason=_coverage_skip_reason("insufficient_real_points_for_training", hist_meta),
+                trained_on_label=True,
+                skipped_reason=None,
                 label_frost_observed=int(label_val),
                 label_window_start_utc=label_start,
                 label_window_end_utc=label_end,
+                horizon_labels=horizon_labels,
+            ))
+            trained_count += 1
+
+    return statuses, trained_count, skipped_count
+
+
+def _store_features(cfg: Config, tel: RunTelemetry, vectors: list[tuple[dict, np.ndarray, str]]) -> None:
+    """The run's predicted (window meta, x, features_hash), stored in one write per day."""
+    # The predictions are already written; a failed store only costs window rebuilds later
+    if not cfg.feature_store_uri or not vectors:
+        return
+    with tel.span("feature_store_write", rows=len(vectors)):
+        try:
+            store_vectors(cfg, [(pd.to_datetime(meta["end_utc"], utc=True), x, h, meta) for meta, x, h in vectors])
+        except Exception as e:
+            print(f"WARNING: could not store {len(vectors)} feature vector(s) for zone {cfg.zone_id}: {e}")
+
+
+def _gap_anchors(cfg: Config, gap_from: pd.Timestamp | None, meta: dict) -> list[pd.Timestamp]:
+    """Gap-fill anchors: every bin end from gap_from up to, not including, the current window's end."""
+    if gap_from is None:
+        return []
+    step = pd.Timedelta(minutes=cfg.interval_minutes)
+    return list(pd.date_range(gap_from, pd.to_datetime(meta["end_utc"], utc=True) - step, freq=step))
+
+
+def _fill_gaps(
+    db,
+    cfg: Config,
+    tel: RunTelemetry,
+    readings: pd.DataFrame,
+    candle_index: CandleIndex,
+    anchors: list[pd.Timestamp],
+    n_steps: int,
+    scaler: StreamingScaler | None,
+    score: Callable[[np.ndarray], np.ndarray],
+    vectors: list[tuple[dict, np.ndarray, str]],
+) -> int:
+    """
+    Prediction rows for anchors a run missed (outage, deploy, lease): every
+    feature window in one vectorized pass, Rules A / B per window, the rest
+    scored in one batched forward (score(X) -> probabilities, one column
+    per horizon), and all rows written with one insert. The scored windows'
+    vectors are appended to vectors for _store_features. Returns the rows
+    written.
+    """
+    if not anchors:
+        return 0
+    with tel.span("gap_features", anchors=len(anchors)):
+        X, hashes, metas = build_window_features(
+            readings,
+            anchors,
+            candle_index.states_at(anchors).tolist(),
+            cfg.interval_minutes,
+            required_steps=n_steps,
+            scaler=scaler,
+            pooling=cfg.feature_pooling,
+        )
+
+    rows = []
+    scored = []
+    for i, meta in enumerate(metas):
+        if meta["coverage"] < COVERAGE_THRESHOLD:
+            rows.append(_skipped_row(cfg, meta, _coverage_skip_reason("insufficient_real_points", meta)))
+        elif meta["max_gap_bins"] > MAX_GAP_BINS:
+            rows.append(_skipped_row(cfg, meta, _gap_skip_reason("gap_too_large_for_prediction", meta)))
+        else:
+            scored.append(i)
+
+    with tel.span("gap_predict", rows=len(scored)):
+        probs = score(X[scored]) if scored else []
+    rows += [_prediction_row(cfg, metas[i], p[0], hashes[i], p) for i, p in zip(scored, probs)]
+    rows.sort(key=lambda row: row["timestamp"])
+
+    with tel.span("gap_insert", rows=len(rows)):
+        db.insert_prediction_rows(cfg, rows)
+    vectors += [(metas[i], X[i], hashes[i]) for i in scored]
+    print(f"Gap fill for zone {cfg.zone_id}: {len(rows)} missed anchor(s) from {anchors[0].isoformat()}, {len(scored)} scored.")
+    return len(rows)
+
+
+def _load_shadows(cfg: Config, tel: RunTelemetry, input_dim: int) -> "ShadowModels | None":
+    if not cfg.shadow_models:
+        return None
+    from shadow import ShadowModels
+
+    with tel.span("shadow_load"):
+        return ShadowModels(cfg, input_dim, len(_horizons(cfg)))
+
+
+def _write_shadows(db, cfg: Config, tel: RunTelemetry, shadows: "ShadowModels | None") -> list:
+    """
+    The run's shadow rows in one insert (a failure only loses them) and the
+    shadow state uploads, returned as futures to wait for.
+    """
+    if shadows is None:
+        return []
+    with tel.span("shadow_insert", rows=len(shadows.rows)):
+        try:
+            db.insert_shadow_rows(cfg, shadows.rows)
+        except Exception as e:
+            print(f"WARNING: could not write shadow rows for zone {cfg.zone_id}: {e}")
+    with tel.span("shadow_save"):
+        return shadows.save_async()
+
+
+def _train_step(
+    model: "FrostMLP", opt: "torch.optim.Optimizer", x_np: np.ndarray, label: float | np.ndarray
+) -> None:
+    """
+    One optimizer step on one example, or on a mini-batch (x_np of shape
+    (n, input_dim), label one row per example) with the mean loss.
+    """
+    import torch
+    import torch.nn.functional as F
+
+    x = torch.from_numpy(np.atleast_2d(x_np).astype(np.float32))
+    y = torch.tensor(np.reshape(label, (x.shape[0], -1)), dtype=torch.float32)
+
+    opt.zero_grad()
+    logits = model(x)
+    known = ~torch.isnan(y)
+    if bool(known.all()):
+        loss = F.binary_cross_entropy_with_logits(logits, y)
+    else:
+        # Horizons whose label window had no readings do not contribute
+        loss = F.binary_cross_entropy_with_logits(logits[known], y[known])
+    loss.backward()
+    opt.step()
+
+
+def _resume_scaler(saved: dict | None, grid: pd.DataFrame, block: np.ndarray) -> StreamingScaler:
+    # Persisted running statistics, advanced by the window's bins they have not seen
+    scaler = StreamingScaler.from_state(saved, block.shape[1])
+    scaler.update(grid["timestamp"], block)
+    return scaler
+
+
+def _checkpoint(cfg: Config, model: "FrostMLP", opt: "torch.optim.Optimizer", scaler: StreamingScaler | None) -> dict:
+    state = {"model": model.state_dict(), "opt": opt.state_dict(), "version": cfg.model_version}
+    if scaler is not None:
+        state["scaler"] = scaler.to_state()
+    if cfg.feature_pooling:
+        state["feature_layout"] = feature_layout(cfg.feature_pooling)
+    return state
+
+
+def _replayer(
+    cfg: Config,
+    input_dim: int,
+    examples: list[tuple[np.ndarray, float | np.ndarray]],
+    scaling_window: tuple[pd.DataFrame, np.ndarray] | None = None,
+):
+    """
+    replay(base_state, start, end) for VersionedState: this run's training
+    steps start..end applied, in order, on top of another run's newer state.
+    With streaming scaling the newer state's statistics are advanced by this
+    run's window (scaling_window: grid, scaling block) instead.
+    """
+    def replay(base: dict | None, start: int, end: int) -> dict:
+        import torch
+        from model import FrostMLP
+
+        model = FrostMLP(input_dim=input_dim, n_outputs=len(_horizons(cfg)))
+        opt = torch.optim.AdamW(model.parameters(), lr=cfg.lr, weight_decay=cfg.weight_decay)
+        if base:
+            try:
+                model.load_state_dict(base["model"])
+                opt.load_state_dict(base["opt"])
+            except Exception as e:
+                print(f"WARNING: could not load concurrent model/optimizer state (replaying onto fresh): {e}")
+        model.train()
+        for x_np, label in examples[start:end]:
+            _train_step(model, opt, x_np, label)
+        scaler = _resume_scaler((base or {}).get("scaler"), *scaling_window) if scaling_window else None
+        return _checkpoint(cfg, model, opt, scaler)
+
+    return replay
+
+
+def run_zone(
+    db,
+    cfg: Config,
+    readings: pd.DataFrame,
+    candles: pd.DataFrame,
+    load_backlog: Callable[[pd.Timestamp, pd.Timestamp | None], pd.DataFrame],
+    tel: RunTelemetry,
+    bins: pd.DataFrame | None = None,
+    stored: dict | None = None,
+    gap_from: pd.Timestamp | None = None,
+) -> dict:
+    """
+    Predict for one zone (training on its matured backlog first) from
+    already-fetched readings and candle events. Returns the run summary.
+    Stage spans are recorded into tel.
+
+    RUN_MODE=train resolves the backlog and saves state without writing a
+    prediction (nor the coverage / gap skip rows); RUN_MODE=predict is given
+    no backlog, so it only loads the model, predicts and inserts, with the
+    NumPy forward pass over the exported weights when there are any.
+
+    load_backlog(now, after) returns the next page of matured backlog rows
+    (newer than after); readings must cover every page it can return.
+
+    With bins (server-side binned fetch) the current grid and sensor-time
+    now come from them, and readings only has to cover the backlog.
+
+    With cfg.feature_store_uri the prediction's feature vector is stored,
+    and backlog rows found in stored (load_vectors) train on their stored
+    vector; readings then only has to cover their label windows.
+
+    With gap_from (_gap_from) a predicting run also writes rows for the
+    anchors from gap_from up to the current one, in one batch (_fill_gaps);
+    readings must cover their windows.
+    """
+    np.random.seed(cfg.seed)
+
+    if bins is not None:
+        now = pd.to_datetime(bins["last_ts"].max(), utc=True)
+    else:
+        now = pd.to_datetime(readings["timestamp"].max(), utc=True)
+
+    n_steps = required_steps(cfg.lookback_hours, cfg.interval_minutes)
+    predicting = cfg.run_mode != "train"
+
+    # Build FIXED-LENGTH grid for the new prediction, anchored to sensor-time now
+    with tel.span("current_grid"):
+        if bins is not None:
+            grid, meta = grid_from_bins(bins, cfg.interval_minutes, end_utc=now, required_steps=n_steps)
+        else:
+            grid, meta = resample_to_grid(
+                readings,
+                cfg.interval_minutes,
+                end_utc=now,
+                required_steps=n_steps,
             )
-            skipped_count += 1
-            continue
 
-        # Rule B: max-gap check for training window
-        if hist_meta["max_gap_bins"] > MAX_GAP_BINS:
-            update_prediction_training_status(
-                bq=bq,
-                cfg=cfg,
-                pred_timestamp_utc=pred_time,
-                trained_on_label=False,
-                skipped_reason=_gap_skip_reason("gap_too_large_for_training", hist_meta),
-                label_frost_observed=int(label_val),
-                label_window_start_utc=label_start,
-                label_window_end_utc=label_end,
+    # Rule A: coverage threshold
+    if predicting and meta["coverage"] < COVERAGE_THRESHOLD:
+        pred_row = _skipped_row(cfg, meta, _coverage_skip_reason("insufficient_real_points", meta))
+        with tel.span("insert"):
+            db.insert_prediction_row(cfg, _attach_timings(cfg, tel, pred_row))
+        return _skipped_summary(pred_row)
+
+    # Rule B: max-gap threshold
+    if predicting and meta["max_gap_bins"] > MAX_GAP_BINS:
+        pred_row = _skipped_row(cfg, meta, _gap_skip_reason("gap_too_large_for_prediction", meta))
+        with tel.span("insert"):
+            db.insert_prediction_row(cfg, _attach_timings(cfg, tel, pred_row))
+        return _skipped_summary(pred_row)
+
+    # Load persisted state (exported weights for predict-only, else weights/optimizer)
+    # before building features: streaming scaling needs its statistics.
+    # Saves are conditional on the generation loaded here.
+    store = VersionedState(cfg, attempts=cfg.state_save_attempts)
+    weights = state = None
+    with tel.span("state_load"):
+        if cfg.run_mode == "predict":
+            weights = load_weights(cfg)
+        if weights is None:
+            state = store.load_state()
+
+    scaler = None
+    scaling_window = None
+    if cfg.scaling_mode == "streaming":
+        with tel.span("scaler_update"):
+            scaling_window = (grid, scaling_block(grid))
+            saved = weights.scaler if weights is not None else (state or {}).get("scaler")
+            scaler = _resume_scaler(saved, *scaling_window)
+
+    with tel.span("current_features"):
+        # Candle events compiled once; every state lookup below is a binary search
+        candle_index = CandleIndex(candles)
+
+        # Build "current" feature vector (grid is already exactly n_steps long)
+        candle_now = candle_index.state_at(pd.to_datetime(meta["end_utc"], utc=True))
+        x_np, features_hash = build_features(grid, candle_now, scaler, cfg.feature_pooling)
+
+    if weights is not None:
+        if (
+            weights.input_dim == x_np.shape[0]
+            and weights.n_outputs == len(_horizons(cfg))
+            and weights.feature_layout == feature_layout(cfg.feature_pooling)
+        ):
+            with tel.span("predict"):
+                probs = weights.predict_proba_many(x_np[None, :])[0]
+                prob = float(probs[0])
+            with tel.span("insert"):
+                db.insert_prediction_row(
+                    cfg, _attach_timings(cfg, tel, _prediction_row(cfg, meta, prob, features_hash, probs))
+                )
+            vectors = [(meta, x_np, features_hash)]
+            gap_filled = _fill_gaps(
+                db, cfg, tel, readings, candle_index, _gap_anchors(cfg, gap_from, meta), n_steps, scaler,
+                weights.predict_proba_many, vectors,
             )
-            skipped_count += 1
-            continue
+            _store_features(cfg, tel, vectors)
+            # Shadows run on torch even when the zone's model does not
+            shadows = _load_shadows(cfg, tel, x_np.shape[0])
+            if shadows is not None:
+                with tel.span("shadow_predict"):
+                    shadows.predict(meta, x_np)
+                uploads = _write_shadows(db, cfg, tel, shadows)
+                if uploads:
+                    with tel.span("state_upload_wait"):
+                        for upload in uploads:
+                            upload.result()
+            return {
+                "zoneId": cfg.zone_id,
+                "timestamp": pd.to_datetime(meta["end_utc"], utc=True).isoformat(),
+                "run_mode": cfg.run_mode,
+                "inference": "numpy",
+                "probability_percent": float(prob * 100.0),
+                "gap_filled": gap_filled,
+                "shadow_log_loss": None,
+            }
+        # Exported for another feature layout or horizon set: the checkpoint decides
+        with tel.span("state_load"):
+            state = store.load_state()
 
-        candle_at_pred_time = latest_candles_on(candles, pred_time)
-        x_prev_np, _ = build_features(hist_grid, candle_at_pred_time)
+    import torch
+    from model import FrostMLP
 
-        x_prev = torch.from_numpy(x_prev_np.astype(np.float32)).unsqueeze(0)
-        y = torch.tensor([[float(label_val)]], dtype=torch.float32)
+    torch.manual_seed(cfg.seed)
 
-        opt.zero_grad()
-        logits = model(x_prev)
-        loss = F.binary_cross_entropy_with_logits(logits, y)
-        loss.backward()
-        opt.step()
-
-        update_prediction_training_status(
-            bq=bq,
-            cfg=cfg,
-            pred_timestamp_utc=pred_time,
-            trained_on_label=True,
-            skipped_reason=None,
-            label_frost_observed=int(label_val),
-            label_window_start_utc=label_start,
-            label_window_end_utc=label_end,
+    # Model + optimizer
+    with tel.span("model_init"):
+        model = FrostMLP(input_dim=x_np.shape[0], n_outputs=len(_horizons(cfg)))
+        opt = torch.optim.AdamW(model.parameters(), lr=cfg.lr, weight_decay=cfg.weight_decay)
+
+    if state and state.get("feature_layout", "full") != feature_layout(cfg.feature_pooling):
+        # Another pooling can give the same input size: the weights would not mean the same
+        print(
+            f"WARNING: persisted model uses feature layout {state.get('feature_layout', 'full')!r}, "
+            f"not {feature_layout(cfg.feature_pooling)!r} (starting fresh)"
         )
-        trained_count += 1
+        state = None
+    if state:
+        try:
+            model.load_state_dict(state["model"])
+            opt.load_state_dict(state["opt"])
+        except Exception as e:
+            print(f"WARNING: could not load persisted model/optimizer state (starting fresh): {e}")
 
-    # Make prediction for the "current" window
-    model.eval()
-    with torch.no_grad():
-        x = torch.from_numpy(x_np.astype(np.float32)).unsqueeze(0)
-        prob = torch.sigmoid(model(x)).item()
+    model.train()
+    shadows = _load_shadows(cfg, tel, x_np.shape[0])
 
-    prob_pct = float(prob * 100.0)
+    # Learn from any mature prediction not yet trained on, a page at a time until
+    # the backlog is drained or the row / time budget runs out. Each page's
+    # resolutions (and the model state, if another page follows) are written
+    # before the next page is loaded, so a run cut short keeps its progress.
+    drain_t0 = time.perf_counter()
+    trained_count = 0
+    skipped_count = 0
+    backlog_rows = 0
+    pages = 0
+    backlog_stop = "drained"
+    status_write = {"rows": 0, "dml_jobs": 0, "wall_s": 0.0, "failed": []}
+    # State uploads run in the background (in order); waited for before returning.
+    # If another run for this zone saved first, the steps logged in examples
+    # are replayed onto its state instead of overwriting it.
+    uploads = []
+    examples: list[tuple[np.ndarray, float | np.ndarray]] = []
+    replay = _replayer(cfg, x_np.shape[0], examples, scaling_window)
+    with tel.span("label_index"):
+        # Readings compiled once; each page's labels are range-min lookups
+        label_index = LabelIndex(readings)
+    after = None
+    while True:
+        with tel.span("backlog_load"):
+            backlog = load_backlog(now, after)
+        if backlog.empty:
+            break
 
-    # Insert a new prediction row that is unresolved initially
-    pred_row = {
-        "timestamp": pd.to_datetime(meta["end_utc"], utc=True).to_pydatetime(),
-        "zoneId": cfg.zone_id,
-        "probability": float(prob),
-        "probability_percent": prob_pct,
-        "model_version": cfg.model_version,
-        "features_hash": features_hash,
-        "trained_on_label": None,
-        "label_frost_observed": None,
-        "label_window_start": None,
-        "label_window_end": None,
-        "skipped_reason": None,
-        "ingest_id": cfg.ingest_id,
-        "triggered_at": datetime.now(timezone.utc),
-    }
+        statuses, trained, skipped = _train_on_backlog(
+            cfg, tel, model, opt, readings, candle_index, label_index, backlog, n_steps, examples, stored, scaler
+        )
+        trained_count += trained
+        skipped_count += skipped
+        pages += 1
+        if shadows is not None and trained:
+            with tel.span("shadow_learn", rows=trained):
+                shadows.learn(
+                    [u.pred_timestamp_utc for u in statuses if u.trained_on_label], examples[-trained:], _train_step
+                )
+        backlog_rows += len(backlog)
 
-    insert_prediction_row(bq, cfg, pred_row)
+        with tel.span("status_write", rows=len(statuses)):
+            page_write = db.apply_prediction_training_statuses(cfg, statuses)
+        for k in ("rows", "dml_jobs", "wall_s"):
+            status_write[k] += page_write[k]
+        status_write["failed"] += page_write["failed"]
 
-    # Save state AFTER training + new prediction, if training occurred.
+        if len(backlog) < cfg.backlog_page_size:
+            break
+        if backlog_rows >= cfg.backlog_max_rows:
+            backlog_stop = "row_budget"
+            break
+        if cfg.backlog_time_budget_s and time.perf_counter() - drain_t0 >= cfg.backlog_time_budget_s:
+            backlog_stop = "time_budget"
+            break
+        if trained:
+            with tel.span("state_save"):
+                uploads.append(store.save_state_async(
+                    _checkpoint(cfg, model, opt, scaler),
+                    len(examples),
+                    replay,
+                ))
+        after = pd.to_datetime(backlog["timestamp"].max(), utc=True)
+
+    for f in status_write["failed"]:
+        print(f"WARNING: could not write training status for {cfg.zone_id} @ {f['timestamp']}: {f['error']}")
+
+    # Save state after training, if training occurred; the upload overlaps the
+    # prediction and its insert
     if trained_count > 0:
-        save_state(cfg, {"model": model.state_dict(), "opt": opt.state_dict(), "version": cfg.model_version})
+        with tel.span("state_save"):
+            uploads.append(store.save_state_async(
+                _checkpoint(cfg, model, opt, scaler),
+                len(examples),
+                replay,
+            ))
 
-    print(json.dumps({
+    prob_pct = None
+    gap_filled = 0
+    if predicting:
+        # Make prediction for the "current" window
+        with tel.span("predict"):
+            model.eval()
+            with torch.no_grad():
+                x = torch.from_numpy(x_np.astype(np.float32)).unsqueeze(0)
+                probs = torch.sigmoid(model(x))[0].numpy()
+                prob = float(probs[0])
+
+        prob_pct = float(prob * 100.0)
+
+        with tel.span("insert"):
+            db.insert_prediction_row(
+                cfg, _attach_timings(cfg, tel, _prediction_row(cfg, meta, prob, features_hash, probs))
+            )
+        vectors = [(meta, x_np, features_hash)]
+        if shadows is not None:
+            with tel.span("shadow_predict"):
+                shadows.predict(meta, x_np)
+
+        def score(X: np.ndarray) -> np.ndarray:
+            with torch.no_grad():
+                return torch.sigmoid(model(torch.from_numpy(X))).numpy()
+
+        gap_filled = _fill_gaps(
+            db, cfg, tel, readings, candle_index, _gap_anchors(cfg, gap_from, meta), n_steps, scaler, score, vectors
+        )
+        _store_features(cfg, tel, vectors)
+
+    uploads += _write_shadows(db, cfg, tel, shadows)
+
+    if uploads:
+        with tel.span("state_upload_wait"):
+            for upload in uploads:
+                upload.result()
+
+    return {
         "zoneId": cfg.zone_id,
         "timestamp": pd.to_datetime(meta["end_utc"], utc=True).isoformat(),
+        "run_mode": cfg.run_mode,
+        "inference": "torch" if predicting else None,
         "probability_percent": prob_pct,
+        "gap_filled": gap_filled,
         "backlog_trained": trained_count,
         "backlog_skipped": skipped_count,
-    }, indent=2))
+        "status_rows": status_write["rows"],
+        "status_dml_jobs": status_write["dml_jobs"],
+        "status_write_s": round(status_write["wall_s"], 3),
+        "status_failed": len(status_write["failed"]),
+        "backlog_pages": pages,
+        "backlog_stop": backlog_stop,
+        "state_conflicts": store.conflicts,
+        "shadow_log_loss": shadows.mean_log_loss() if shadows is not None else None,
+    }
 
 
 if __name__ == "__main__":
@@ -2,7 +2,9 @@ import torch
 import torch.nn as nn
 
 class FrostMLP(nn.Module):
-    def __init__(self, input_dim: int, hidden: int = 128):
+    """Frost logits, one output per forecast horizon (main._horizons; the first is HORIZON_MINUTES)."""
+
+    def __init__(self, input_dim: int, hidden: int = 128, n_outputs: int = 1):
         super().__init__()
         self.net = nn.Sequential(
             nn.Linear(input_dim, hidden * 2),
@@ -11,7 +13,7 @@ class FrostMLP(nn.Module):
             nn.Linear(hidden * 2, hidden),
             nn.LayerNorm(hidden),
             nn.ReLU(),
-            nn.Linear(hidden, 1),
+            nn.Linear(hidden, n_outputs),
         )
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
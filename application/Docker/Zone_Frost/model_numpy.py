@@ -0,0 +1,78 @@
+import io
+import json
+
+import numpy as np
+
+# FrostMLP.net (model.py): Linear, LayerNorm, ReLU, Linear, LayerNorm, ReLU, Linear
+HIDDEN_LAYERS = (("net.0", "net.1"), ("net.3", "net.4"))
+OUTPUT_LAYER = "net.6"
+LAYER_NORM_EPS = 1e-5  # nn.LayerNorm default
+
+
+def export_npz(model_state: dict, scaler: dict | None = None, feature_layout: str | None = None) -> bytes:
+    """
+    FrostMLP state_dict as an .npz of float32 arrays, keyed like the
+    state_dict, plus the streaming scaler state (scaling.py) as JSON and the
+    pooled feature layout (features.feature_layout) if any.
+    """
+    arrays = {k: np.asarray(v.detach().cpu(), dtype=np.float32) for k, v in model_state.items()}
+    if scaler is not None:
+        arrays["scaler"] = np.array(json.dumps(scaler))
+    if feature_layout is not None:
+        arrays["feature_layout"] = np.array(feature_layout)
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+class NumpyFrostMLP:
+    """
+    FrostMLP's forward pass in NumPy (float32), for predicting without
+    importing torch. Matches the torch model to ~1e-7 on the probability.
+    """
+
+    def __init__(self, weights: dict[str, np.ndarray], scaler: dict | None = None, feature_layout: str = "full"):
+        self.w = {k: np.asarray(v, dtype=np.float32) for k, v in weights.items()}
+        self.scaler = scaler
+        self.feature_layout = feature_layout
+
+    @classmethod
+    def from_npz(cls, src: str | bytes) -> "NumpyFrostMLP":
+        with np.load(io.BytesIO(src) if isinstance(src, bytes) else src) as npz:
+            scaler = json.loads(str(npz["scaler"])) if "scaler" in npz.files else None
+            layout = str(npz["feature_layout"]) if "feature_layout" in npz.files else "full"
+            weights = {k: npz[k] for k in npz.files if k not in ("scaler", "feature_layout")}
+            return cls(weights, scaler, layout)
+
+    @property
+    def input_dim(self) -> int:
+        return self.w[f"{HIDDEN_LAYERS[0][0]}.weight"].shape[1]
+
+    @property
+    def n_outputs(self) -> int:
+        return self.w[f"{OUTPUT_LAYER}.weight"].shape[0]
+
+    def _linear(self, h: np.ndarray, name: str) -> np.ndarray:
+        return h @ self.w[f"{name}.weight"].T + self.w[f"{name}.bias"]
+
+    def _layer_norm(self, h: np.ndarray, name: str) -> np.ndarray:
+        mean = h.mean(axis=-1, keepdims=True)
+        var = np.square(h - mean).mean(axis=-1, keepdims=True)
+        return (h - mean) / np.sqrt(var + np.float32(LAYER_NORM_EPS)) * self.w[f"{name}.weight"] + self.w[f"{name}.bias"]
+
+    def forward(self, x: np.ndarray) -> np.ndarray:
+        """Logits, shape (n, n_outputs), for x of shape (n, input_dim)."""
+        h = np.asarray(x, dtype=np.float32)
+        for linear, norm in HIDDEN_LAYERS:
+            h = np.maximum(self._layer_norm(self._linear(h, linear), norm), np.float32(0.0))
+        return self._linear(h, OUTPUT_LAYER)
+
+    def predict_proba(self, x_np: np.ndarray) -> float:
+        """Frost probability (first output) for one feature vector."""
+        logit = float(self.forward(x_np[None, :])[0, 0])
+        return float(1.0 / (1.0 + np.exp(-logit)))
+
+    def predict_proba_many(self, X: np.ndarray) -> np.ndarray:
+        """Frost probabilities, shape (n, n_outputs), for feature vectors X of shape (n, input_dim)."""
+        logits = self.forward(X).astype(np.float64)
+        return 1.0 / (1.0 + np.exp(-logits))
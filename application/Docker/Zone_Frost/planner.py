@@ -0,0 +1,57 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from telemetry import RunTelemetry
+
+
+class QueryPlanner:
+    """
+    Issues a run's independent read queries concurrently and keeps their
+    results for the rest of the run.
+
+    Each task runs on a worker thread inside a telemetry span named after
+    its stage, so query stats are still attributed per stage. Tasks are
+    keyed: submitting a key again returns the first future instead of
+    querying again. Backends whose connection cannot be shared across
+    threads (concurrent_queries = False) run every task inline.
+    """
+
+    def __init__(self, db, tel: RunTelemetry, max_workers: int = 4):
+        self.tel = tel
+        self._futures: dict[str, Future] = {}
+        self._pool = None
+        if max_workers > 1 and getattr(db, "concurrent_queries", False):
+            self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="frost-query")
+
+    def __enter__(self) -> "QueryPlanner":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit(self, key: str, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        if key in self._futures:
+            return self._futures[key]
+        if self._pool is not None:
+            fut = self._pool.submit(self._run, stage, fn, args, kwargs)
+        else:
+            fut = Future()
+            try:
+                fut.set_result(self._run(stage, fn, args, kwargs))
+            except Exception as e:
+                fut.set_exception(e)
+        self._futures[key] = fut
+        return fut
+
+    def result(self, key: str) -> Any:
+        return self._futures[key].result()
+
+    def _run(self, stage: str, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        with self.tel.span(stage):
+            return fn(*args, **kwargs)
+
+    def close(self) -> None:
+        # Results nobody waited for (e.g. after an early return) are dropped
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,176 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import Config
+from features import RAW_SENSOR_COLS
+
+READINGS_COLS = ["timestamp"] + RAW_SENSOR_COLS
+
+NO_DATA_ERROR = "No sensor data returned for this zone in the requested window."
+
+
+def cache_path_for_zone(cfg: Config, zone_id: str) -> str:
+    return os.path.join(cfg.readings_cache_dir, f"readings_zone_{zone_id}.parquet")
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Fixed column set/dtypes so cached, fetched and merged frames compare cleanly."""
+    out = pd.DataFrame({"timestamp": pd.to_datetime(df["timestamp"], utc=True).astype("datetime64[ns, UTC]")})
+    for c in RAW_SENSOR_COLS:
+        out[c] = pd.to_numeric(df[c], errors="coerce").astype("float64") if c in df.columns else float("nan")
+    return out.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+def load_cached_readings(cfg: Config, zone_id: str) -> tuple[pd.DataFrame, pd.Timestamp, pd.Timestamp] | None:
+    """
+    Returns (readings_df, cache_start, watermark) or None if there is no usable cache.
+
+    cache_start is the earliest time the cached frame is complete from;
+    watermark is the newest reading timestamp it holds.
+    """
+    path = cache_path_for_zone(cfg, zone_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        table = pq.read_table(path)
+        md = table.schema.metadata or {}
+        cache_start = pd.Timestamp(md[b"cache_start"].decode())
+        watermark = pd.Timestamp(md[b"watermark"].decode())
+    except Exception as e:
+        print(f"WARNING: ignoring unreadable readings cache {path}: {e}")
+        return None
+    return _normalize(table.to_pandas()), cache_start, watermark
+
+
+def store_cached_readings(cfg: Config, zone_id: str, df: pd.DataFrame, cache_start: pd.Timestamp) -> None:
+    os.makedirs(cfg.readings_cache_dir, exist_ok=True)
+    watermark = df["timestamp"].max() if not df.empty else cache_start
+
+    table = pa.Table.from_pandas(df[READINGS_COLS], preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"cache_start": cache_start.isoformat().encode(),
+        b"watermark": pd.Timestamp(watermark).isoformat().encode(),
+    })
+
+    # Write-then-rename so a crashed run never leaves a torn cache file behind
+    path = cache_path_for_zone(cfg, zone_id)
+    tmp = f"{path}.tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def _fetch_start(cfg: Config, cached, start_utc: pd.Timestamp) -> pd.Timestamp:
+    """Where this run's BigQuery fetch has to begin, given what is cached."""
+    if cached is None:
+        return start_utc
+    _, cache_start, watermark = cached
+    if cache_start > start_utc:
+        # Requested span reaches further back than the cache covers
+        return start_utc
+    # Re-read a small overlap below the watermark to pick up late-arriving rows
+    return max(start_utc, watermark - pd.Timedelta(minutes=cfg.readings_cache_overlap_minutes))
+
+
+def _merge(cached, fresh: pd.DataFrame, fetch_start, start_utc, end_utc) -> pd.DataFrame:
+    """Cached rows below fetch_start + freshly fetched rows, trimmed to [start_utc, end_utc]."""
+    parts = []
+    if cached is not None and fetch_start > start_utc:
+        old = cached[0]
+        parts.append(old[old["timestamp"] < fetch_start])
+    parts.append(_normalize(fresh))
+    df = pd.concat([p for p in parts if not p.empty] or parts[-1:], ignore_index=True)
+    df = df[(df["timestamp"] >= start_utc) & (df["timestamp"] <= end_utc)]
+    return df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+def _refresh_zone(cfg, zone_id, cached, fresh, fetch_start, start_utc, end_utc) -> pd.DataFrame:
+    merged = _merge(cached, fresh, fetch_start, start_utc, end_utc)
+    store_cached_readings(cfg, zone_id, merged, start_utc)
+    print(
+        f"Readings cache zone {zone_id}: fetched {len(fresh)} rows from {fetch_start.isoformat()}, "
+        f"serving {len(merged)} rows"
+    )
+    return merged
+
+
+def _verify_zone(cfg, zone_id, merged: pd.DataFrame, full: pd.DataFrame, start_utc) -> pd.DataFrame:
+    """
+    Correctness check: compare the merged cache against a full refetch.
+    On mismatch the full result wins and replaces the cache.
+    """
+    full = _normalize(full)
+    if merged.equals(full):
+        return merged
+    print(
+        f"WARNING: readings cache mismatch for zone {zone_id} "
+        f"(cached {len(merged)} rows, full refetch {len(full)} rows); rewriting cache"
+    )
+    store_cached_readings(cfg, zone_id, full, start_utc)
+    return full
+
+
+def fetch_readings_cached(
+    db,
+    cfg: Config,
+    *,
+    start_utc: pd.Timestamp,
+    end_utc: pd.Timestamp,
+) -> pd.DataFrame:
+    """
+    Drop-in replacement for db.fetch_readings (db: a backends.py storage
+    backend) backed by a per-zone Parquet cache.
+
+    Only rows newer than the cached watermark (minus a late-arrival overlap)
+    are queried; they are merged with the cached rows and the result is
+    trimmed to [start_utc, end_utc] and written back.
+    """
+    cached = load_cached_readings(cfg, cfg.zone_id)
+    fetch_start = _fetch_start(cfg, cached, start_utc)
+    fresh = db.fetch_readings(cfg, start_utc=fetch_start, end_utc=end_utc, allow_empty=True)
+    merged = _refresh_zone(cfg, cfg.zone_id, cached, fresh, fetch_start, start_utc, end_utc)
+
+    if cfg.readings_cache_verify:
+        full = db.fetch_readings(cfg, start_utc=start_utc, end_utc=end_utc, allow_empty=True)
+        merged = _verify_zone(cfg, cfg.zone_id, merged, full, start_utc)
+
+    if merged.empty:
+        raise RuntimeError(NO_DATA_ERROR)
+    return merged
+
+
+def fetch_readings_for_zones_cached(
+    db,
+    cfg: Config,
+    zone_ids: list[str],
+    *,
+    start_utc: pd.Timestamp,
+    end_utc: pd.Timestamp,
+) -> dict[str, pd.DataFrame]:
+    """
+    Cached variant of db.fetch_readings_for_zones: one query from the oldest
+    per-zone fetch start, merged into each zone's cache.
+    """
+    cached = {z: load_cached_readings(cfg, z) for z in zone_ids}
+    fetch_starts = {z: _fetch_start(cfg, cached[z], start_utc) for z in zone_ids}
+    fresh_all = db.fetch_readings_for_zones(
+        cfg, zone_ids, start_utc=min(fetch_starts.values()), end_utc=end_utc
+    )
+    full_all = (
+        db.fetch_readings_for_zones(cfg, zone_ids, start_utc=start_utc, end_utc=end_utc)
+        if cfg.readings_cache_verify
+        else {}
+    )
+
+    out = {}
+    for z in zone_ids:
+        fresh = fresh_all.get(z, pd.DataFrame(columns=READINGS_COLS))
+        fresh = fresh[pd.to_datetime(fresh["timestamp"], utc=True) >= fetch_starts[z]]
+        merged = _refresh_zone(cfg, z, cached[z], fresh, fetch_starts[z], start_utc, end_utc)
+        if cfg.readings_cache_verify:
+            merged = _verify_zone(cfg, z, merged, full_all.get(z, pd.DataFrame(columns=READINGS_COLS)), start_utc)
+        if not merged.empty:
+            out[z] = merged
+    return out
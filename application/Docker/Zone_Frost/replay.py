@@ -0,0 +1,273 @@
+"""
+Historical replay: bootstrap zone models from the readings already stored.
+
+A new zone's model otherwise learns one example per matured prediction.
+Replay walks a zone's history instead: every bin end in [--start, --end -
+HORIZON_MINUTES] is an anchor, its feature window built as the live run
+would (feature_engine.build_window_features, bit for bit the
+resample_to_grid / build_features vectors), its label resolved from the
+readings (labels.LabelIndex), Rules A / B and the candle rule applied as
+in main._train_on_backlog, and the model updated on the anchors in
+chronological mini-batches. The state is written with state.save_state,
+so the next live run resumes from it.
+
+Zones replay in parallel, one process each (--workers). Configuration is
+the live job's environment (config.load_config); zones come from
+--zones, else ZONE_IDS / ZONE_ID. Zones that already have a model state
+are left alone unless --force.
+
+Usage:
+    python replay.py --zones z1 z2 z3 --start 2026-06-01 --workers 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from config import load_config, Config
+from feature_engine import build_window_features, resample_windows, window_rows, window_scaling_blocks
+from backends import open_backend
+from candles import CandleIndex
+from labels import LabelIndex
+from scaling import ScalerSnapshots, StreamingScaler
+from main import (
+    COVERAGE_THRESHOLD,
+    MAX_GAP_BINS,
+    _checkpoint,
+    _horizons,
+    _resolve_labels,
+    _train_step,
+    check_config,
+    required_steps,
+)
+from state import load_state, save_state
+from telemetry import RunTelemetry
+
+
+def _anchors(cfg: Config, start: pd.Timestamp, end: pd.Timestamp) -> pd.DatetimeIndex:
+    """Bin ends from start whose label window has closed by end."""
+    step = f"{cfg.interval_minutes}min"
+    last = end - pd.Timedelta(minutes=cfg.horizon_minutes)
+    return pd.date_range(start.ceil(step), last.floor(step), freq=step)
+
+
+def _streaming_features(
+    cfg: Config,
+    readings: pd.DataFrame,
+    times: list[pd.Timestamp],
+    flags: list[bool],
+    n_steps: int,
+    scaler: StreamingScaler | None,
+) -> tuple[np.ndarray, list[dict], StreamingScaler]:
+    """
+    Rows for times with SCALING_MODE=streaming. The scaler is fed anchor by
+    anchor (each window's bins past its watermark) and its statistics are
+    snapshotted after each, so every row is scaled as a run at its anchor
+    would have: with the bins up to the anchor only. Consecutive anchors
+    are one bin apart, so every bin is fed once and in order. Returns the
+    rows, their window meta and the scaler.
+    """
+    grid_ts, start_pos, grid, metas = resample_windows(readings, times, cfg.interval_minutes, required_steps=n_steps)
+    blocks = window_scaling_blocks(grid)
+    if scaler is None:
+        scaler = StreamingScaler.from_state(None, blocks.shape[2])
+    snapshots = []
+    for i, pos in enumerate(start_pos):
+        scaler.update(grid_ts[pos:pos + n_steps], blocks[i])
+        snapshots.append(scaler.quantiles.quantiles())
+    X, _ = window_rows(
+        grid_ts, start_pos, grid, flags, scaler=ScalerSnapshots(np.stack(snapshots)), pooling=cfg.feature_pooling
+    )
+    return X, metas, scaler
+
+
+def replay_zone(
+    cfg: Config,
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    *,
+    batch_size: int = 32,
+    chunk_hours: int = 24,
+    force: bool = False,
+) -> dict:
+    """
+    Replay one zone's history onto a fresh model and save it; returns the
+    zone's summary. Anchors are built chunk_hours at a time. With
+    SCALING_MODE=streaming each anchor's window is fed to the scaler before
+    that anchor's row is built, so every row is scaled with the bins up to
+    its anchor only, as a run at that time would have.
+    """
+    import torch
+    from model import FrostMLP
+
+    # One thread per process: the pool provides the parallelism
+    torch.set_num_threads(1)
+    t0 = time.perf_counter()
+    tel = RunTelemetry("replay", zoneId=cfg.zone_id)
+    summary = {"zoneId": cfg.zone_id, "start": start.isoformat(), "end": end.isoformat()}
+    try:
+        with tel.span("state_load"):
+            if not force and load_state(cfg) is not None:
+                tel.emit(skipped="has_state")
+                return {**summary, "skipped": "has_state"}
+
+        db = open_backend(cfg, tel)
+        lookback = pd.Timedelta(hours=cfg.lookback_hours)
+        with tel.span("readings_fetch"):
+            readings = db.fetch_readings(cfg, start_utc=start - lookback, end_utc=end, allow_empty=True)
+        with tel.span("candles_fetch"):
+            candles = db.fetch_candle_events_for_zones(cfg, [cfg.zone_id], since_utc=start - lookback)
+        if readings.empty:
+            tel.emit(**summary, skipped="no_readings")
+            return {**summary, "skipped": "no_readings"}
+        readings["timestamp"] = pd.to_datetime(readings["timestamp"], utc=True)
+
+        n_steps = required_steps(cfg.lookback_hours, cfg.interval_minutes)
+        anchors = _anchors(cfg, start, end)
+        with tel.span("indexes"):
+            candle_index = CandleIndex(candles[["timestamp", "candlesOn"]])
+            label_index = LabelIndex(readings)
+
+        torch.manual_seed(cfg.seed)
+        np.random.seed(cfg.seed)
+        model = opt = scaler = None
+        trained = skipped = steps = 0
+
+        per_chunk = max(1, chunk_hours * 60 // cfg.interval_minutes)
+        for lo in range(0, len(anchors), per_chunk):
+            times = list(anchors[lo:lo + per_chunk])
+            with tel.span("features", rows=len(times)):
+                flags = candle_index.states_at(times).tolist()
+                if cfg.scaling_mode == "streaming":
+                    X, metas, scaler = _streaming_features(cfg, readings, times, flags, n_steps, scaler)
+                else:
+                    X, _, metas = build_window_features(
+                        readings,
+                        times,
+                        flags,
+                        cfg.interval_minutes,
+                        required_steps=n_steps,
+                        pooling=cfg.feature_pooling,
+                    )
+                candles_in_label, labels, no_label, extra_labels = _resolve_labels(
+                    cfg, candle_index, label_index, times
+                )
+                keep = np.array([
+                    not candles_in_label[i]
+                    and not no_label[i]
+                    and meta["coverage"] >= COVERAGE_THRESHOLD
+                    and meta["max_gap_bins"] <= MAX_GAP_BINS
+                    for i, meta in enumerate(metas)
+                ], dtype=bool)
+                skipped += int((~keep).sum())
+                if not keep.any():
+                    continue
+                X = X[keep]
+                Y = labels[keep].astype(np.float32)
+                if cfg.extra_horizons_minutes:
+                    Y = np.column_stack([Y, extra_labels[keep]]).astype(np.float32)
+
+            if model is None:
+                with tel.span("model_init"):
+                    model = FrostMLP(input_dim=X.shape[1], n_outputs=len(_horizons(cfg)))
+                    opt = torch.optim.AdamW(model.parameters(), lr=cfg.lr, weight_decay=cfg.weight_decay)
+                    model.train()
+
+            with tel.span("train", rows=len(X)):
+                for b in range(0, len(X), batch_size):
+                    _train_step(model, opt, X[b:b + batch_size], Y[b:b + batch_size])
+                    steps += 1
+            trained += len(X)
+
+        summary.update(anchors=len(anchors), trained=trained, skipped=skipped, steps=steps, saved=False)
+        if model is not None:
+            with tel.span("state_save"):
+                save_state(cfg, _checkpoint(cfg, model, opt, scaler))
+            summary["saved"] = bool(cfg.gcs_bucket)
+        summary["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    except Exception as e:
+        tel.emit(**summary, error=f"{type(e).__name__}: {e}")
+        raise
+    tel.emit(**summary)
+    return summary
+
+
+def replay_site(
+    cfg: Config,
+    zone_ids: list[str],
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    *,
+    workers: int,
+    **kwargs,
+) -> tuple[list[dict], dict[str, str]]:
+    """
+    replay_zone for every zone on a pool of worker processes. Returns the
+    zone summaries and {zone: error} for the zones that failed.
+    """
+    summaries = []
+    failures = {}
+    # spawn, not fork: the parent may hold BigQuery / torch threads
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=ctx) as pool:
+        futures = {
+            pool.submit(replay_zone, replace(cfg, zone_id=z, zone_ids=()), start, end, **kwargs): z
+            for z in zone_ids
+        }
+        for fut in as_completed(futures):
+            try:
+                summaries.append(fut.result())
+            except Exception as e:
+                failures[futures[fut]] = f"{type(e).__name__}: {e}"
+    return summaries, failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--zones", nargs="+", help="default: ZONE_IDS, else ZONE_ID")
+    ap.add_argument("--start", required=True, help="first anchor (UTC), e.g. 2026-06-01")
+    ap.add_argument("--end", help="readings up to here (UTC); default now")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--batch-size", type=int, default=32, help="anchors per optimizer step")
+    ap.add_argument("--chunk-hours", type=int, default=24, help="anchors per feature build")
+    ap.add_argument("--force", action="store_true", help="replace zones' existing model state")
+    args = ap.parse_args()
+
+    cfg = load_config()
+    check_config(cfg)
+    zone_ids = args.zones or list(cfg.zone_ids) or [cfg.zone_id]
+    start = pd.Timestamp(args.start, tz="UTC")
+    end = pd.Timestamp(args.end, tz="UTC") if args.end else pd.Timestamp.now(tz="UTC")
+
+    t0 = time.perf_counter()
+    summaries, failures = replay_site(
+        cfg,
+        zone_ids,
+        start,
+        end,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        chunk_hours=args.chunk_hours,
+        force=args.force,
+    )
+    print(json.dumps({
+        "zones": len(zone_ids),
+        "replayed": sum(1 for s in summaries if s.get("saved")),
+        "skipped_has_state": sorted(s["zoneId"] for s in summaries if s.get("skipped") == "has_state"),
+        "skipped_no_readings": sorted(s["zoneId"] for s in summaries if s.get("skipped") == "no_readings"),
+        "failed": failures,
+        "trained": sum(s.get("trained", 0) for s in summaries),
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }, indent=2))
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
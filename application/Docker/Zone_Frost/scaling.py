@@ -0,0 +1,167 @@
+"""
+Streaming robust-scaling statistics (SCALING_MODE=streaming).
+
+features._robust_scale scales each window by its own median / IQR, a full
+sort per column per window. StreamingScaler instead keeps running 25th /
+50th / 75th percentile estimates per column with the P² algorithm (Jain &
+Chlamtac, 1985: five markers per quantile, O(1) memory and update), fed
+each grid bin once as it arrives, and scales every window with the same
+statistics. Its state is a dict of plain lists, persisted with the model.
+"""
+import numpy as np
+import pandas as pd
+
+SCALING_PROBS = (0.25, 0.5, 0.75)
+
+
+class P2Quantiles:
+    """P² estimates of several quantiles for every column of a row stream; NaNs are skipped per column."""
+
+    def __init__(self, probs, n_cols: int):
+        self.probs = np.asarray(probs, dtype=np.float64)
+        n_probs = len(self.probs)
+        self.count = np.zeros(n_cols, dtype=np.int64)
+        # Marker heights / actual positions / desired positions: (quantile, marker, column)
+        self.heights = np.zeros((n_probs, 5, n_cols))
+        self.positions = np.tile(np.arange(1.0, 6.0)[None, :, None], (n_probs, 1, n_cols))
+        self.step = np.stack([np.array([0.0, p / 2, p, (1 + p) / 2, 1.0]) for p in self.probs])[:, :, None]
+        self.desired = np.tile(1.0 + 4.0 * self.step, (1, 1, n_cols))
+
+    def update(self, x: np.ndarray) -> None:
+        x = np.asarray(x, dtype=np.float64)
+        valid = ~np.isnan(x)
+
+        # The first five observations of a column are the initial markers
+        init = valid & (self.count < 5)
+        if init.any():
+            cols = np.nonzero(init)[0]
+            self.heights[:, self.count[cols], cols] = x[cols]
+            self.count[cols] += 1
+            full = cols[self.count[cols] == 5]
+            if full.size:
+                self.heights[:, :, full] = np.sort(self.heights[:, :, full], axis=1)
+
+        live = valid & ~init
+        if not live.any():
+            return
+        cols = np.nonzero(live)[0]
+        xv = x[cols]
+        q = self.heights[:, :, cols]
+        n = self.positions[:, :, cols]
+        want = self.desired[:, :, cols] + self.step
+
+        # Extremes track min / max; k is the cell x falls in (q[k] <= x < q[k + 1])
+        q[:, 0] = np.minimum(q[:, 0], xv)
+        q[:, 4] = np.maximum(q[:, 4], xv)
+        k = (q[:, 1:4] <= xv).sum(axis=1)
+        n += np.arange(5)[None, :, None] > k[:, None, :]
+
+        # Nudge the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = want[:, i] - n[:, i]
+            move = ((d >= 1) & (n[:, i + 1] - n[:, i] > 1)) | ((d <= -1) & (n[:, i - 1] - n[:, i] < -1))
+            if not move.any():
+                continue
+            s = np.sign(d)
+            qi, ql, qr = q[:, i], q[:, i - 1], q[:, i + 1]
+            ni, nl, nr = n[:, i], n[:, i - 1], n[:, i + 1]
+            parabolic = qi + s / (nr - nl) * ((ni - nl + s) * (qr - qi) / (nr - ni) + (nr - ni - s) * (qi - ql) / (ni - nl))
+            linear = qi + s * (np.where(s > 0, qr, ql) - qi) / (np.where(s > 0, nr, nl) - ni)
+            adjusted = np.where((ql < parabolic) & (parabolic < qr), parabolic, linear)
+            q[:, i] = np.where(move, adjusted, qi)
+            n[:, i] = np.where(move, ni + s, ni)
+
+        self.heights[:, :, cols] = q
+        self.positions[:, :, cols] = n
+        self.desired[:, :, cols] = want
+        self.count[cols] += 1
+
+    def quantiles(self) -> np.ndarray:
+        """(len(probs), n_cols) estimates; exact (linear interpolation) below five observations."""
+        out = self.heights[:, 2].copy()
+        for c in np.nonzero(self.count < 5)[0]:
+            seen = self.heights[0, : self.count[c], c]
+            out[:, c] = np.percentile(seen, self.probs * 100.0) if seen.size else np.nan
+        return out
+
+    def to_state(self) -> dict:
+        return {
+            "probs": self.probs.tolist(),
+            "count": self.count.tolist(),
+            "heights": self.heights.tolist(),
+            "positions": self.positions.tolist(),
+            "desired": self.desired.tolist(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "P2Quantiles":
+        est = cls(state["probs"], len(state["count"]))
+        est.count = np.asarray(state["count"], dtype=np.int64)
+        est.heights = np.asarray(state["heights"], dtype=np.float64)
+        est.positions = np.asarray(state["positions"], dtype=np.float64)
+        est.desired = np.asarray(state["desired"], dtype=np.float64)
+        return est
+
+
+class StreamingScaler:
+    """
+    Median / IQR robust scaling with running statistics. update() consumes
+    the bins of a window newer than the last one seen (the watermark), so
+    overlapping windows of consecutive runs feed each bin once.
+    """
+
+    def __init__(self, n_cols: int, quantiles: P2Quantiles | None = None, watermark: pd.Timestamp | None = None):
+        self.quantiles = quantiles or P2Quantiles(SCALING_PROBS, n_cols)
+        self.watermark = watermark
+
+    def update(self, timestamps, mat: np.ndarray) -> int:
+        """Feed the rows of a window's (n, C) scaling block newer than the watermark; returns how many."""
+        ts = pd.DatetimeIndex(timestamps)
+        if ts.tz is None:
+            ts = ts.tz_localize("UTC")
+        # Row 0's deltas are 0 by construction (no previous bin in the window);
+        # grid timestamps ascend
+        first = 1
+        if self.watermark is not None:
+            first = max(first, int(ts.searchsorted(self.watermark, side="right")))
+        for r in range(first, len(ts)):
+            self.quantiles.update(mat[r])
+        if first < len(ts):
+            self.watermark = ts[-1]
+        return max(len(ts) - first, 0)
+
+    def scale(self, mat: np.ndarray, eps: float = 1e-6) -> np.ndarray:
+        """(x - median) / (IQR + eps) with the running statistics; mat's last axis is the column."""
+        q25, med, q75 = self.quantiles.quantiles().astype(mat.dtype)
+        return (mat - med) / (q75 - q25 + eps)
+
+    def to_state(self) -> dict:
+        return {
+            **self.quantiles.to_state(),
+            "watermark": self.watermark.isoformat() if self.watermark is not None else None,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict | None, n_cols: int) -> "StreamingScaler":
+        """A scaler resumed from to_state() output; a fresh one for None or another column count."""
+        if not state or len(state["count"]) != n_cols:
+            return cls(n_cols)
+        watermark = pd.Timestamp(state["watermark"]) if state.get("watermark") else None
+        return cls(n_cols, P2Quantiles.from_state(state), watermark)
+
+
+class ScalerSnapshots:
+    """
+    StreamingScaler statistics taken once per window as the scaler was fed:
+    scale() scales window i of an (A, n, C) tensor with snapshot i, as
+    StreamingScaler.scale would have at that point.
+    """
+
+    def __init__(self, quantiles: np.ndarray):
+        # (A, len(SCALING_PROBS), C)
+        self.quantiles = np.asarray(quantiles)
+
+    def scale(self, mat: np.ndarray, eps: float = 1e-6) -> np.ndarray:
+        q = self.quantiles.astype(mat.dtype)[:, :, None, :]
+        q25, med, q75 = q[:, 0], q[:, 1], q[:, 2]
+        return (mat - med) / (q75 - q25 + eps)
@@ -0,0 +1,154 @@
+import copy
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.func import functional_call, stack_module_state
+
+from config import Config
+from features import feature_layout
+from model import FrostMLP
+from state import load_shadow_state, save_shadow_state_async
+
+# Probabilities are clipped this far from 0 / 1 for the log-loss
+PROB_EPS = 1e-7
+
+
+def log_loss(probs: np.ndarray, label: float) -> np.ndarray:
+    p = np.clip(probs, PROB_EPS, 1.0 - PROB_EPS)
+    return -(label * np.log(p) + (1.0 - label) * np.log1p(-p))
+
+
+class ShadowModels:
+    """
+    A zone's shadow candidates (cfg.shadow_models): models scored on the
+    feature vectors the run builds for its own model, so comparing them
+    costs no extra query or feature build.
+
+    Candidates of the same hidden size are scored together in one
+    vmapped forward over their stacked weights (torch.func). Each resolved
+    backlog row is scored before the candidates train on it, which gives
+    their online (prequential) log-loss. Scores are collected as shadow
+    table rows; states persist next to the zone's checkpoint (state.py).
+    """
+
+    def __init__(self, cfg: Config, input_dim: int, n_outputs: int):
+        self.cfg = cfg
+        self.versions = [version for version, _ in cfg.shadow_models]
+        self.hidden = [hidden for _, hidden in cfg.shadow_models]
+        self.models: list[FrostMLP] = []
+        self.opts: list[torch.optim.Optimizer] = []
+        for version, hidden in cfg.shadow_models:
+            model, opt = self._fresh(input_dim, hidden, n_outputs)
+            state = load_shadow_state(cfg, version)
+            if state and state.get("feature_layout", "full") != feature_layout(cfg.feature_pooling):
+                print(f"WARNING: shadow {version} state for zone {cfg.zone_id} uses another feature layout (starting fresh)")
+                state = None
+            if state:
+                try:
+                    model.load_state_dict(state["model"])
+                    opt.load_state_dict(state["opt"])
+                except Exception as e:
+                    print(f"WARNING: could not load shadow {version} state for zone {cfg.zone_id} (starting fresh): {e}")
+                    # A failed optimizer load leaves the model's weights loaded
+                    model, opt = self._fresh(input_dim, hidden, n_outputs)
+            model.train()
+            self.models.append(model)
+            self.opts.append(opt)
+        self.groups: dict[int, list[int]] = {}
+        for i, hidden in enumerate(self.hidden):
+            self.groups.setdefault(hidden, []).append(i)
+        self.rows: list[dict] = []
+        self.trained = 0
+
+    def _fresh(self, input_dim: int, hidden: int, n_outputs: int) -> tuple[FrostMLP, torch.optim.Optimizer]:
+        """A new candidate and optimizer, initialized as the zone's model is, without moving its RNG."""
+        with torch.random.fork_rng():
+            torch.manual_seed(self.cfg.seed)
+            model = FrostMLP(input_dim=input_dim, hidden=hidden, n_outputs=n_outputs)
+        return model, torch.optim.AdamW(model.parameters(), lr=self.cfg.lr, weight_decay=self.cfg.weight_decay)
+
+    def proba(self, X: np.ndarray) -> np.ndarray:
+        """First-output probabilities, shape (n_candidates, n), for X of shape (n, input_dim)."""
+        x = torch.from_numpy(np.asarray(X, dtype=np.float32))
+        out = np.empty((len(self.models), len(x)))
+        with torch.no_grad():
+            for idx in self.groups.values():
+                models = [self.models[i] for i in idx]
+                params, buffers = stack_module_state(models)
+                base = copy.deepcopy(models[0]).to("meta")
+
+                def call(p, b, x):
+                    return functional_call(base, (p, b), (x,))
+
+                logits = torch.vmap(call, in_dims=(0, 0, None))(params, buffers, x)
+                out[idx] = torch.sigmoid(logits[..., 0]).numpy()
+        return out
+
+    def _row(self, i: int, ts: pd.Timestamp, kind: str, prob: float, label: int | None = None) -> dict:
+        return {
+            "timestamp": ts.to_pydatetime(),
+            "zoneId": self.cfg.zone_id,
+            "model_version": self.versions[i],
+            "shadow_of": self.cfg.model_version,
+            "kind": kind,
+            "probability": float(prob),
+            "label_frost_observed": label,
+            "log_loss": float(log_loss(prob, label)) if label is not None else None,
+            "ingest_id": self.cfg.ingest_id,
+            "triggered_at": datetime.now(timezone.utc),
+        }
+
+    def predict(self, meta: dict, x_np: np.ndarray) -> None:
+        """Every candidate's prediction for the run's current window."""
+        ts = pd.to_datetime(meta["end_utc"], utc=True)
+        probs = self.proba(x_np[None, :])[:, 0]
+        self.rows += [self._row(i, ts, "prediction", p) for i, p in enumerate(probs)]
+
+    def learn(
+        self,
+        times: list[pd.Timestamp],
+        examples: list[tuple[np.ndarray, float | np.ndarray]],
+        train_step: Callable,
+    ) -> None:
+        """
+        Resolved backlog rows (times[i] -> examples[i], as the zone's model
+        trained on them): scored and log-lossed first, then trained on by
+        every candidate with train_step(model, opt, x, label).
+        """
+        if not examples:
+            return
+        probs = self.proba(np.stack([x for x, _ in examples]))
+        for j, (ts, (_, target)) in enumerate(zip(times, examples)):
+            label = int(np.reshape(target, -1)[0])
+            self.rows += [self._row(i, ts, "label", probs[i, j], label) for i in range(len(self.models))]
+        for model, opt in zip(self.models, self.opts):
+            for x_np, target in examples:
+                train_step(model, opt, x_np, target)
+        self.trained += len(examples)
+
+    def mean_log_loss(self) -> dict[str, float] | None:
+        """Each candidate's mean log-loss over the rows resolved this run; None without any."""
+        losses = {}
+        for row in self.rows:
+            if row["log_loss"] is not None:
+                losses.setdefault(row["model_version"], []).append(row["log_loss"])
+        return {v: round(float(np.mean(ls)), 6) for v, ls in losses.items()} or None
+
+    def save_async(self) -> list[Future]:
+        """Upload every candidate's state if this run trained them."""
+        if not self.trained:
+            return []
+        return [
+            save_shadow_state_async(self.cfg, version, {
+                "model": model.state_dict(),
+                "opt": opt.state_dict(),
+                "version": version,
+                "hidden": hidden,
+                "feature_layout": feature_layout(self.cfg.feature_pooling),
+            })
+            for version, hidden, model, opt in zip(self.versions, self.hidden, self.models, self.opts)
+        ]
@@ -1,14 +1,164 @@
 import io
-import torch
+import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable
+
+from google.api_core.exceptions import NotFound, NotModified, PreconditionFailed
 from google.cloud import storage
 from config import Config
+from model_numpy import NumpyFrostMLP, export_npz
+
+# torch is imported where checkpoints are (de)serialized, so the predict path
+# (load_weights) runs without it
+
+# One worker: uploads of the same zone land in the order they were started
+_uploads = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frost-state-upload")
 
 
 def model_blob_for_zone(cfg: Config) -> str:
     return f"{cfg.gcs_prefix}_zone_{cfg.zone_id}.pt"
 
 
+def weights_blob_for_zone(cfg: Config) -> str:
+    """The model weights alone, as float32 .npz (model_numpy.py), next to the checkpoint."""
+    return f"{cfg.gcs_prefix}_zone_{cfg.zone_id}.npz"
+
+
+def run_record_blob_for_zone(cfg: Config) -> str:
+    """What the zone's last runs covered, as JSON (SKIP_UNCHANGED), next to the checkpoint."""
+    return f"{cfg.gcs_prefix}_zone_{cfg.zone_id}_run.json"
+
+
+def shadow_blob_for_zone(cfg: Config, model_version: str) -> str:
+    """A shadow candidate's checkpoint (SHADOW_MODELS), next to the zone's own."""
+    return f"{cfg.gcs_prefix}_zone_{cfg.zone_id}_shadow_{model_version}.pt"
+
+
+@lru_cache(maxsize=None)
+def _storage_client(project_id: str) -> storage.Client:
+    return storage.Client(project=project_id)
+
+
+def _cache_paths(cfg: Config, blob_name: str) -> tuple[str, str]:
+    base = os.path.join(cfg.state_cache_dir, cfg.gcs_bucket, blob_name.replace("/", "__"))
+    return base, f"{base}.json"
+
+
+def _cached_generation(meta_path: str) -> int | None:
+    try:
+        with open(meta_path) as f:
+            return int(json.load(f)["generation"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_cache(cfg: Config, blob_name: str, data: bytes, generation: int | None) -> None:
+    if not cfg.state_cache_dir or generation is None:
+        return
+    path, meta_path = _cache_paths(cfg, blob_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for target, payload in ((path, data), (meta_path, json.dumps({"generation": int(generation)}).encode())):
+        tmp = f"{target}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, target)
+
+
+def _load_file(path: str) -> dict:
+    import torch
+
+    # Memory-map the checkpoint's tensors instead of reading them into memory;
+    # files not in torch's zip format (mmap needs it) are read the old way
+    try:
+        return torch.load(path, map_location="cpu", weights_only=True, mmap=True)
+    except RuntimeError:
+        return torch.load(path, map_location="cpu", weights_only=True)
+
+
+def _download(cfg: Config, blob_name: str) -> tuple[str | bytes | None, int]:
+    """
+    (contents, generation) of a blob, contents being the local cache path
+    or the bytes; (None, 0) when it does not exist, 0 being the generation
+    GCS preconditions use for "no object".
+
+    With cfg.state_cache_dir the last downloaded (or uploaded) copy is kept
+    on disk with its blob generation, and the download is conditional on
+    the generation having changed: an unchanged blob costs one 304.
+    """
+    bucket = _storage_client(cfg.project_id).bucket(cfg.gcs_bucket)
+    blob = bucket.blob(blob_name)
+
+    cached_generation = None
+    if cfg.state_cache_dir:
+        path, meta_path = _cache_paths(cfg, blob_name)
+        if os.path.exists(path):
+            cached_generation = _cached_generation(meta_path)
+
+    try:
+        data = blob.download_as_bytes(if_generation_not_match=cached_generation)
+    except NotModified:
+        return path, cached_generation
+    except NotFound:
+        return None, 0
+
+    generation = blob.generation
+    _write_cache(cfg, blob_name, data, generation)
+    if cfg.state_cache_dir and generation is not None:
+        return path, generation
+    return data, generation
+
+
+def _fetch(cfg: Config, blob_name: str) -> tuple[dict | None, int]:
+    """(state, generation) of the zone's checkpoint; (None, 0) when there is none."""
+    src, generation = _download(cfg, blob_name)
+    if src is None:
+        return None, 0
+    if isinstance(src, str):
+        return _load_file(src), generation
+
+    import torch
+
+    return torch.load(io.BytesIO(src), map_location="cpu", weights_only=True), generation
+
+
+def _serialize(state: dict) -> bytes:
+    import torch
+
+    buf = io.BytesIO()
+    torch.save(state, buf)
+    return buf.getvalue()
+
+
+def _upload(cfg: Config, blob_name: str, data: bytes, if_generation_match: int | None = None) -> int | None:
+    bucket = _storage_client(cfg.project_id).bucket(cfg.gcs_bucket)
+    blob = bucket.blob(blob_name)
+    blob.upload_from_file(
+        io.BytesIO(data),
+        rewind=True,
+        content_type="application/octet-stream",
+        if_generation_match=if_generation_match,
+    )
+    # The next load finds this generation locally and skips the download
+    _write_cache(cfg, blob_name, data, blob.generation)
+    return blob.generation
+
+
+def _upload_weights(cfg: Config, npz: bytes) -> None:
+    # Derived from the checkpoint just written, so no precondition: the last
+    # checkpoint to land also writes the last weights
+    _upload(cfg, weights_blob_for_zone(cfg), npz)
+
+
+def _done(result=None) -> Future:
+    fut = Future()
+    fut.set_result(result)
+    return fut
+
+
 def load_state(cfg: Config) -> dict | None:
+    """Persisted model/optimizer state for the zone, or None."""
     if not cfg.gcs_bucket:
         return None
 
@@ -16,35 +166,166 @@ def load_state(cfg: Config) -> dict | None:
     if not blob_name:
         return None
 
-    client = storage.Client(project=cfg.project_id)
-    bucket = client.bucket(cfg.gcs_bucket)
-    blob = bucket.blob(blob_name)
+    return _fetch(cfg, blob_name)[0]
 
-    if not blob.exists():
+
+def load_weights(cfg: Config) -> NumpyFrostMLP | None:
+    """
+    The zone's model weights for NumPy inference, or None (no bucket, or no
+    weights exported yet: fall back to load_state).
+    """
+    if not cfg.gcs_bucket:
         return None
 
-    data = blob.download_as_bytes()
-    return torch.load(io.BytesIO(data), map_location="cpu", weights_only=True)
+    src, _ = _download(cfg, weights_blob_for_zone(cfg))
+    if src is None:
+        return None
+    return NumpyFrostMLP.from_npz(src)
 
 
-def save_state(cfg: Config, state: dict) -> None:
+def load_run_record(cfg: Config) -> tuple[dict | None, int]:
+    """(record, generation) of the zone's run record; (None, 0) without one (or a bucket)."""
     if not cfg.gcs_bucket:
-        return
+        return None, 0
+
+    src, generation = _download(cfg, run_record_blob_for_zone(cfg))
+    if src is None:
+        return None, 0
+    if isinstance(src, str):
+        with open(src, "rb") as f:
+            src = f.read()
+    try:
+        return json.loads(src), generation
+    except ValueError as e:
+        print(f"WARNING: ignoring unreadable run record for zone {cfg.zone_id}: {e}")
+        return None, generation
+
+
+def save_run_record(cfg: Config, record: dict, if_generation_match: int) -> bool:
+    """
+    Write the zone's run record if it is still at the generation read;
+    False (nothing written) when another run wrote it in between.
+    """
+    if not cfg.gcs_bucket:
+        return False
+
+    try:
+        _upload(cfg, run_record_blob_for_zone(cfg), json.dumps(record).encode(), if_generation_match=if_generation_match)
+    except PreconditionFailed:
+        return False
+    return True
+
+
+def save_state_async(cfg: Config, state: dict) -> Future:
+    """
+    Unconditional overwrite: serialize now, upload on a background thread.
+    The returned future resolves when the upload (and local cache update)
+    is done and raises what the upload raised.
+    """
+    if not cfg.gcs_bucket:
+        return _done()
 
     blob_name = model_blob_for_zone(cfg)
     if not blob_name:
-        return
+        return _done()
 
-    buf = io.BytesIO()
-    torch.save(state, buf)
-    buf.seek(0)
+    def upload(data: bytes, npz: bytes) -> None:
+        _upload(cfg, blob_name, data)
+        _upload_weights(cfg, npz)
 
-    client = storage.Client(project=cfg.project_id)
-    bucket = client.bucket(cfg.gcs_bucket)
-    blob = bucket.blob(blob_name)
+    return _uploads.submit(upload, _serialize(state), export_npz(state["model"], state.get("scaler"), state.get("feature_layout")))
 
-    blob.upload_from_file(
-        buf,
-        rewind=True,
-        content_type="application/octet-stream",
-    )
+
+def load_shadow_state(cfg: Config, model_version: str) -> dict | None:
+    """A shadow candidate's persisted state for the zone, or None."""
+    if not cfg.gcs_bucket:
+        return None
+    return _fetch(cfg, shadow_blob_for_zone(cfg, model_version))[0]
+
+
+def save_shadow_state_async(cfg: Config, model_version: str, state: dict) -> Future:
+    """
+    Unconditional overwrite of a shadow candidate's state, uploaded in order
+    on the background thread. Shadows only feed the evaluation table, so
+    overlapping runs may drop each other's shadow steps.
+    """
+    if not cfg.gcs_bucket:
+        return _done()
+    return _uploads.submit(_upload, cfg, shadow_blob_for_zone(cfg, model_version), _serialize(state))
+
+
+def save_state(cfg: Config, state: dict) -> None:
+    save_state_async(cfg, state).result()
+
+
+class VersionedState:
+    """
+    One zone's persisted state as seen by one run, saved with optimistic
+    concurrency so overlapping runs for the zone never lose each other's
+    updates.
+
+    load_state() remembers the blob generation; every save is conditional on the
+    blob still being at the generation this run last read or wrote. When
+    another run got there first, the newer state is fetched and this run's
+    training steps that are not yet persisted are replayed onto it
+    (replay(base_state, first_step, end_step) -> state), and the save is
+    retried. Once that has happened the run's own model no longer matches
+    the blob, so every later save replays as well.
+
+    Saves run in order on the background upload thread. Each saved
+    checkpoint's weights are also exported as .npz for load_weights().
+    """
+
+    def __init__(self, cfg: Config, attempts: int = 5):
+        self.cfg = cfg
+        self.attempts = attempts
+        self.blob_name = model_blob_for_zone(cfg) if cfg.gcs_bucket else None
+        self.generation: int | None = None
+        self.saved_steps = 0
+        self.conflicts = 0
+        self._diverged = False
+
+    def load_state(self) -> dict | None:
+        if not self.blob_name:
+            return None
+        state, self.generation = _fetch(self.cfg, self.blob_name)
+        return state
+
+    def save_state_async(
+        self,
+        state: dict,
+        steps: int,
+        replay: Callable[[dict | None, int, int], dict] | None = None,
+    ) -> Future:
+        """
+        Save state, the result of this run's first `steps` training steps.
+        Without replay a conflicting write raises PreconditionFailed.
+        """
+        if not self.blob_name:
+            return _done()
+        return _uploads.submit(
+            self._save, _serialize(state), export_npz(state["model"], state.get("scaler"), state.get("feature_layout")), steps, replay
+        )
+
+    def _save(self, data: bytes, npz: bytes, steps: int, replay) -> int | None:
+        for _ in range(self.attempts):
+            if self._diverged:
+                if steps <= self.saved_steps:
+                    return self.generation
+                latest, self.generation = _fetch(self.cfg, self.blob_name)
+                state = replay(latest, self.saved_steps, steps)
+                data, npz = _serialize(state), export_npz(state["model"], state.get("scaler"), state.get("feature_layout"))
+            try:
+                self.generation = _upload(self.cfg, self.blob_name, data, if_generation_match=self.generation)
+            except PreconditionFailed:
+                if replay is None:
+                    raise
+                self.conflicts += 1
+                self._diverged = True
+                continue
+            _upload_weights(self.cfg, npz)
+            self.saved_steps = steps
+            return self.generation
+        raise RuntimeError(
+            f"Model state for zone {self.cfg.zone_id} still conflicting after {self.attempts} attempts"
+        )
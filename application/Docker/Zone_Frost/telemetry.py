@@ -0,0 +1,188 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+class RunTelemetry:
+    """
+    Stage spans and BigQuery job stats for one frost run (one zone, or the
+    shared part of a batch run).
+
+    Spans nest per thread; each query is attributed to the innermost span
+    open on its thread and to the bq_io function that issued it. emit()
+    prints everything as a single JSON log line.
+    """
+
+    def __init__(self, kind: str, **attrs):
+        self.kind = kind
+        self.attrs = attrs
+        self.started_at = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self._local = threading.local()
+        self.spans: list[dict] = []
+        self.queries: list[dict] = []
+
+    @property
+    def _stack(self) -> list[str]:
+        # Concurrent fetches (planner.py) open their spans on worker threads
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000.0
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        start = self._now_ms()
+        parent = self._stack[-1] if self._stack else None
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            self.spans.append({
+                "name": name,
+                "parent": parent,
+                "start_ms": round(start, 1),
+                "ms": round(self._now_ms() - start, 1),
+                **attrs,
+            })
+
+    def instrument(self, bq) -> "InstrumentedClient":
+        return InstrumentedClient(bq, self)
+
+    def record_query(self, entry: dict) -> None:
+        """Add one query's stats (fn, op, ms, rows, ...) under the current span."""
+        entry["span"] = self._stack[-1] if self._stack else None
+        self.queries.append(entry)
+
+    def stage_ms(self) -> dict[str, int]:
+        """Top-level span durations by name (repeated spans summed), plus BigQuery and total time."""
+        out: dict[str, float] = {}
+        for s in self.spans:
+            if s["parent"] is None:
+                out[s["name"]] = out.get(s["name"], 0.0) + s["ms"]
+        out["bq"] = sum(q["ms"] for q in self.queries)
+        out["total"] = self._now_ms()
+        return {k: int(round(v)) for k, v in out.items()}
+
+    def timing_summary(self) -> str:
+        """Compact JSON for the prediction row's timing column."""
+        return json.dumps(self.stage_ms(), separators=(",", ":"))
+
+    def record(self, **extra) -> dict:
+        def total(key):
+            vals = [q[key] for q in self.queries if q.get(key) is not None]
+            return sum(vals) if vals else None
+
+        return {
+            "severity": "INFO",
+            "message": "frost_run_telemetry",
+            "kind": self.kind,
+            **self.attrs,
+            **extra,
+            "started_at": self.started_at.isoformat(),
+            "total_ms": round(self._now_ms(), 1),
+            "stage_ms": self.stage_ms(),
+            "spans": self.spans,
+            "queries": self.queries,
+            "query_count": len(self.queries),
+            "bytes_processed": total("bytes_processed"),
+            "slot_ms": total("slot_ms"),
+            "cache_hits": sum(1 for q in self.queries if q.get("cache_hit")),
+        }
+
+    def emit(self, **extra) -> None:
+        """One JSON object per line, so Cloud Logging stores it as a structured record."""
+        print(json.dumps(self.record(**extra), default=str), flush=True)
+
+
+class InstrumentedClient:
+    """
+    Wraps a bigquery.Client: query() returns jobs that record wall time,
+    bytes processed, slot-ms and cache hit into the telemetry once they
+    complete (result() / to_dataframe()). Anything else passes through.
+    """
+
+    def __init__(self, bq, telemetry: RunTelemetry):
+        self._bq = bq
+        self._telemetry = telemetry
+
+    def query(self, query, *args, **kwargs):
+        caller = sys._getframe(1).f_code.co_name
+        t0 = time.perf_counter()
+        return _RecordedJob(self._bq.query(query, *args, **kwargs), self._telemetry, caller, t0)
+
+    def insert_rows_json(self, table, rows, *args, **kwargs):
+        caller = sys._getframe(1).f_code.co_name
+        t0 = time.perf_counter()
+        errors = self._bq.insert_rows_json(table, rows, *args, **kwargs)
+        self._telemetry.record_query({
+            "fn": caller,
+            "op": "insert",
+            "ms": round((time.perf_counter() - t0) * 1000.0, 1),
+            "rows": len(rows),
+            "errors": len(errors) if errors else 0,
+        })
+        return errors
+
+    def __getattr__(self, name):
+        return getattr(self._bq, name)
+
+
+class _RecordedJob:
+    def __init__(self, job, telemetry: RunTelemetry, caller: str, t0: float):
+        self._job = job
+        self._telemetry = telemetry
+        self._caller = caller
+        self._t0 = t0
+        self._recorded = False
+
+    def _record(self, rows: int | None = None, error: Exception | None = None) -> None:
+        if self._recorded:
+            return
+        self._recorded = True
+        job = self._job
+        entry = {
+            "fn": self._caller,
+            "op": "query",
+            "ms": round((time.perf_counter() - self._t0) * 1000.0, 1),
+            "job_id": getattr(job, "job_id", None),
+            "bytes_processed": getattr(job, "total_bytes_processed", None),
+            "slot_ms": getattr(job, "slot_millis", None),
+            "cache_hit": getattr(job, "cache_hit", None),
+        }
+        if rows is not None:
+            entry["rows"] = rows
+        dml_rows = getattr(job, "num_dml_affected_rows", None)
+        if dml_rows is not None:
+            entry["dml_rows"] = dml_rows
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+        self._telemetry.record_query(entry)
+
+    def result(self, *args, **kwargs):
+        try:
+            out = self._job.result(*args, **kwargs)
+        except Exception as e:
+            self._record(error=e)
+            raise
+        self._record()
+        return out
+
+    def to_dataframe(self, *args, **kwargs):
+        try:
+            df = self._job.to_dataframe(*args, **kwargs)
+        except Exception as e:
+            self._record(error=e)
+            raise
+        self._record(rows=len(df))
+        return df
+
+    def __getattr__(self, name):
+        return getattr(self._job, name)